@@ -0,0 +1,201 @@
+"""PSDファイル解析の処理速度とメモリ使用量を計測する
+
+psd_synth で生成したPSDファイルに対して、解析方法ごとに別プロセスで計測し、結果をJSONに保存する
+使用メモリはプロセスの最大RSS(resource モジュールが使用できない環境では計測しない)
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+import parse_columns  # type: ignore
+import parse_export  # type: ignore
+from parse_crc import check_crc  # type: ignore
+from parse_packet_table import load_packet_table  # type: ignore
+from parse_PacketData import get_packet_list, iter_packets  # type: ignore
+from parse_parallel import map_packet_ranges  # type: ignore
+from parse_progress import Progress  # type: ignore
+from parse_PSD_head import PSD_RECORD_SIZE  # type: ignore
+from parse_spill import load_packet_table_spilled  # type: ignore
+from parse_stats import StatsAggregator  # type: ignore
+from psd_synth import write_psd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+# 計測するパケット数
+PACKET_NUM_LIST = [10_000, 1_000_000, 10_000_000]
+
+# 全パケットをリストで保持する計測の上限パケット数(これを超える場合は計測しない)
+LIST_PACKET_NUM_LIMIT = 1_000_000
+
+
+def _bench_get_packet_list(filepath_r: str) -> int:
+    with open(filepath_r, "rb") as f:
+        return len(get_packet_list(f.read(), Progress(quiet_r=True)))
+
+
+def _bench_format_csv_parallel(filepath_r: str) -> int:
+    format_func = functools.partial(parse_export.format_chunk, format_func_r=parse_export.format_csv, columns_r=None)
+    return sum(packet_count for _, packet_count in map_packet_ranges(filepath_r, format_func))
+
+
+def _bench_iter_packets(filepath_r: str) -> int:
+    with open(filepath_r, "rb") as f:
+        return sum(1 for _ in iter_packets(f))
+
+
+def _bench_packet_table(filepath_r: str) -> int:
+    return len(load_packet_table(filepath_r))
+
+
+def _bench_packet_table_spilled(filepath_r: str) -> int:
+    with load_packet_table_spilled(filepath_r) as table:
+        return len(table)
+
+
+def _bench_stats(filepath_r: str) -> int:
+    with open(filepath_r, "rb") as f:
+        return StatsAggregator().process_all(iter_packets(f)).total_m.count_m
+
+
+def _bench_crc(filepath_r: str) -> int:
+    with open(filepath_r, "rb") as f:
+        checker = check_crc(iter_packets(f))
+    return checker.checked_count_m + checker.unknown_count_m
+
+
+def _bench_columns(filepath_r: str) -> int:
+    records = parse_columns.load_records(filepath_r)
+    columns = parse_columns.decode_columns(records)
+    parse_columns.decode_adv_headers(columns, records)
+    return len(records)
+
+
+# 計測名と、計測関数・全パケットを保持するかどうか
+BENCH_TABLE: dict[str, tuple[Callable[[str], int], bool]] = {
+    "get_packet_list": (_bench_get_packet_list, True),
+    "iter_packets": (_bench_iter_packets, False),
+    "packet_table": (_bench_packet_table, False),
+    "packet_table_spilled": (_bench_packet_table_spilled, False),
+    "format_csv_parallel": (_bench_format_csv_parallel, False),
+    "stats": (_bench_stats, False),
+    "crc": (_bench_crc, False),
+    "columns": (_bench_columns, False),
+}
+
+
+def _get_peak_rss_mb() -> float | None:
+    """プロセスの最大RSS[MB]を取得する"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS は byte 単位、Linux は KB 単位
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def _run_bench(name_r: str, filepath_r: str) -> dict:
+    """子プロセスで1件計測する"""
+    func, _ = BENCH_TABLE[name_r]
+    base_rss_mb = _get_peak_rss_mb()
+    start = time.perf_counter()
+    packet_num = func(filepath_r)
+    elapsed = time.perf_counter() - start
+    return {"packet_num": packet_num, "elapsed_s": elapsed, "base_rss_mb": base_rss_mb, "peak_rss_mb": _get_peak_rss_mb()}
+
+
+def run_bench(name_r: str, filepath_r: str) -> dict:
+    """計測を1件実行する
+
+    最大RSSを計測ごとに分離するため、計測ごとに新しいプロセスを起動する
+
+    Args:
+        name_r (str): 計測名
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        dict: 計測結果
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        result = executor.submit(_run_bench, name_r, filepath_r).result()
+
+    file_size = os.path.getsize(filepath_r)
+    result["bench"] = name_r
+    result["records_per_s"] = result["packet_num"] / result["elapsed_s"]
+    result["mb_per_s"] = file_size / (1 << 20) / result["elapsed_s"]
+    return result
+
+
+def prepare_psd(work_dir_r: str, packet_num_r: int, seed_r: int) -> str:
+    """計測用のPSDファイルを用意する(生成済みの場合は再利用する)"""
+    filepath = os.path.join(work_dir_r, f"synth_{packet_num_r}_{seed_r}.psd")
+    if not os.path.exists(filepath) or os.path.getsize(filepath) != packet_num_r * PSD_RECORD_SIZE:
+        write_psd(filepath, packet_num_r, seed_r)
+    return filepath
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PSDファイル解析の処理速度とメモリ使用量を計測する")
+    parser.add_argument("--packet-num", type=int, nargs="+", default=PACKET_NUM_LIST, help="計測するパケット数")
+    parser.add_argument("--bench", nargs="+", choices=list(BENCH_TABLE), default=list(BENCH_TABLE), help="計測する解析方法")
+    parser.add_argument("--list-limit", type=int, default=LIST_PACKET_NUM_LIMIT, help="全パケットをリストで保持する計測の上限パケット数")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "ble_simulator_bench"), help="生成したPSDファイルの保存先")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--output", default=None, help="結果のJSONの保存先. 省略時は benchmark/results に日時付きで保存する")
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = []
+    for packet_num in args.packet_num:
+        filepath = prepare_psd(args.work_dir, packet_num, args.seed)
+        for name in args.bench:
+            _, keep_all = BENCH_TABLE[name]
+            if keep_all and args.list_limit < packet_num:
+                print(f"{name} {packet_num}: skipped (list limit {args.list_limit})")
+                continue
+            if name == "columns" and not parse_columns.is_available():
+                print(f"{name} {packet_num}: skipped (numpy is not installed)")
+                continue
+
+            result = run_bench(name, filepath)
+            results.append(result)
+            peak = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.1f}MB"
+            print(
+                f"{name} {packet_num}: {result['elapsed_s']:.3f}s, "
+                f"{result['records_per_s']:.0f} records/s, {result['mb_per_s']:.1f} MB/s, peak RSS {peak}"
+            )
+
+    now = datetime.datetime.now()
+    output = args.output
+    if output is None:
+        output = os.path.join(os.path.dirname(__file__), "results", f"bench_{now:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        report = {
+            "date": now.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "results": results,
+        }
+        json.dump(report, f, indent=2)
+    print(f"Saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
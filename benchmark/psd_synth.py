@@ -0,0 +1,156 @@
+"""ベンチマーク用に実際の受信状況に近いPSDファイルを生成する
+
+Advertise Packet(ADV_IND, SCAN_REQ, SCAN_RSP, CONNECT_IND)とデータチャネルパケット(Empty PDU, LL Control, ATT)を混在させ、
+一定の割合でCRCエラーを含める
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+from parse_crc import ADVERTISING_CRC_INIT, calc_crc24  # type: ignore
+from parse_PacketData import ADVERTISING_PACKET_ACCESS_ADRS  # type: ignore
+from parse_PSD_head import PSD_HEADER_STRUCT, PSD_RECORD_SIZE, FieldPayloadWStatusbytes  # type: ignore
+from parse_PSD_SB import RSSI_OFFSET  # type: ignore
+
+# 生成するパケットの種類の割合
+ADV_RATIO = 0.7
+CRC_ERROR_RATIO = 0.02
+
+# 生成するパケットの種類の数(これを繰り返して使用する)
+TEMPLATE_NUM = 4096
+
+# パケットの平均受信間隔[us]
+MEAN_INTERVAL_US = 625
+
+# 一度に書き込むパケット数
+WRITE_PACKET_NUM = 65536
+
+# 接続ごとの Access Address と CRCInit
+CONNECTION_LIST = [(0x50654B1D, 0x123456), (0x71764129, 0x0ABCDE), (0x8E89AD12, 0x555AAA)]
+
+
+def make_payload_record(access_adrs_r: int, pdu_r: bytes, crc_init_r: int, rssi_r: int, channel_r: int, crc_ok_r: bool) -> bytes:
+    """PSDファイルの PayloadData 部分を生成する
+
+    Args:
+        access_adrs_r (int): Access Address
+        pdu_r (bytes): BLE Header と BLE Payload
+        crc_init_r (int): CRC初期値
+        rssi_r (int): RSSI
+        channel_r (int): channel
+        crc_ok_r (bool): CRCの状態 True: OK、False: NG
+
+    Returns:
+        bytes: Payload+StatusBytes長と256byteの PayloadData
+    """
+    crc = calc_crc24(crc_init_r, pdu_r)
+    if not crc_ok_r:
+        crc ^= 0x000001
+    body = bytes([len(pdu_r)]) + access_adrs_r.to_bytes(4, "little") + pdu_r + crc.to_bytes(3, "little")
+    status = bytes([max(0, min(255, rssi_r - RSSI_OFFSET)), (0x80 if crc_ok_r else 0x00) | channel_r])
+    return struct.pack("<H", len(body) + len(status)) + (body + status).ljust(FieldPayloadWStatusbytes.length_m, b"\x00")
+
+
+def make_adv_pdu(rand_r: random.Random) -> bytes:
+    """Advertise Packet の PDU を生成する"""
+    adv_adrs = rand_r.choice([bytes([i, 0x22, 0x33, 0x44, 0x55, 0xC0]) for i in range(32)])
+    kind = rand_r.random()
+    if kind < 0.75:
+        name = b"sensor-" + str(rand_r.randrange(100)).encode()
+        adv_data = bytes([2, 0x01, 0x06, len(name) + 1, 0x09]) + name + bytes([5, 0xFF, 0x4C, 0x00, 0x02, 0x15])
+        payload = adv_adrs + adv_data[:31]
+        return bytes([0x40, len(payload)]) + payload
+    if kind < 0.85:
+        payload = bytes(rand_r.randrange(256) for _ in range(6)) + adv_adrs
+        return bytes([0x43, len(payload)]) + payload
+    if kind < 0.95:
+        payload = adv_adrs + bytes([3, 0x03, 0x0F, 0x18])
+        return bytes([0x44, len(payload)]) + payload
+    access_adrs, crc_init = rand_r.choice(CONNECTION_LIST)
+    ll_data = struct.pack("<I3sBHHHH5sB", access_adrs, crc_init.to_bytes(3, "little"), 2, 0, 24, 0, 72, b"\xff" * 5, 0x05)
+    payload = bytes(6) + adv_adrs + ll_data
+    return bytes([0x05, len(payload)]) + payload
+
+
+def make_data_pdu(rand_r: random.Random) -> bytes:
+    """データチャネルパケットの PDU を生成する"""
+    kind = rand_r.random()
+    if kind < 0.6:
+        # Empty PDU
+        return bytes([0x01, 0x00])
+    if kind < 0.7:
+        return bytes([0x03, 0x02, 0x0C, 0x09])
+    value = bytes(rand_r.randrange(256) for _ in range(rand_r.randrange(1, 20)))
+    att = bytes([0x1B]) + rand_r.randrange(1, 0x40).to_bytes(2, "little") + value
+    l2cap = struct.pack("<HH", len(att), 0x0004) + att
+    return bytes([0x02, len(l2cap)]) + l2cap
+
+
+def make_templates(seed_r: int = 0) -> list[bytes]:
+    """繰り返して使用するパケットを生成する
+
+    Args:
+        seed_r (int): 乱数の種
+
+    Returns:
+        list[bytes]: Payload+StatusBytes長と PayloadData のリスト
+    """
+    rand = random.Random(seed_r)
+    templates = []
+    for _ in range(TEMPLATE_NUM):
+        rssi = int(rand.gauss(-65, 10))
+        crc_ok = CRC_ERROR_RATIO <= rand.random()
+        if rand.random() < ADV_RATIO:
+            pdu = make_adv_pdu(rand)
+            templates.append(make_payload_record(ADVERTISING_PACKET_ACCESS_ADRS, pdu, ADVERTISING_CRC_INIT, rssi, rand.choice([37, 38, 39]), crc_ok))
+        else:
+            access_adrs, crc_init = rand.choice(CONNECTION_LIST)
+            templates.append(make_payload_record(access_adrs, make_data_pdu(rand), crc_init, rssi, rand.randrange(37), crc_ok))
+    return templates
+
+
+def write_psd(filepath_r: str, packet_num_r: int, seed_r: int = 0) -> None:
+    """PSDファイルを生成する
+
+    Args:
+        filepath_r (str): 出力先のパス
+        packet_num_r (int): パケット数
+        seed_r (int): 乱数の種
+    """
+    rand = random.Random(seed_r)
+    templates = make_templates(seed_r)
+    # 受信した CONNECT_IND から接続を追跡できるよう、先頭は CONNECT_IND を並べる
+    # (Payload+StatusBytes長: 2byte, Payload長: 1byte, Access Address: 4byte の後が BLE Header)
+    connect_list = [template for template in templates if template[2 + 1] == 0xD6 and template[2 + 1 + 4] & 0x0F == 0x05]
+
+    time_ticks = 1 << 16
+    buffer = bytearray(PSD_RECORD_SIZE * WRITE_PACKET_NUM)
+    with open(filepath_r, "wb") as f:
+        for start in range(0, packet_num_r, WRITE_PACKET_NUM):
+            count = min(WRITE_PACKET_NUM, packet_num_r - start)
+            for i in range(count):
+                no = start + i + 1
+                template = connect_list[no - 1] if no <= len(connect_list) else templates[rand.randrange(TEMPLATE_NUM)]
+                time_ticks += int(rand.expovariate(1.0 / MEAN_INTERVAL_US) * 32) + 1
+                offset = i * PSD_RECORD_SIZE
+                PSD_HEADER_STRUCT.pack_into(buffer, offset, 0x01, no, ((time_ticks // 5000) << 16) | (time_ticks % 5000), 0)
+                buffer[offset + PSD_HEADER_STRUCT.size - 2 : offset + PSD_RECORD_SIZE] = template
+            f.write(memoryview(buffer)[: count * PSD_RECORD_SIZE])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ベンチマーク用のPSDファイルを生成する")
+    parser.add_argument("output", help="出力先のパス")
+    parser.add_argument("packet_num", type=int, help="パケット数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+    write_psd(args.output, args.packet_num, args.seed)
+
+
+if __name__ == "__main__":
+    main()
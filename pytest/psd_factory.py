@@ -0,0 +1,29 @@
+"""テスト用のPSDファイルの内容を生成する"""
+
+import struct
+
+ADV_ACCESS_ADRS = 0x8E89BED6
+
+
+def make_record(
+    no: int,
+    time_raw: int,
+    channel: int = 37,
+    access_adrs: int = ADV_ACCESS_ADRS,
+    ble_header: bytes = b"\x00\x06",
+    ble_payload: bytes = b"\x11\x22\x33\x44\x55\x66",
+    rssi_raw: int = 30,
+    crc_ok: bool = True,
+    crc: bytes = b"\xaa\xbb\xcc",
+) -> bytes:
+    """テスト用にPSDファイル1パケット分のbytesデータを生成する"""
+    body = bytes([len(ble_header) + len(ble_payload)]) + access_adrs.to_bytes(4, "little") + ble_header + ble_payload + crc
+    status = bytes([rssi_raw, (0x80 if crc_ok else 0x00) | channel])
+    payload = (body + status).ljust(256, b"\x00")
+    return struct.pack("<BIQH", 0x01, no, time_raw, len(body) + len(status)) + payload
+
+
+def make_psd(count: int) -> bytes:
+    """テスト用にPSDファイルの内容を生成する"""
+    # 10us間隔のタイムスタンプを 5000 tick 単位の上位と下位に分けて格納する
+    return b"".join(make_record(i + 1, ((i * 320 // 5000) << 16) | (i * 320 % 5000), channel=37 + i % 3) for i in range(count))
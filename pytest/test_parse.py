@@ -0,0 +1,56 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+from psd_factory import make_psd, make_record
+
+import parse  # type: ignore
+
+
+def test_convert_batch(tmp_path: Path) -> None:
+    src_dir = tmp_path / "in"
+    dst_dir = tmp_path / "out"
+    src_dir.mkdir()
+    (src_dir / "a.psd").write_bytes(make_psd(5))
+    (src_dir / "b.psd").write_bytes(make_psd(7))
+    (src_dir / "memo.txt").write_text("")
+
+    result_list = parse.convert_batch([str(src_dir)], str(dst_dir), ".jsonl", worker_num_r=1, quiet_r=True)
+    assert sorted((os.path.basename(result.src_filepath_m), result.packet_count_m) for result in result_list) == [("a.psd", 5), ("b.psd", 7)]
+    assert sorted(os.listdir(dst_dir)) == ["a.jsonl", "b.jsonl"]
+    assert len((dst_dir / "b.jsonl").read_text().splitlines()) == 7
+
+    # 変換済みのファイルは省略する
+    assert parse.convert_batch([str(src_dir / "*.psd")], str(dst_dir), ".jsonl", quiet_r=True) == []
+    assert len(parse.convert_batch([str(src_dir / "a.psd")], str(dst_dir), ".jsonl", worker_num_r=1, force_r=True)) == 1
+
+    # 失敗したファイルは出力を残さない
+    result = parse.run_convert(str(src_dir / "a.psd"), str(dst_dir / "c.csv"), ["unknown"])
+    assert result.error_m is not None and result.error_m.startswith("ValueError")
+    assert not (dst_dir / "c.csv").exists() and not (dst_dir / "c.partial.csv").exists()
+    assert "Failed: 1" in parse.report_results([result], 0, 1.0)
+
+
+def test_convert_anomaly(tmp_path: Path) -> None:
+    src = tmp_path / "reserved.psd"
+    src.write_bytes(b"".join(make_record(i + 1, 0, ble_header=b"\x0f\x06") for i in range(10)))
+
+    # AdvertisePdu を解析しない出力でも PDU Type の異常を集計する
+    result = parse.run_convert(str(src), str(tmp_path / "reserved.csv"), ["no", "channel"])
+    assert result.error_m is None
+    assert result.anomaly_m.counts_m == {"unknown_pdu_type": 10}
+    report = parse.report_results([result], 0, 1.0)
+    assert "  unknown_pdu_type: 10" in report
+    # 処理段階ごとの経過時間も出力する
+    assert set(result.timer_m.elapsed_m) == {"read", "decode", "export"}
+    assert "\nElapsed read: " in report
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,83 @@
+import io
+import os
+import pickle
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_PacketData  # type: ignore
+from parse_PSD_head import PSD_RECORD_SIZE  # type: ignore
+from psd_factory import ADV_ACCESS_ADRS, make_psd, make_record
+
+
+def test_record_size() -> None:
+    assert PSD_RECORD_SIZE == 271
+    assert len(make_record(1, 0)) == PSD_RECORD_SIZE
+
+
+def test_get_packet_list() -> None:
+    contents = make_psd(30)
+    packet_list = parse_PacketData.get_packet_list(contents)
+
+    assert len(packet_list) == 30
+    assert [pkt.fld_no_m.get_data() for pkt in packet_list] == list(range(1, 31))
+    assert packet_list[0].timestamp_m == 0
+    assert packet_list[1].timestamp_m == 10
+
+    pkt = packet_list[2]
+    assert pkt.fld_status_bytes_m.channel_m == 39
+    assert pkt.fld_status_bytes_m.rssi_m == -64
+    assert pkt.fld_status_bytes_m.indicate_crc_m is True
+    assert pkt.fld_payload_m.access_adrs_m == ADV_ACCESS_ADRS
+    assert pkt.fld_payload_m.get_ble_payload_hex() == "11,22,33,44,55,66"
+    assert pkt.fld_payload_m.crc_m == "0XCCBBAA"
+
+
+def test_get_packet_list_ignore_partial_record() -> None:
+    contents = make_psd(3) + b"\x00" * 100
+    assert len(parse_PacketData.get_packet_list(contents)) == 3
+
+
+def test_packet_data_compact() -> None:
+    contents = make_psd(3) + make_record(4, 0, channel=5, access_adrs=0x12345678) + make_record(5, 0, channel=37, crc_ok=False)
+    packet_list = parse_PacketData.get_packet_list(contents)
+
+    assert not hasattr(packet_list[0], "__dict__")
+    assert packet_list[0].buffer_m is contents
+    assert [pkt.packet_type_m for pkt in packet_list] == [
+        parse_PacketData.PACKET_TYPE_ADVERTISING,
+        parse_PacketData.PACKET_TYPE_ADVERTISING,
+        parse_PacketData.PACKET_TYPE_ADVERTISING,
+        parse_PacketData.PACKET_TYPE_DATA,
+        parse_PacketData.PACKET_TYPE_UNKNOWN,
+    ]
+    assert packet_list[0].adv_pdu_m is not None
+    assert packet_list[3].adv_pdu_m is None
+
+    restored = pickle.loads(pickle.dumps(packet_list[2]))
+    assert restored.get_record() == packet_list[2].get_record()
+    assert (restored.timestamp_m, restored.packet_type_m, restored.pdu_type_m) == (
+        packet_list[2].timestamp_m,
+        packet_list[2].packet_type_m,
+        packet_list[2].pdu_type_m,
+    )
+    assert len(restored.buffer_m) == PSD_RECORD_SIZE
+    assert restored.adv_pdu_m.adv_adrs_m == packet_list[2].adv_pdu_m.adv_adrs_m
+
+
+@pytest.mark.parametrize("chunk_packet_num", [1, 7, 4096])
+def test_iter_packets(chunk_packet_num: int) -> None:
+    contents = make_psd(30) + b"\x00" * 100
+    expected = parse_PacketData.get_packet_list(contents)
+    result = list(parse_PacketData.iter_packets(io.BytesIO(contents), chunk_packet_num))
+
+    assert [pkt.fld_no_m.get_data() for pkt in result] == [pkt.fld_no_m.get_data() for pkt in expected]
+    assert [pkt.timestamp_m for pkt in result] == [pkt.timestamp_m for pkt in expected]
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
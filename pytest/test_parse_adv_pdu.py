@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+from parse_adv_pdu import PDU_TYPE_CONNECT_IND, PDU_TYPE_IND, PDU_TYPE_UNKNOWN, AdvertisePdu, split_ad_structures  # type: ignore
+
+
+def test_advertise_pdu() -> None:
+    adv_data = bytes.fromhex("020106040941424303030f1805ff4c000215")
+    adv_pdu = AdvertisePdu(bytes([0x40, 6 + len(adv_data)]), bytes.fromhex("665544332211") + adv_data)
+
+    assert adv_pdu.self_pdu_type_m == PDU_TYPE_IND
+    assert adv_pdu.get_pdu_type_name() == "ADV_IND"
+    assert (adv_pdu.ch_sel_m, adv_pdu.tx_add_m, adv_pdu.rx_add_m, adv_pdu.length_m) == (0, 1, 0, 6 + len(adv_data))
+    assert adv_pdu.adv_adrs_m == "11:22:33:44:55:66"
+    assert adv_pdu.flags_m == 0x06
+    assert adv_pdu.local_name_m == "ABC"
+    assert adv_pdu.uuid_list_m == ["180f"]
+    assert adv_pdu.manufacturer_data_m == [(0x004C, b"\x02\x15")]
+
+    connect_ind = AdvertisePdu(bytes([0xE5, 34]), bytes(range(34)))
+    assert connect_ind.self_pdu_type_m == PDU_TYPE_CONNECT_IND
+    assert (connect_ind.ch_sel_m, connect_ind.tx_add_m, connect_ind.rx_add_m) == (1, 1, 1)
+    assert connect_ind.target_adrs_m == "05:04:03:02:01:00"
+    assert connect_ind.adv_adrs_m == "0b:0a:09:08:07:06"
+    assert connect_ind.ll_data_m == bytes(range(12, 34))
+
+    assert AdvertisePdu(bytes([0x0F, 0])).self_pdu_type_m == PDU_TYPE_UNKNOWN
+    assert AdvertisePdu(b"").self_pdu_type_m == PDU_TYPE_UNKNOWN
+    assert AdvertisePdu(bytes([0x40])).length_m == 0
+
+
+@pytest.mark.parametrize(
+    "adv_data, expected",
+    [
+        # AD Type を含まない末尾の Length
+        (bytes.fromhex("02010605"), [(0x01, b"\x06")]),
+        (bytes.fromhex("05"), []),
+        # Length が残りのデータを超える
+        (bytes.fromhex("0201060509414243"), [(0x01, b"\x06"), (0x09, b"ABC")]),
+        (bytes.fromhex("020106000509"), [(0x01, b"\x06")]),
+    ],
+)
+def test_split_ad_structures_malformed(adv_data: bytes, expected: list[tuple[int, bytes]]) -> None:
+    assert split_ad_structures(adv_data) == expected
+
+    adv_pdu = AdvertisePdu(bytes([0x40, 6 + len(adv_data)]), bytes.fromhex("665544332211") + adv_data)
+    assert adv_pdu.ad_structures_m == expected
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_anomaly  # type: ignore
+import parse_PacketData  # type: ignore
+import parse_parallel  # type: ignore
+from parse_adv_pdu import PDU_TYPE_UNKNOWN  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_anomaly_tracker(tmp_path: Path) -> None:
+    invalid_length = bytearray(make_record(8, 0))
+    invalid_length[13:15] = b"\x00\x00"
+    contents = b"".join(
+        [
+            make_psd(4),
+            make_record(5, 0, crc_ok=False),
+            make_record(6, 0, channel=5),
+            make_record(7, 0, channel=38, access_adrs=0x12345678),
+            bytes(invalid_length),
+            make_record(9, 0, ble_header=b"\x0f\x06"),
+            make_record(10, 0, crc_ok=False),
+        ]
+    )
+    tracker = parse_anomaly.reset_anomaly_tracker(1)
+    packet_list = parse_PacketData.get_packet_list(contents)
+    # PDU Type は AdvertisePdu を解析しなくても分類時に判定する
+    assert packet_list[8].pdu_type_m == PDU_TYPE_UNKNOWN
+    assert tracker.counts_m == {
+        parse_anomaly.ANOMALY_CRC_NG: 2,
+        parse_anomaly.ANOMALY_ADV_AA_ON_DATA_CHANNEL: 1,
+        parse_anomaly.ANOMALY_DATA_AA_ON_ADV_CHANNEL: 1,
+        parse_anomaly.ANOMALY_INVALID_LENGTH: 1,
+        parse_anomaly.ANOMALY_UNKNOWN_PDU_TYPE: 1,
+    }
+    assert tracker.samples_m[parse_anomaly.ANOMALY_CRC_NG] == [5]
+    assert tracker.samples_m[parse_anomaly.ANOMALY_UNKNOWN_PDU_TYPE] == [9]
+    assert packet_list[8].adv_pdu_m.self_pdu_type_m == PDU_TYPE_UNKNOWN
+    assert tracker.counts_m[parse_anomaly.ANOMALY_UNKNOWN_PDU_TYPE] == 1
+    assert tracker.report().splitlines()[:2] == ["Anomaly total: 6", "  crc_ng: 2 (e.g. 5)"]
+
+    # 子プロセスで見つかった異常も集計する
+    path = tmp_path / "anomaly.psd"
+    path.write_bytes(contents)
+    tracker = parse_anomaly.reset_anomaly_tracker(0)
+    assert sum(parse_parallel.map_packet_ranges(str(path), len, 2)) == 10
+    assert tracker.counts_m[parse_anomaly.ANOMALY_CRC_NG] == 2
+    assert parse_anomaly.ANOMALY_CRC_NG not in tracker.samples_m
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
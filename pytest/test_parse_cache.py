@@ -0,0 +1,63 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_cache  # type: ignore
+from psd_factory import make_psd
+
+
+def test_load_packet_table_cached(tmp_path: Path) -> None:
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(make_psd(30))
+    sidecar_path = tmp_path / ("test.psd" + parse_cache.SIDECAR_EXT)
+
+    table = parse_cache.load_packet_table_cached(str(psd_path))
+    assert sidecar_path.is_file()
+
+    cached = parse_cache.load_packet_table_cached(str(psd_path))
+    assert isinstance(cached["no"], memoryview)
+    for name in ["no", "timestamp", "rssi", "channel", "access_adrs", "payload_id"]:
+        assert list(cached[name]) == list(table[name])
+    assert cached.get_ble_payload(29) == table.get_ble_payload(29)
+    assert list(cached.pool_m.items()) == list(table.pool_m.items())
+    assert cached.select(channel_r={38}, time_range_r=(10, 100)) == table.select(channel_r={38}, time_range_r=(10, 100))
+
+    # PSDファイルが更新された場合は作り直す
+    psd_path.write_bytes(make_psd(10))
+    assert len(parse_cache.load_packet_table_cached(str(psd_path))) == 10
+
+
+@pytest.mark.parametrize("size", [parse_cache.SIDECAR_HEADER_STRUCT.size + 13, -1])
+def test_read_sidecar_truncated(tmp_path: Path, size: int) -> None:
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(make_psd(30))
+    sidecar_path = tmp_path / ("test.psd" + parse_cache.SIDECAR_EXT)
+    expected = parse_cache.load_packet_table_cached(str(psd_path))
+    sidecar = sidecar_path.read_bytes()
+
+    # 列の途中で切り詰められたサイドカーファイルは使用せずに作り直す
+    sidecar_path.write_bytes(sidecar[:size])
+    assert parse_cache.read_sidecar(str(sidecar_path), parse_cache.calc_file_key(str(psd_path))) is None
+    table = parse_cache.load_packet_table_cached(str(psd_path))
+    assert list(table["no"]) == list(expected["no"])
+    assert sidecar_path.read_bytes() == sidecar
+
+
+def test_evict_sidecars(tmp_path: Path) -> None:
+    for i in range(3):
+        sidecar_path = tmp_path / f"{i}.psd{parse_cache.SIDECAR_EXT}"
+        sidecar_path.write_bytes(b"\x00" * 100)
+        os.utime(sidecar_path, ns=(i * 10**9, i * 10**9))
+
+    removed = parse_cache.evict_sidecars(str(tmp_path), 200, str(tmp_path / f"0.psd{parse_cache.SIDECAR_EXT}"))
+    assert [os.path.basename(path) for path in removed] == [f"1.psd{parse_cache.SIDECAR_EXT}"]
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_columns  # type: ignore
+import parse_PacketData  # type: ignore
+from parse_adv_pdu import PDU_TYPE_IND, PDU_TYPE_UNKNOWN  # type: ignore
+from parse_packet_table import PacketTable  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_decode_columns() -> None:
+    pytest.importorskip("numpy")
+    contents = make_psd(30) + make_record(31, 0x10000, channel=5, access_adrs=0x12345678, rssi_raw=10, crc_ok=False)
+    expected = parse_PacketData.get_packet_list(contents)
+    columns = parse_columns.decode_columns(parse_columns.get_records(contents))
+
+    assert columns["no"].tolist() == [pkt.fld_no_m.get_data() for pkt in expected]
+    assert columns["timestamp"].tolist() == [pkt.timestamp_m for pkt in expected]
+    assert columns["length"].tolist() == [pkt.fld_length_m.get_data() for pkt in expected]
+    assert columns["rssi"].tolist() == [pkt.fld_status_bytes_m.rssi_m for pkt in expected]
+    assert columns["crc_ok"].tolist() == [pkt.fld_status_bytes_m.indicate_crc_m for pkt in expected]
+    assert columns["channel"].tolist() == [pkt.fld_status_bytes_m.channel_m for pkt in expected]
+    assert columns["access_adrs"].tolist() == [pkt.fld_payload_m.access_adrs_m for pkt in expected]
+    assert parse_columns.is_advertising(columns).tolist() == [True] * 30 + [False]
+
+
+def test_decode_adv_headers() -> None:
+    pytest.importorskip("numpy")
+    contents = (
+        make_record(1, 0, ble_header=b"\x40\x06")
+        + make_record(2, 0, ble_header=b"\x03\x0c", ble_payload=bytes(range(12)))
+        + make_record(3, 0, channel=5, access_adrs=0x12345678)
+    )
+    packet_list = parse_PacketData.get_packet_list(contents)
+    records = parse_columns.get_records(contents)
+    columns = parse_columns.decode_columns(records)
+    result = parse_columns.decode_adv_headers(columns, records)
+
+    assert result["pdu_type"].tolist() == [PDU_TYPE_IND, 3, PDU_TYPE_UNKNOWN]
+    assert result["tx_add"].tolist()[:2] == [packet_list[0].adv_pdu_m.tx_add_m, packet_list[1].adv_pdu_m.tx_add_m]
+    assert result["adv_length"].tolist()[:2] == [6, 12]
+    assert f"{int(result['adv_adrs'][0]):012x}" == packet_list[0].adv_pdu_m.adv_adrs_m.replace(":", "")
+    assert f"{int(result['adv_adrs'][1]):012x}" == packet_list[1].adv_pdu_m.adv_adrs_m.replace(":", "")
+
+    table = PacketTable()
+    table.extend(packet_list)
+    assert parse_columns.decode_adv_headers(table.columns_m)["pdu_type"].tolist() == result["pdu_type"].tolist()
+
+
+def test_decode_adv_headers_without_adv_adrs() -> None:
+    pytest.importorskip("numpy")
+    # 予約値の PDU Type, AdvA を含まない長さの ADV_IND, CONNECT_IND は AdvertisePdu と同様に AdvA を取得しない
+    contents = (
+        make_record(1, 0, ble_header=b"\x0f\x06")
+        + make_record(2, 0, ble_header=b"\x40\x06", ble_payload=b"")
+        + make_record(3, 0, ble_header=b"\x40\x06", ble_payload=bytes(5))
+        + make_record(4, 0, ble_header=b"\x05\x22", ble_payload=bytes(range(11)))
+        + make_record(5, 0, ble_header=b"\x05\x22", ble_payload=bytes(range(12)))
+        + make_record(6, 0)
+        + make_record(7, 0, crc_ok=False)
+    )
+    packet_list = parse_PacketData.get_packet_list(contents)
+    records = parse_columns.get_records(contents)
+    result = parse_columns.decode_adv_headers(parse_columns.decode_columns(records), records)
+
+    expected = [pkt.adv_pdu_m.adv_adrs_m if pkt.adv_pdu_m is not None else None for pkt in packet_list]
+    assert expected == [None, None, None, None, "0b:0a:09:08:07:06", "66:55:44:33:22:11", None]
+    assert [
+        int(adrs).to_bytes(6, "big").hex(":") if has_adrs else None
+        for adrs, has_adrs in zip(result["adv_adrs"].tolist(), result["has_adv_adrs"].tolist(), strict=True)
+    ] == expected
+    assert result["adv_adrs"].tolist()[:4] == [parse_columns.ADV_ADRS_NONE] * 4
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,102 @@
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_crc  # type: ignore
+import parse_data_pdu  # type: ignore
+import parse_PacketData  # type: ignore
+from psd_factory import make_record
+
+
+def make_crc(crc_init: int, pdu: bytes) -> bytes:
+    """テスト用にCRCの3byteを生成する"""
+    return parse_crc.calc_crc24(crc_init, pdu).to_bytes(3, "little")
+
+
+def calc_crc24_msb_first(crc_init: int, pdu: bytes) -> int:
+    """仕様書どおり反転しない生成多項式 0x00065B とCRC初期値で1bitずつ計算する
+
+    PDUはLSB first、CRCはMSB first で送信されるため、送信順の3byteをリトルエンディアンとして読んだ値を返す
+    """
+    crc = crc_init
+    for byte in pdu:
+        for bit in range(8):
+            feedback = ((crc >> 23) ^ (byte >> bit)) & 1
+            crc = (crc << 1) & 0xFFFFFF
+            if feedback:
+                crc ^= 0x00065B
+    return parse_crc.reverse_bits24(crc)
+
+
+def test_crc_table() -> None:
+    # 反転しない生成多項式で1bitずつ計算した結果と変換表による結果が一致すること
+    data = bytes(range(40))
+    for crc_init in (0x555555, 0x123456, 0x9A4B2C, 0x000001):
+        assert parse_crc.calc_crc24(crc_init, data) == calc_crc24_msb_first(crc_init, data)
+    assert parse_crc.reverse_bits24(0x000001) == 0x800000
+    assert parse_crc.reverse_bits24(0x123456) == 0x6A2C48
+
+
+def test_crc_known_vector() -> None:
+    # ADV_IND(AdvA C0:11:22:33:44:55, Flags 0x06, Complete Local Name "BLE")のCRCは F5 71 9D で送信される
+    pdu = bytes.fromhex("400e5544332211c00201060409424c45")
+    assert parse_crc.calc_crc24(0x555555, pdu).to_bytes(3, "little") == bytes.fromhex("f5719d")
+
+
+def make_connect_ind(data_aa: int, crc_init: int, no: int) -> bytes:
+    """テスト用に CONNECT_IND のレコードを生成する"""
+    ll_data = struct.pack("<I3sBHHHH5sB", data_aa, crc_init.to_bytes(3, "little"), 2, 0, 24, 0, 72, b"\xff" * 5, 0x05)
+    connect_ind = bytes(12) + ll_data
+    adv_header = bytes([0x05, len(connect_ind)])
+    return make_record(no, 0, ble_header=adv_header, ble_payload=connect_ind, crc=make_crc(0x555555, adv_header + connect_ind))
+
+
+def test_crc_checker() -> None:
+    data_aa = 0x50654B1D
+    crc_init = 0x123456
+    data_pdu = b"\x03\x02\x0c\x09"
+    contents = (
+        make_connect_ind(data_aa, crc_init, 1)
+        + make_record(2, 0, channel=5, access_adrs=data_aa, ble_header=data_pdu[:2], ble_payload=data_pdu[2:], crc=make_crc(crc_init, data_pdu))
+        + make_record(3, 0, channel=5, access_adrs=data_aa, ble_header=data_pdu[:2], ble_payload=data_pdu[2:], crc=b"\x00\x00\x00")
+        + make_record(4, 0, channel=5, access_adrs=data_aa, ble_header=data_pdu[:2], ble_payload=data_pdu[2:], crc=b"\x00\x00\x00", crc_ok=False)
+        + make_record(5, 0, channel=5, access_adrs=0x11111111)
+    )
+    checker = parse_crc.check_crc(parse_PacketData.get_packet_list(contents))
+
+    assert (checker.checked_count_m, checker.ng_count_m, checker.unknown_count_m) == (4, 2, 1)
+    assert (checker.mismatch_count_m, checker.mismatch_list_m) == (1, [3])
+    assert "mismatch with status bytes: 1" in checker.report()
+
+
+def test_crc_checker_follows_tracker() -> None:
+    # 同じ Access Address で接続し直した場合は新しいCRC初期値、破棄された接続はCRC初期値が不明になること
+    data_aa = 0x50654B1D
+    data_pdu = b"\x01\x00"
+
+    def make_data(no: int, access_adrs: int, crc_init: int) -> bytes:
+        return make_record(no, 0, channel=5, access_adrs=access_adrs, ble_header=data_pdu, ble_payload=b"", crc=make_crc(crc_init, data_pdu))
+
+    contents = (
+        make_connect_ind(data_aa, 0x123456, 1)
+        + make_data(2, data_aa, 0x123456)
+        + make_connect_ind(data_aa, 0x9A4B2C, 3)
+        + make_data(4, data_aa, 0x9A4B2C)
+        + make_connect_ind(0x2A2B2C2D, 0x111111, 5)
+        + make_data(6, data_aa, 0x9A4B2C)
+    )
+    checker = parse_crc.CrcChecker(parse_data_pdu.ConnectionTracker(max_connection_num_r=1))
+    results = [checker.process(packet) for packet in parse_PacketData.get_packet_list(contents)]
+
+    assert results == [True, True, True, True, True, None]
+    assert checker.ng_count_m == 0
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
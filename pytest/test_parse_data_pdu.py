@@ -0,0 +1,74 @@
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_data_pdu  # type: ignore
+import parse_PacketData  # type: ignore
+from psd_factory import make_record
+
+
+def test_connection_tracker() -> None:
+    data_aa = 0x50654B1D
+    ll_data = struct.pack("<I3sBHHHH5sB", data_aa, b"\x12\x34\x56", 2, 0, 24, 0, 72, b"\xff\xff\xff\xff\x1f", 0x05)
+    connect_ind = bytes.fromhex("aabbccddeeff112233445566") + ll_data
+    att_write = struct.pack("<HHBH", 5, 0x0004, 0x12, 0x002A) + b"\x01\x02"
+    contents = (
+        make_record(1, 0, channel=5, access_adrs=data_aa, ble_header=b"\x02\x02", ble_payload=att_write[:2])
+        + make_record(2, 0, ble_header=bytes([0x05, len(connect_ind)]), ble_payload=connect_ind)
+        + make_record(3, 0, channel=5, access_adrs=data_aa, ble_header=b"\x03\x02", ble_payload=b"\x0c\x09")
+        + make_record(4, 0, channel=6, access_adrs=data_aa, ble_header=b"\x02\x05", ble_payload=att_write[:5])
+        + make_record(5, 0, channel=6, access_adrs=data_aa, ble_header=b"\x01\x00", ble_payload=b"")
+        + make_record(6, 0, channel=7, access_adrs=data_aa, ble_header=b"\x01\x04", ble_payload=att_write[5:])
+        + make_record(7, 0, channel=8, access_adrs=data_aa, ble_header=b"\x03\x02", ble_payload=b"\x02\x13")
+    )
+    tracker = parse_data_pdu.ConnectionTracker()
+    result = list(parse_data_pdu.iter_data_pdus(parse_PacketData.get_packet_list(contents), tracker))
+
+    assert tracker.unknown_count_m == 1
+    connection = tracker.get_connection(data_aa)
+    assert (connection.crc_init_m, connection.interval_m, connection.timeout_m, connection.hop_m) == (0x563412, 24, 72, 5)
+    assert (connection.init_adrs_m, connection.adv_adrs_m) == ("ff:ee:dd:cc:bb:aa", "66:55:44:33:22:11")
+
+    assert [pkt.get_no() for pkt, _ in result] == [3, 4, 5, 6, 7]
+    assert [data_pdu.get_name() for _, data_pdu in result] == ["LL_VERSION_IND", "", "", "ATT_WRITE_REQ", "LL_TERMINATE_IND"]
+    assert result[3][1].l2cap_m == att_write
+    assert (result[3][1].l2cap_cid_m, result[3][1].att_handle_m) == (0x0004, 0x002A)
+    assert connection.terminated_m is True
+
+
+def test_connection_tracker_limit() -> None:
+    tracker = parse_data_pdu.ConnectionTracker(2)
+    for i in range(3):
+        ll_data = struct.pack("<I3sBHHHH5sB", 0x1000 + i, b"\x00\x00\x00", 0, 0, 6, 0, 10, b"\xff" * 5, 0)
+        connect_ind = bytes(12) + ll_data
+        tracker.process(parse_PacketData.get_packet_list(make_record(i, 0, ble_header=b"\x05\x22", ble_payload=connect_ind))[0])
+    assert list(tracker.connections_m) == [0x1001, 0x1002]
+
+
+@pytest.mark.parametrize("ble_header", [b"", b"\x03"])
+def test_data_pdu_short_header(ble_header: bytes) -> None:
+    data_aa = 0x50654B1D
+    ll_data = struct.pack("<I3sBHHHH5sB", data_aa, b"\x00\x00\x00", 0, 0, 6, 0, 10, b"\xff" * 5, 0)
+    connect_ind = bytes(12) + ll_data
+    # BLE Header の途中で終わるデータチャネルパケット
+    contents = make_record(1, 0, ble_header=b"\x05\x22", ble_payload=connect_ind) + make_record(
+        2, 0, channel=5, access_adrs=data_aa, ble_header=ble_header, ble_payload=b"", crc=b""
+    )
+    packet_list = parse_PacketData.get_packet_list(contents)
+    assert len(packet_list[1].fld_payload_m.ble_header) == len(ble_header)
+
+    result = list(parse_data_pdu.iter_data_pdus(packet_list))
+    assert len(result) == 1
+    data_pdu = result[0][1]
+    assert (data_pdu.llid_m, data_pdu.length_m) == (ble_header[0] & 0x03 if ble_header else 0, 0)
+    assert data_pdu.get_name() == ""
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_export  # type: ignore
+import parse_PacketData  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_export_csv(tmp_path: Path) -> None:
+    packet_list = parse_PacketData.get_packet_list(make_psd(2))
+    dst_path = tmp_path / "out.csv"
+
+    with parse_export.open_exporter(str(dst_path)) as exporter:
+        exporter.write(packet_list)
+    assert exporter.packet_count_m == 2
+    assert dst_path.read_text().splitlines() == [
+        "1,0,37,0x8e89bed6,-64,True,11,22,33,44,55,66",
+        "2,10,38,0x8e89bed6,-64,True,11,22,33,44,55,66",
+    ]
+
+    with parse_export.open_exporter(str(dst_path), ["no", "rssi"]) as exporter:
+        exporter.write(packet_list)
+    assert dst_path.read_text().splitlines() == ["1,-64", "2,-64"]
+
+
+def test_export_jsonl(tmp_path: Path) -> None:
+    packet_list = parse_PacketData.get_packet_list(make_psd(2))
+    dst_path = tmp_path / "out.jsonl"
+
+    with parse_export.open_exporter(str(dst_path), ["no", "crc_ok", "ble_payload"]) as exporter:
+        exporter.write(packet_list)
+    rows = [json.loads(line) for line in dst_path.read_text().splitlines()]
+    assert rows[1] == {"no": 2, "crc_ok": True, "ble_payload": "112233445566"}
+
+
+def test_export_npz(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    packet_list = parse_PacketData.get_packet_list(make_psd(3))
+    dst_path = tmp_path / "out.npz"
+
+    with parse_export.open_exporter(str(dst_path)) as exporter:
+        exporter.write(packet_list)
+    with np.load(dst_path) as result:
+        assert result["no"].tolist() == [1, 2, 3]
+        assert result["channel"].tolist() == [37, 38, 39]
+        assert result["ble_payload_offset"].tolist() == [0, 6, 12, 18]
+
+
+def test_export_npz_batches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    np = pytest.importorskip("numpy")
+    contents = make_psd(10) + make_record(11, 0x10000, channel=5, access_adrs=0x12345678, ble_payload=b"\x01", crc_ok=False)
+    packet_list = parse_PacketData.get_packet_list(contents)
+    dst_path = tmp_path / "out.npz"
+
+    # 複数回に分けて書き込んだ列を1つの配列にまとめる
+    monkeypatch.setattr(parse_export, "BATCH_PACKET_NUM", 4)
+    with parse_export.open_exporter(str(dst_path), ["no", "crc_ok", "ble_payload"]) as exporter:
+        exporter.write(packet_list[:6])
+        exporter.write(packet_list[6:])
+    with np.load(dst_path) as result:
+        assert sorted(result.files) == ["ble_payload", "ble_payload_offset", "crc_ok", "no"]
+        assert result["no"].tolist() == list(range(1, 12))
+        assert result["crc_ok"].dtype == bool and result["crc_ok"].tolist() == [True] * 10 + [False]
+        assert result["ble_payload_offset"].tolist() == [i * 6 for i in range(11)] + [61]
+        assert result["ble_payload"].tobytes() == b"\x11\x22\x33\x44\x55\x66" * 10 + b"\x01"
+
+    with parse_export.open_exporter(str(dst_path), ["timestamp"]):
+        pass
+    with np.load(dst_path) as result:
+        assert result["timestamp"].shape == (0,)
+
+
+def test_open_exporter_error(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        parse_export.open_exporter(str(tmp_path / "out.txt"))
+    with pytest.raises(ValueError):
+        parse_export.open_exporter(str(tmp_path / "out.csv"), ["unknown"])
+    with pytest.raises(TypeError):
+        parse_export.ExporterCommon(str(tmp_path / "out.txt"))  # type: ignore
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
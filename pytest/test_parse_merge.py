@@ -0,0 +1,44 @@
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_export  # type: ignore
+import parse_merge  # type: ignore
+import parse_PacketData  # type: ignore
+from parse_PSD_head import convert_time_raw  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_merge_psd(tmp_path: Path) -> None:
+    records_a = [make_record(i + 1, convert_time_raw(1000 + i * 30), channel=37) for i in range(10)]
+    records_b = [make_record(i + 1, convert_time_raw(1010 + i * 20), channel=38) for i in range(10)]
+    (tmp_path / "a.psd").write_bytes(b"".join(records_a))
+    (tmp_path / "b.psd").write_bytes(b"".join(records_b))
+    (tmp_path / "empty.psd").write_bytes(b"")
+    src_list = [str(tmp_path / name) for name in ["a.psd", "empty.psd", "b.psd"]]
+
+    packet_list = list(parse_merge.iter_merged_packets(src_list, chunk_packet_num_r=3))
+    assert [pkt.timestamp_m for pkt in packet_list] == sorted([i * 30 for i in range(10)] + [10 + i * 20 for i in range(10)])
+    assert [pkt.source_m for pkt in packet_list[:4]] == [0, 2, 0, 2]
+    restored = pickle.loads(pickle.dumps(packet_list[1]))
+    assert (type(restored), restored.source_m, restored.timestamp_m) == (parse_merge.SourcePacket, 2, 10)
+
+    dst = tmp_path / "merged.psd"
+    assert parse_merge.merge_psd(src_list, str(dst)) == 20
+    assert dst.read_bytes() == b"".join(pkt.get_record() for pkt in packet_list)
+
+    dst = tmp_path / "merged.csv"
+    assert parse_merge.merge_psd(src_list, str(dst), ["source", "timestamp", "channel"]) == 20
+    assert dst.read_text().splitlines()[:3] == ["0,0,37", "2,10,38", "0,30,37"]
+    assert parse_export.format_csv(parse_PacketData.get_packet_list(make_psd(1)), ["source"]) == "0\n"
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_PacketData  # type: ignore
+from parse_packet_table import PacketTable, load_packet_table  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_packet_table(tmp_path: Path) -> None:
+    contents = make_psd(30) + make_record(31, 0x30000, channel=5, access_adrs=0x12345678, ble_payload=b"\x01", crc_ok=False)
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(contents)
+    expected = parse_PacketData.get_packet_list(contents)
+
+    table = load_packet_table(str(psd_path))
+    assert len(table) == 31
+    assert list(table["timestamp"]) == [pkt.timestamp_m for pkt in expected]
+    assert table.get_ble_payload(0) == b"\x11\x22\x33\x44\x55\x66"
+    assert table.get_ble_payload(30) == b"\x01"
+
+    assert table.select(channel_r={37}) == list(range(0, 30, 3))
+    assert table.select(access_adrs_r=0x12345678) == [30]
+    assert table.select(crc_ok_r=False) == [30]
+    assert table.get_time_range(10, 30) == range(1, 3)
+    assert table.select(channel_r={38, 39}, time_range_r=(10, 40)) == [1, 2]
+
+    # 同じ内容の Payload は1つにまとめる
+    assert len(table.pool_m) == 2
+    assert list(table.pool_m.items()) == [(b"\x11\x22\x33\x44\x55\x66", 30), (b"\x01", 1)]
+    assert table["payload_id"][30] == 1
+
+    sub_table = table.take([2, 30])
+    assert isinstance(sub_table, PacketTable)
+    assert list(sub_table["no"]) == [3, 31]
+    assert sub_table.get_ble_payload(1) == b"\x01"
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,91 @@
+import os
+import sys
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, TypeVar
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_anomaly  # type: ignore
+import parse_PacketData  # type: ignore
+import parse_parallel  # type: ignore
+from psd_factory import make_psd, make_record
+
+T = TypeVar("T")
+
+
+def get_no_and_time(packet_list: list) -> list[tuple[int, int]]:
+    """子プロセスでパケット番号とタイムスタンプを取り出す"""
+    return [(pkt.get_no(), pkt.timestamp_m) for pkt in packet_list]
+
+
+def test_map_packet_ranges(tmp_path: Path) -> None:
+    contents = make_psd(100)
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(contents)
+    expected = parse_PacketData.get_packet_list(contents)
+
+    result = [item for items in parse_parallel.map_packet_ranges(str(psd_path), get_no_and_time, 2) for item in items]
+    assert result == [(pkt.get_no(), pkt.timestamp_m) for pkt in expected]
+
+
+def test_map_packet_ranges_anomaly(tmp_path: Path) -> None:
+    contents = b"".join(make_record(i + 1, 0, crc_ok=i % 25 != 0) for i in range(100))
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(contents)
+
+    expected = parse_anomaly.reset_anomaly_tracker()
+    parse_PacketData.get_packet_list(contents)
+    assert expected.counts_m == {parse_anomaly.ANOMALY_CRC_NG: 4}
+
+    # 子プロセスで見つかった異常は1度だけ集計する
+    tracker = parse_anomaly.reset_anomaly_tracker()
+    assert sum(parse_parallel.map_packet_ranges(str(psd_path), len, 2)) == 100
+    assert tracker.counts_m == expected.counts_m
+
+
+def test_map_packet_ranges_pending(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(make_psd(100))
+    submitted: list[int] = []
+
+    class CountingExecutor(ProcessPoolExecutor):
+        def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+            submitted.append(args[2])
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(parse_parallel, "ProcessPoolExecutor", CountingExecutor)
+
+    # 1プロセスで4つの範囲に分割し、結果を取り出していない範囲は2つまでとする
+    pending_num = parse_parallel.PENDING_RANGE_NUM_PER_WORKER
+    result = []
+    for cnt, items in enumerate(parse_parallel.map_packet_ranges(str(psd_path), get_no_and_time, 1), 1):
+        assert len(submitted) <= cnt + pending_num
+        result.extend(items)
+    assert submitted == [0, 25, 50, 75]
+    assert [no for no, _ in result] == list(range(1, 101))
+
+    # 途中で取り出しを止めた場合は、残りの範囲を投入しない
+    submitted.clear()
+    results = parse_parallel.map_packet_ranges(str(psd_path), len, 1)
+    assert next(results) == 25
+    results.close()
+    assert submitted == [0, 25, 50]
+
+
+@pytest.mark.parametrize(
+    "packet_num, worker_num",
+    [(0, 4), (1, 4), (100, 2), (100000, 3)],
+)
+def test_get_packet_ranges(packet_num: int, worker_num: int) -> None:
+    ranges = parse_parallel.get_packet_ranges(packet_num, worker_num)
+    assert [index for start, stop in ranges for index in range(start, stop)] == list(range(packet_num))
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,43 @@
+import os
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_export  # type: ignore
+import parse_PacketData  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_export_pcap(tmp_path: Path) -> None:
+    contents = make_psd(2) + make_record(3, 0x10000, channel=5, access_adrs=0x12345678, rssi_raw=10, crc_ok=False)
+    packet_list = parse_PacketData.get_packet_list(contents)
+    dst_path = tmp_path / "out.pcap"
+
+    with parse_export.open_exporter(str(dst_path)) as exporter:
+        exporter.write(packet_list)
+    result = dst_path.read_bytes()
+
+    magic, _, _, _, _, _, network = struct.unpack_from("<IHHiIII", result, 0)
+    assert (magic, network) == (0xA1B2C3D4, 256)
+
+    offset = 24
+    records = []
+    while offset < len(result):
+        ts_sec, ts_usec, incl_len, _, rf_channel, signal, _, _, _, flags = struct.unpack_from("<IIIIBbbBIH", result, offset)
+        records.append((ts_usec, rf_channel, signal, flags & 0x0800, result[offset + 26 : offset + 16 + incl_len]))
+        offset += 16 + incl_len
+
+    assert records[0] == (0, 0, -64, 0x0800, bytes.fromhex("d6be898e0006112233445566aabbcc"))
+    assert records[1][:4] == (10, 12, -64, 0x0800)
+    assert records[2][:4] == (5000 // 32, 6, -84, 0)
+    assert records[2][4][:4] == bytes.fromhex("78563412")
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,42 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_PacketData  # type: ignore
+from parse_progress import Progress, StageTimer  # type: ignore
+from psd_factory import make_psd
+
+
+def test_progress_rate_limit(capsys: pytest.CaptureFixture) -> None:
+    notified: list[tuple[int, int]] = []
+    progress = Progress(lambda done, total: notified.append((done, total)), rate_hz_r=0.001)
+
+    parse_PacketData.get_packet_list(make_psd(30), progress)
+    assert notified == [(0, 30), (30, 30)]
+
+    parse_PacketData.get_packet_list(make_psd(30), Progress(quiet_r=True))
+    assert capsys.readouterr().out == ""
+
+
+def test_stage_timer() -> None:
+    timer = StageTimer()
+    packet_list = list(parse_PacketData.iter_packets(io.BytesIO(make_psd(30)), 7, timer_r=timer))
+
+    assert len(packet_list) == 30
+    assert set(timer.elapsed_m) == {"read", "decode"}
+    assert "read: " in timer.report()
+
+    total = StageTimer()
+    total.merge(timer)
+    total.merge(timer)
+    assert total.elapsed_m == {stage: elapsed * 2 for stage, elapsed in timer.elapsed_m.items()}
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
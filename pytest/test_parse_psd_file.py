@@ -0,0 +1,80 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_PacketData  # type: ignore
+from parse_psd_file import PsdFile  # type: ignore
+from psd_factory import make_psd
+
+
+def test_psd_file(tmp_path: Path) -> None:
+    contents = make_psd(30)
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(contents + b"\x00" * 100)
+    expected = parse_PacketData.get_packet_list(contents)
+
+    with PsdFile(str(psd_path)) as psd:
+        assert len(psd) == 30
+        assert psd[5].fld_no_m.get_data() == 6
+        assert psd[5].timestamp_m == expected[5].timestamp_m
+        assert psd[-1].fld_no_m.get_data() == 30
+        assert [pkt.timestamp_m for pkt in psd[-10:]] == [pkt.timestamp_m for pkt in expected[-10:]]
+        with pytest.raises(IndexError):
+            psd[30]
+
+
+@pytest.mark.parametrize(
+    "time_us, expected_index",
+    [(-1, 0), (0, 0), (1, 1), (10, 1), (155, 16), (156, 16), (290, 29), (291, 30)],
+)
+def test_psd_file_seek_time(tmp_path: Path, time_us: int, expected_index: int) -> None:
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(make_psd(30))
+
+    with PsdFile(str(psd_path)) as psd:
+        timestamps = [pkt.timestamp_m for pkt in psd[:]]
+        assert psd.seek_time(time_us) == len([t for t in timestamps if t < time_us])
+        assert psd.seek_time(time_us) == expected_index
+
+
+def test_psd_file_time_range(tmp_path: Path) -> None:
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(make_psd(30))
+
+    with PsdFile(str(psd_path)) as psd:
+        window = psd.get_time_range(100, 200)
+        assert window == range(10, 20)
+        assert [pkt.get_no() for pkt in psd[window.start : window.stop]] == list(range(11, 21))
+        assert psd.get_time_range(200, 100) == range(20, 20)
+
+
+def test_psd_file_empty(tmp_path: Path) -> None:
+    psd_path = tmp_path / "empty.psd"
+    psd_path.write_bytes(b"")
+
+    with PsdFile(str(psd_path)) as psd:
+        assert len(psd) == 0
+        assert psd[:] == []
+
+
+def test_psd_file_close_with_buffer(tmp_path: Path) -> None:
+    contents = make_psd(3)
+    psd_path = tmp_path / "test.psd"
+    psd_path.write_bytes(contents)
+
+    # 取得したバッファが残っていても閉じられ、バッファは解放するまで参照できる
+    psd = PsdFile(str(psd_path))
+    buffer = psd.get_buffer()
+    psd.close()
+    assert bytes(buffer) == contents
+    buffer.release()
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_psd_filter  # type: ignore
+from parse_PSD_head import PSD_RECORD_SIZE, convert_time_raw  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_filter_psd(tmp_path: Path) -> None:
+    records = [make_record(i + 1, convert_time_raw(i * 1000), channel=37 + i % 3) for i in range(9)]
+    records.append(make_record(10, convert_time_raw(9000), channel=5, access_adrs=0x12345678))
+    records.append(make_record(11, convert_time_raw(10000), ble_header=b"\x03\x0c", ble_payload=bytes(range(6)) + bytes(range(10, 16))))
+    src = tmp_path / "src.psd"
+    src.write_bytes(b"".join(records))
+
+    dst = str(tmp_path / "dst.psd")
+    assert parse_psd_filter.filter_psd(str(src), dst, channel_r=[38]) == 3
+    assert Path(dst).read_bytes() == records[1] + records[4] + records[7]
+
+    # SCAN_REQ は ScanA の後ろの AdvA で判定する
+    device = parse_psd_filter.parse_device("66:55:44:33:22:11")
+    assert parse_psd_filter.filter_psd(str(src), dst, device_r=device, time_range_r=(2000, 20000)) == 7
+    device = parse_psd_filter.parse_device("0f:0e:0d:0c:0b:0a")
+    assert parse_psd_filter.filter_psd(str(src), dst, device_r=device) == 1
+    assert Path(dst).read_bytes() == records[10]
+    assert parse_psd_filter.filter_psd(str(src), dst, device_r=parse_psd_filter.parse_device("0x12345678")) == 1
+    assert Path(dst).read_bytes() == records[9]
+
+    assert list(parse_psd_filter.get_runs([1, 2, 3, 5, 6, 9], max_num_r=2)) == [(1, 3), (3, 4), (5, 7), (9, 10)]
+
+
+def test_filter_psd_error(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    src = tmp_path / "src.psd"
+    src.write_bytes(make_psd(10))
+
+    def write_records(self: parse_psd_filter.PsdWriter, records_r: bytes | memoryview) -> None:
+        raise OSError("disk full")
+
+    # 絞り込み中のバッファが残っていても、書き込みの例外がそのまま送出される
+    monkeypatch.setattr(parse_psd_filter.PsdWriter, "write_records", write_records)
+    with pytest.raises(OSError, match="disk full"):
+        parse_psd_filter.filter_psd(str(src), str(tmp_path / "dst.psd"), channel_r=[37, 38])
+
+
+def test_split_psd(tmp_path: Path) -> None:
+    contents = make_psd(30)
+    src = tmp_path / "capture.psd"
+    src.write_bytes(contents)
+
+    # 10us間隔のパケットを 70us ごとに分割する
+    path_list = parse_psd_filter.split_psd(str(src), str(tmp_path), period_us_r=70)
+    assert [os.path.basename(path) for path in path_list[:2]] == ["capture_001.psd", "capture_002.psd"]
+    assert [os.path.getsize(path) // PSD_RECORD_SIZE for path in path_list] == [7, 7, 7, 7, 2]
+    assert b"".join(Path(path).read_bytes() for path in path_list) == contents
+
+    path_list = parse_psd_filter.split_psd(str(src), str(tmp_path), size_r=PSD_RECORD_SIZE * 12 + 100)
+    assert [os.path.getsize(path) // PSD_RECORD_SIZE for path in path_list] == [12, 12, 6]
+    with pytest.raises(ValueError):
+        parse_psd_filter.split_psd(str(src), str(tmp_path))
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
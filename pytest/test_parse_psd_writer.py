@@ -0,0 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_PacketData  # type: ignore
+from parse_PSD_head import convert_time_raw, convert_time_us  # type: ignore
+from parse_psd_writer import PsdWriter, pack_payload, pack_record  # type: ignore
+from psd_factory import ADV_ACCESS_ADRS, make_psd, make_record
+
+
+def test_pack_record(tmp_path: Path) -> None:
+    payload = pack_payload(ADV_ACCESS_ADRS, b"\x00\x06", b"\x11\x22\x33\x44\x55\x66", b"\xaa\xbb\xcc", -64, True, 37)
+    assert pack_record(1, 0x10020, payload) == make_record(1, 0x10020)
+    assert convert_time_us(convert_time_raw(123456789)) == 123456789
+
+    contents = make_psd(5)
+    path = tmp_path / "copy.psd"
+    with PsdWriter(str(path)) as writer:
+        writer.write(parse_PacketData.get_packet_list(contents))
+    assert path.read_bytes() == contents
+    assert writer.packet_count_m == 5
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//benchmark"))
+
+
+import parse_columns  # type: ignore
+import parse_PacketData  # type: ignore
+import parse_query  # type: ignore
+import psd_synth  # type: ignore
+from parse_adv_pdu import PDU_TYPE_IND  # type: ignore
+from parse_packet_table import load_packet_table  # type: ignore
+from psd_factory import ADV_ACCESS_ADRS, make_record
+
+
+def test_query_records(tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    path = str(tmp_path / "synth.psd")
+    psd_synth.write_psd(path, 5000)
+    records = parse_columns.load_records(path)
+    with open(path, "rb") as f:
+        packet_list = list(parse_PacketData.iter_packets(f))
+
+    def run(text: str) -> list[int]:
+        compiled = parse_query.compile_filter(text)
+        return [int(index) for chunk in parse_query.query_records(compiled, records, 1000) for index in chunk]
+
+    # PacketData の各フィールドで判定した結果と一致する
+    expected = [
+        i
+        for i, pkt in enumerate(packet_list)
+        if pkt.fld_status_bytes_m.channel_m in (37, 38, 39)
+        and pkt.fld_status_bytes_m.rssi_m > -70
+        and pkt.packet_type_m == parse_PacketData.PACKET_TYPE_ADVERTISING
+        and pkt.adv_pdu_m.self_pdu_type_m == PDU_TYPE_IND
+        and pkt.fld_status_bytes_m.indicate_crc_m
+    ]
+    assert 0 < len(expected) < len(packet_list)
+    assert run("chan in (37,38,39) and rssi > -70 and adv.type == ADV_IND and crc_ok") == expected
+
+    expected = [i for i, pkt in enumerate(packet_list) if pkt.packet_type_m == parse_PacketData.PACKET_TYPE_DATA or pkt.get_no() <= 3]
+    assert run("data or no <= 3") == expected
+    expected = [i for i, pkt in enumerate(packet_list) if pkt.adv_pdu_m is not None and pkt.adv_pdu_m.adv_adrs_m == "c0:55:44:33:22:05"]
+    assert 0 < len(expected)
+    assert run("adv.adrs == 'c0:55:44:33:22:05'") == expected
+    assert run("not (crc_ok or true)") == []
+    assert run("adv.tx_add == 0 and not adv") == []
+    expected = [i for i, pkt in enumerate(packet_list) if pkt.fld_payload_m.access_adrs_m != ADV_ACCESS_ADRS]
+    assert run("timestamp >= 0 and aa not in (0x8E89BED6)") == expected
+
+    table = load_packet_table(path)
+    compiled = parse_query.compile_filter("chan in (37,38,39) and rssi > -70 and adv.type == ADV_IND and crc_ok")
+    assert parse_query.query_table(compiled, table) == run(compiled.text_m)
+    with pytest.raises(ValueError):
+        parse_query.query_table(parse_query.compile_filter("adv.adrs == '00:00:00:00:00:00'"), table)
+    # 一時ディレクトリを削除できるよう、メモリマップを閉じる
+    records._mmap.close()
+
+
+def test_query_reserved_pdu_type() -> None:
+    pytest.importorskip("numpy")
+    # PDU Type が予約値の Advertise Packet も adv に一致し、adv.type は UNKNOWN となる
+    contents = make_record(1, 0, ble_header=b"\x0f\x06") + make_record(2, 0) + make_record(3, 0, channel=5, access_adrs=0x12345678)
+    records = parse_columns.get_records(contents)
+    packet_list = parse_PacketData.get_packet_list(contents)
+    assert [pkt.packet_type_m == parse_PacketData.PACKET_TYPE_ADVERTISING for pkt in packet_list] == [True, True, False]
+
+    def run(text: str) -> list[int]:
+        return [int(index) for chunk in parse_query.query_records(parse_query.compile_filter(text), records) for index in chunk]
+
+    assert run("adv") == [0, 1]
+    assert run("adv and adv.type == UNKNOWN") == [0]
+    assert run("not adv") == [2]
+    assert run("data") == [2]
+    # AdvA を取得できない予約値の PDU Type は adv.adrs に一致しない
+    assert packet_list[0].adv_pdu_m.adv_adrs_m is None
+    assert run("adv.adrs == '66:55:44:33:22:11'") == [1]
+    assert run("adv.adrs != '00:00:00:00:00:00'") == [1]
+
+
+@pytest.mark.parametrize("text", ["rssi >> 3", "foo == 1", "rssi in (1, 2", "adv.adrs == '11:22'", "rssi > ", "crc_ok crc_ok"])
+def test_compile_filter_error(text: str) -> None:
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError):
+        parse_query.compile_filter(text)
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//benchmark"))
+
+
+import parse_spill  # type: ignore
+import psd_synth  # type: ignore
+from parse_packet_table import PacketTable, load_packet_table  # type: ignore
+
+
+def count_payload_ids(table: PacketTable) -> list[int]:
+    """payload_id の列から Payload ごとの受信数を数え直す"""
+    counts = [0] * len(table.pool_m)
+    for payload_id in table["payload_id"]:
+        counts[payload_id] += 1
+    return counts
+
+
+def test_load_packet_table_spilled(tmp_path: Path) -> None:
+    path = str(tmp_path / "synth.psd")
+    psd_synth.write_psd(path, 2500)
+    expected = load_packet_table(path)
+
+    # 既定の最小の使用メモリの上限で、一時ディレクトリに書き出す
+    with parse_spill.load_packet_table_spilled(path, rss_budget_r=parse_spill.SPILL_MIN_RSS_BUDGET) as table:
+        spill_dir = table.spill_dir_m
+        assert len(table) == len(expected)
+        for name in parse_spill.COLUMN_TYPES:
+            assert list(table[name]) == list(expected[name]), name
+        assert list(table.pool_m.counts_m) == list(expected.pool_m.counts_m)
+        assert table.select(channel_r=[37], crc_ok_r=True) == expected.select(channel_r=[37], crc_ok_r=True)
+        assert table.get_time_range(1000, 500000) == expected.get_time_range(1000, 500000)
+    assert not os.path.exists(spill_dir)
+
+    # 書き出し先を指定した場合は残し、再度参照できる
+    spill_dir = str(tmp_path / "spill")
+    parse_spill.load_packet_table_spilled(path, spill_dir).close()
+    with parse_spill.SpilledPacketTable(spill_dir) as table:
+        assert list(table["no"]) == list(expected["no"])
+
+    with pytest.raises(ValueError):
+        parse_spill.load_packet_table_spilled(path, rss_budget_r=parse_spill.SPILL_MIN_RSS_BUDGET - 1)
+
+    (tmp_path / "empty.psd").write_bytes(b"")
+    with parse_spill.load_packet_table_spilled(str(tmp_path / "empty.psd")) as table:
+        assert len(table) == 0 and len(table.pool_m) == 0
+
+
+@pytest.mark.parametrize("payload_id_memory", [parse_spill.SPILL_RSS_BUDGET // 2, 0, 20 * (parse_spill.SPILL_PAYLOAD_ID_MEMORY + 31)])
+def test_write_spill_files(tmp_path: Path, payload_id_memory: int) -> None:
+    path = str(tmp_path / "synth.psd")
+    psd_synth.write_psd(path, 2500)
+    expected = load_packet_table(path)
+
+    # 1024パケットずつ3回に分けて書き出す
+    spill_dir = str(tmp_path / "spill")
+    os.makedirs(spill_dir)
+    assert parse_spill.write_spill_files(path, spill_dir, 1024, payload_id_memory) == len(expected)
+    with parse_spill.SpilledPacketTable(spill_dir) as table:
+        assert [table.get_ble_payload(i) for i in range(len(table))] == [expected.get_ble_payload(i) for i in range(len(expected))]
+        # 後の読み込み単位で加算した受信数も書き出される
+        assert list(table.pool_m.counts_m) == count_payload_ids(table)
+        if payload_id_memory == parse_spill.SPILL_RSS_BUDGET // 2:
+            # 読み込み単位をまたいで同じ Payload を1つにまとめ、メモリ上で作成した場合と同じ格納領域となる
+            assert list(table["payload_id"]) == list(expected["payload_id"])
+            assert list(table.pool_m.counts_m) == list(expected.pool_m.counts_m)
+            assert list(table.pool_m.offsets_m) == list(expected.pool_m.offsets_m)
+            assert bytes(table.pool_m.arena_m) == bytes(expected.pool_m.arena_m)
+        else:
+            # 辞書の使用メモリの上限を超えた場合は、読み込み単位ごとに1つにまとめる
+            assert len(expected.pool_m) < len(table.pool_m)
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
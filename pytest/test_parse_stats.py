@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_columns  # type: ignore
+import parse_PacketData  # type: ignore
+import parse_stats  # type: ignore
+from psd_factory import make_record
+
+
+def make_stats_psd() -> bytes:
+    """テスト用に複数デバイス, 複数channel, CRCエラーを含むPSDファイルの内容を生成する"""
+    return b"".join(
+        [
+            make_record(1, 0, rssi_raw=30),
+            make_record(2, 0x10000, channel=38, rssi_raw=20, ble_payload=bytes.fromhex("010203040506")),
+            make_record(3, 6400 << 16, channel=5, access_adrs=0x12345678, rssi_raw=40),
+            make_record(4, (6400 << 16) + 1, channel=5, access_adrs=0x12345678, rssi_raw=10, crc_ok=False),
+            make_record(5, 6401 << 16, channel=39, rssi_raw=50),
+            # 予約値の PDU Type と AdvA を含まない ADV_IND はデバイスを集計しない
+            make_record(6, 6401 << 16, channel=39, rssi_raw=30, ble_header=b"\x0f\x06"),
+            make_record(7, 6401 << 16, channel=39, rssi_raw=30, ble_header=b"\x40\x06", ble_payload=b""),
+        ]
+    )
+
+
+def test_stats_aggregator() -> None:
+    stats = parse_stats.StatsAggregator().process_all(parse_PacketData.get_packet_list(make_stats_psd()))
+
+    assert (stats.total_m.count_m, stats.total_m.crc_ng_count_m) == (7, 1)
+    assert (stats.total_m.rssi_min_m, stats.total_m.rssi_max_m) == (-84, -44)
+    assert stats.total_m.get_rssi_mean() == -94 + 30
+    assert sum(stats.total_m.histogram_m) == 7
+    assert stats.channels_m[5].get_crc_error_rate() == 0.5
+    assert {parse_stats.convert_device_key(key): value.count_m for key, value in stats.devices_m.items()} == {
+        "66:55:44:33:22:11": 2,
+        "06:05:04:03:02:01": 1,
+        "0x12345678": 1,
+    }
+    assert stats.rate_m == {0: 2, 1: 5}
+    assert "Device 66:55:44:33:22:11 count: 2" in stats.report()
+
+
+def test_stats_aggregator_columns() -> None:
+    pytest.importorskip("numpy")
+    contents = make_stats_psd()
+    expected = parse_stats.StatsAggregator().process_all(parse_PacketData.get_packet_list(contents))
+
+    records = parse_columns.get_records(contents)
+    columns = parse_columns.decode_columns(records)
+    stats = parse_stats.StatsAggregator().add_columns(columns, parse_columns.decode_adv_headers(columns, records)["adv_adrs"])
+    assert stats.report() == expected.report()
+    assert list(stats.total_m.histogram_m) == list(expected.total_m.histogram_m)
+    assert stats.rate_m == expected.rate_m
+
+
+def test_stats_rate_sparse() -> None:
+    # タイムスタンプが大きく飛んでも、受信した秒だけを集計すること
+    contents = make_record(1, 0) + make_record(2, 0xFFFFFFFF0000) + make_record(3, 0xFFFFFFFF0001)
+    stats = parse_stats.StatsAggregator().process_all(parse_PacketData.get_packet_list(contents))
+
+    second = 0xFFFFFFFF * 5000 // 32 // parse_stats.RATE_UNIT_US
+    assert stats.rate_m == {0: 1, second: 2}
+    assert "Rate [packets/s] max: 2, mean: 1.5" in stats.report()
+    if parse_columns.np is not None:
+        records = parse_columns.get_records(contents)
+        assert parse_stats.StatsAggregator().add_columns(parse_columns.decode_columns(records)).rate_m == stats.rate_m
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
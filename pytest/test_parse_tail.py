@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+
+
+import parse_export  # type: ignore
+from parse_PSD_head import PSD_RECORD_SIZE  # type: ignore
+from parse_tail import PsdTail, follow_file  # type: ignore
+from psd_factory import make_psd, make_record
+
+
+def test_psd_tail(tmp_path: Path) -> None:
+    contents = make_psd(5)
+    psd_path = tmp_path / "live.psd"
+
+    with PsdTail(str(psd_path)) as tail:
+        assert tail.read_new() == []
+
+        # 書き込み途中のパケットは解析しない
+        psd_path.write_bytes(contents[: PSD_RECORD_SIZE * 2 + 100])
+        assert [pkt.get_no() for pkt in tail.read_new()] == [1, 2]
+        assert tail.read_new() == []
+
+        with open(psd_path, "ab") as f:
+            f.write(contents[PSD_RECORD_SIZE * 2 + 100 :])
+        result = tail.read_new()
+        assert [pkt.get_no() for pkt in result] == [3, 4, 5]
+        assert [pkt.timestamp_m for pkt in result] == [20, 30, 40]
+        assert tail.offset_m == len(contents)
+
+
+def test_psd_tail_chunk(tmp_path: Path) -> None:
+    psd_path = tmp_path / "live.psd"
+    psd_path.write_bytes(make_psd(5))
+
+    # 既存のファイルは上限のパケット数ずつ解析する
+    with PsdTail(str(psd_path)) as tail:
+        assert [[pkt.get_no() for pkt in tail.read_new(2)] for _ in range(4)] == [[1, 2], [3, 4], [5], []]
+        assert tail.packet_count_m == 5
+
+
+def test_psd_tail_recreated(tmp_path: Path) -> None:
+    psd_path = tmp_path / "live.psd"
+    psd_path.write_bytes(make_psd(2))
+
+    with PsdTail(str(psd_path)) as tail:
+        assert [pkt.get_no() for pkt in tail.read_new()] == [1, 2]
+
+        # 削除して前回より大きなファイルを作り直した場合も先頭から解析する
+        psd_path.unlink()
+        assert tail.read_new() == []
+        psd_path.write_bytes(b"".join(make_record(i + 11, (i * 10) << 16) for i in range(3)))
+        result = tail.read_new()
+        assert [pkt.get_no() for pkt in result] == [11, 12, 13]
+        assert [pkt.timestamp_m for pkt in result] == [0, 10 * 5000 // 32, 20 * 5000 // 32]
+        assert tail.offset_m == PSD_RECORD_SIZE * 3
+
+
+def test_follow_file(tmp_path: Path) -> None:
+    psd_path = tmp_path / "live.psd"
+    psd_path.write_bytes(b"")
+    dst_path = tmp_path / "live.csv"
+    received: list[int] = []
+    stop = threading.Event()
+
+    def on_packets(packet_list: list) -> None:
+        received.extend(pkt.get_no() for pkt in packet_list)
+        if len(received) == 3:
+            stop.set()
+
+    with parse_export.open_exporter(str(dst_path), ["no"]) as exporter:
+        thread = threading.Thread(target=follow_file, args=(str(psd_path), stop, exporter, on_packets, 0.001))
+        thread.start()
+        with open(psd_path, "ab") as f:
+            for record in [make_record(1, 0), make_record(2, 0), make_record(3, 0)]:
+                f.write(record)
+                f.flush()
+        thread.join(5)
+
+    assert received == [1, 2, 3]
+    assert dst_path.read_text().splitlines() == ["1", "2", "3"]
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
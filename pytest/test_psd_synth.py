@@ -0,0 +1,42 @@
+import itertools
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//src//parse"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..//benchmark"))
+
+
+import parse_crc  # type: ignore
+import parse_PacketData  # type: ignore
+import psd_synth  # type: ignore
+from parse_PSD_head import PSD_RECORD_SIZE  # type: ignore
+
+
+def test_psd_synth(tmp_path: Path) -> None:
+    path = str(tmp_path / "synth.psd")
+    psd_synth.write_psd(path, 3000)
+    assert os.path.getsize(path) == 3000 * PSD_RECORD_SIZE
+
+    with open(path, "rb") as f:
+        packet_list = list(parse_PacketData.iter_packets(f))
+    assert [pkt.get_no() for pkt in packet_list] == list(range(1, 3001))
+    assert all(prev.timestamp_m <= pkt.timestamp_m for prev, pkt in itertools.pairwise(packet_list))
+    # CRCエラーのパケットは分類しない
+    assert {pkt.packet_type_m for pkt in packet_list} == {
+        parse_PacketData.PACKET_TYPE_UNKNOWN,
+        parse_PacketData.PACKET_TYPE_ADVERTISING,
+        parse_PacketData.PACKET_TYPE_DATA,
+    }
+
+    # 生成したCRCはステータスのCRC判定と一致する
+    checker = parse_crc.check_crc(packet_list)
+    assert (checker.unknown_count_m, checker.mismatch_count_m) == (0, 0)
+    assert 0 < checker.ng_count_m < len(packet_list) * 0.1
+
+
+# pytestを使ったテストの実行
+if __name__ == "__main__":
+    pytest.main()
@@ -1,49 +1,318 @@
-import io
+import argparse
+import functools
+import glob
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import parse_PacketData
+import parse_export
+import parse_parallel
+from parse_anomaly import AnomalyTracker, reset_anomaly_tracker
+from parse_PacketData import iter_packets
+from parse_progress import Progress, StageTimer
+from parse_PSD_head import PSD_RECORD_SIZE
 
-SRC_FILE_PATH = r"other_in\20240716_2_pc2fpb_2a24-2a00.psd"
-DST_FILE_PATH = r"other_out\output.csv"
+# 入力と出力の既定の保存先
+SRC_DIR_PATH = "other_in"
+DST_DIR_PATH = "other_out"
+
+# ディレクトリを指定した場合に対象とするファイル
+SRC_FILE_PATTERN = "*.psd"
+
+# 既定の出力形式
+DST_FILE_EXT = ".csv"
+
+# 出力する列(Noneの場合は parse_export.DEFAULT_COLUMNS)
+COLUMNS = None
+
+# 解析に使用するプロセス数(Noneの場合はCPU数)
+WORKER_NUM = None
+
+# 進捗を表示しない場合は True
+QUIET = False
+
+# 異常の種類ごとに保持する例の件数
+ANOMALY_SAMPLE_NUM = 0
+
+
+class ConvertResult:
+    """1ファイル分の変換結果"""
+
+    __slots__ = ("src_filepath_m", "packet_count_m", "file_size_m", "elapsed_m", "error_m", "anomaly_m", "timer_m")
+
+    def __init__(self, src_filepath_r: str) -> None:
+        self.src_filepath_m = src_filepath_r
+        self.packet_count_m = 0
+        self.file_size_m = 0
+        self.elapsed_m = 0.0
+        self.error_m: str | None = None
+        self.anomaly_m = AnomalyTracker()
+        self.timer_m = StageTimer()
+
+
+def convert_file(
+    src_filepath_r: str,
+    dst_filepath_r: str,
+    columns_r: list[str] | None = None,
+    worker_num_r: int | None = WORKER_NUM,
+    progress_r: Progress | None = None,
+    timer_r: StageTimer | None = None,
+) -> int:
+    """PSDファイルを1つ変換する
+
+    Args:
+        src_filepath_r (str): PSDファイルのパス
+        dst_filepath_r (str): 出力先のパス. 拡張子で出力形式を選択する
+        columns_r (list[str] | None): 出力する列
+        worker_num_r (int | None): テキスト形式の変換に使用するプロセス数. 1の場合は子プロセスを使用しない
+        progress_r (Progress | None): 進捗の通知先. 省略時は通知しない
+        timer_r (StageTimer | None): 処理段階ごとの経過時間の積算先
+
+    Returns:
+        int: 変換したパケット数
+    """
+    if progress_r is None:
+        progress_r = Progress(quiet_r=True)
+    if timer_r is None:
+        timer_r = StageTimer()
+
+    with parse_export.open_exporter(dst_filepath_r, columns_r) as exporter:
+        if isinstance(exporter, parse_export.TextExporterCommon) and worker_num_r != 1:
+            # テキスト形式は複数プロセスで変換しながら、パケット順に結果出力する
+            total_packet = os.path.getsize(src_filepath_r) // PSD_RECORD_SIZE
+            format_func = functools.partial(parse_export.format_chunk, format_func_r=exporter.format_func_m, columns_r=exporter.columns_m)
+            results = parse_parallel.map_packet_ranges(src_filepath_r, format_func, worker_num_r)
+            while True:
+                # 子プロセスの解析と変換を待つ時間を計測する
+                with timer_r.measure("decode"):
+                    result = next(results, None)
+                if result is None:
+                    break
+
+                text, packet_count = result
+                with timer_r.measure("export"):
+                    exporter.write_text(text, packet_count)
+                progress_r.update(exporter.packet_count_m, total_packet)
+            progress_r.finish(exporter.packet_count_m, total_packet)
+        else:
+            # 対象ファイルをパケット単位で読み込みながら結果出力する
+            with open(src_filepath_r, "rb") as f:
+                exporter.write(iter_packets(f, progress_r=progress_r, timer_r=timer_r), timer_r)
+
+    return exporter.packet_count_m
+
+
+def get_src_filepath_list(path_list_r: list[str]) -> list[str]:
+    """ファイル, ディレクトリ, globパターンから変換対象のPSDファイルを取得する
+
+    Args:
+        path_list_r (list[str]): ファイル, ディレクトリ(直下の *.psd が対象), globパターン
+
+    Returns:
+        list[str]: 重複を除いて名前順に並べたPSDファイルのパス
+    """
+    filepath_set = set()
+    for path in path_list_r:
+        if os.path.isdir(path):
+            filepath_set.update(glob.glob(os.path.join(path, SRC_FILE_PATTERN)))
+        elif os.path.isfile(path):
+            filepath_set.add(path)
+        else:
+            filepath_set.update(filepath for filepath in glob.glob(path, recursive=True) if os.path.isfile(filepath))
+    return sorted(filepath_set)
+
+
+def get_dst_filepath(src_filepath_r: str, dst_dir_r: str, ext_r: str) -> str:
+    """出力先のパスを取得する
+
+    Args:
+        src_filepath_r (str): PSDファイルのパス
+        dst_dir_r (str): 出力先のディレクトリ
+        ext_r (str): 出力形式の拡張子
+
+    Returns:
+        str: 出力先のパス
+    """
+    stem = os.path.splitext(os.path.basename(src_filepath_r))[0]
+    return os.path.join(dst_dir_r, stem + ext_r)
+
+
+def is_up_to_date(src_filepath_r: str, dst_filepath_r: str) -> bool:
+    """出力がPSDファイルより新しいか判定する
+
+    Args:
+        src_filepath_r (str): PSDファイルのパス
+        dst_filepath_r (str): 出力先のパス
+
+    Returns:
+        bool: True: 変換済み
+    """
+    if not os.path.exists(dst_filepath_r):
+        return False
+    return os.path.getmtime(src_filepath_r) <= os.path.getmtime(dst_filepath_r)
+
+
+def run_convert(
+    src_filepath_r: str,
+    dst_filepath_r: str,
+    columns_r: list[str] | None = None,
+    worker_num_r: int | None = 1,
+    progress_r: Progress | None = None,
+    anomaly_sample_num_r: int = ANOMALY_SAMPLE_NUM,
+) -> ConvertResult:
+    """PSDファイルを1つ変換し、失敗しても結果として返す
+
+    変換途中のファイルを変換済みとみなさないよう、一時ファイルに出力してから置き換える
+
+    Args:
+        src_filepath_r (str): PSDファイルのパス
+        dst_filepath_r (str): 出力先のパス
+        columns_r (list[str] | None): 出力する列
+        worker_num_r (int | None): テキスト形式の変換に使用するプロセス数
+        progress_r (Progress | None): 進捗の通知先
+        anomaly_sample_num_r (int): 異常の種類ごとに保持する例の件数
+
+    Returns:
+        ConvertResult: 変換結果
+    """
+    result = ConvertResult(src_filepath_r)
+    result.anomaly_m = reset_anomaly_tracker(anomaly_sample_num_r)
+    stem, ext = os.path.splitext(dst_filepath_r)
+    tmp_filepath = f"{stem}.partial{ext}"
+
+    start = time.perf_counter()
+    try:
+        result.file_size_m = os.path.getsize(src_filepath_r)
+        result.packet_count_m = convert_file(src_filepath_r, tmp_filepath, columns_r, worker_num_r, progress_r, result.timer_m)
+        os.replace(tmp_filepath, dst_filepath_r)
+    except Exception as e:
+        result.error_m = f"{type(e).__name__}: {e}"
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+    result.elapsed_m = time.perf_counter() - start
+    return result
+
+
+def report_results(result_list_r: list[ConvertResult], skip_count_r: int, elapsed_r: float) -> str:
+    """変換結果の集計を文字列で取得する
+
+    Args:
+        result_list_r (list[ConvertResult]): 変換結果
+        skip_count_r (int): 変換済みのため省略したファイル数
+        elapsed_r (float): 全体の経過時間[s]
+
+    Returns:
+        str: 処理量, 処理段階ごとの経過時間, エラー, 異常の集計
+    """
+    ok_list = [result for result in result_list_r if result.error_m is None]
+    ng_list = [result for result in result_list_r if result.error_m is not None]
+    packet_count = sum(result.packet_count_m for result in ok_list)
+    file_size_mb = sum(result.file_size_m for result in ok_list) / (1 << 20)
+
+    lines = [f"Converted: {len(ok_list)}, Skipped: {skip_count_r}, Failed: {len(ng_list)}"]
+    if 0 < elapsed_r:
+        lines.append(
+            f"Packet count: {packet_count}, Elapsed: {elapsed_r:.3f}s, {packet_count / elapsed_r:.0f} packets/s, {file_size_mb / elapsed_r:.1f} MB/s"
+        )
+
+    # 複数ファイルを並列に変換した場合は、各ファイルの経過時間の合計となる
+    timer = StageTimer()
+    for result in ok_list:
+        timer.merge(result.timer_m)
+    if timer.elapsed_m:
+        lines.append(f"Elapsed {timer.report()}")
+    lines.extend(f"Error {result.src_filepath_m}: {result.error_m}" for result in ng_list)
+
+    anomaly = AnomalyTracker(max((result.anomaly_m.sample_num_m for result in result_list_r), default=0))
+    for result in result_list_r:
+        anomaly.merge(result.anomaly_m)
+    lines.append(anomaly.report())
+    return "\n".join(lines)
+
+
+def convert_batch(
+    src_path_list_r: list[str],
+    dst_dir_r: str,
+    ext_r: str = DST_FILE_EXT,
+    columns_r: list[str] | None = COLUMNS,
+    worker_num_r: int | None = WORKER_NUM,
+    force_r: bool = False,
+    quiet_r: bool = QUIET,
+    anomaly_sample_num_r: int = ANOMALY_SAMPLE_NUM,
+) -> list[ConvertResult]:
+    """複数のPSDファイルを変換する
+
+    変換対象が1ファイルの場合はファイル内を、複数の場合はファイル単位で複数プロセスに分担する
+
+    Args:
+        src_path_list_r (list[str]): ファイル, ディレクトリ, globパターン
+        dst_dir_r (str): 出力先のディレクトリ
+        ext_r (str): 出力形式の拡張子
+        columns_r (list[str] | None): 出力する列
+        worker_num_r (int | None): 使用するプロセス数. 省略時はCPU数
+        force_r (bool): True: 変換済みのファイルも変換する
+        quiet_r (bool): True: 進捗を表示しない
+        anomaly_sample_num_r (int): 異常の種類ごとに保持する例の件数
+
+    Returns:
+        list[ConvertResult]: 変換結果
+    """
+    start = time.perf_counter()
+    os.makedirs(dst_dir_r, exist_ok=True)
+
+    job_list = []
+    skip_count = 0
+    for src_filepath in get_src_filepath_list(src_path_list_r):
+        dst_filepath = get_dst_filepath(src_filepath, dst_dir_r, ext_r)
+        if not force_r and is_up_to_date(src_filepath, dst_filepath):
+            skip_count += 1
+            continue
+        job_list.append((src_filepath, dst_filepath))
+
+    result_list = []
+    if len(job_list) == 1:
+        src_filepath, dst_filepath = job_list[0]
+        progress = Progress(quiet_r=quiet_r)
+        result_list.append(run_convert(src_filepath, dst_filepath, columns_r, worker_num_r, progress, anomaly_sample_num_r))
+    elif job_list:
+        with ProcessPoolExecutor(max_workers=worker_num_r) as executor:
+            futures = [
+                executor.submit(run_convert, src_filepath, dst_filepath, columns_r, 1, None, anomaly_sample_num_r)
+                for src_filepath, dst_filepath in job_list
+            ]
+            for cnt, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                result_list.append(result)
+                if not quiet_r:
+                    status = "NG" if result.error_m is not None else "OK"
+                    print(f"[{cnt}/{len(job_list)}] {status} {result.src_filepath_m} ({result.elapsed_m:.3f}s)")
+
+    logging.info(report_results(result_list, skip_count, time.perf_counter() - start))
+    return result_list
 
 
 def main() -> None:
-    # 対象ファイルを読み込む
-    with open(SRC_FILE_PATH, "rb") as f:
-        file_contents = f.read()
-
-    # バイナリデータをパケットデータとして取得
-    packet_list = parse_PacketData.get_packet_list(file_contents)
-    logging.info(f"Packet Count {len(packet_list)}")
-
-    # 結果出力
-    with open(DST_FILE_PATH, "w") as f:
-        for packet in packet_list:
-            result = f"\
-    {packet.fld_no_m.get_data()},\
-    {packet.timestamp_m},\
-    {packet.fld_status_bytes_m.channel_m},\
-    {hex(packet.fld_payload_m.access_adrs_m)},\
-    {packet.fld_status_bytes_m.rssi_m},\
-    {packet.fld_status_bytes_m.indicate_crc_m},\
-    {packet.fld_payload_m.get_ble_payload_hex()},\
-    \r\n"
-            f.write(result)
-
-
-# ログ用のstream用意
-log_stream = io.StringIO()
-
-# ログの設定
-logging.basicConfig(
-    stream=log_stream,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+    parser = argparse.ArgumentParser(description="PSDファイルを一括で変換する")
+    parser.add_argument("src", nargs="*", default=[SRC_DIR_PATH], help="PSDファイル, ディレクトリ, globパターン")
+    parser.add_argument("-o", "--output-dir", default=DST_DIR_PATH, help="出力先のディレクトリ")
+    parser.add_argument("-f", "--format", default=DST_FILE_EXT, choices=list(parse_export.EXPORTER_TYPES), help="出力形式")
+    parser.add_argument("-c", "--columns", nargs="+", default=COLUMNS, help="出力する列")
+    parser.add_argument("-j", "--workers", type=int, default=WORKER_NUM, help="使用するプロセス数")
+    parser.add_argument("--force", action="store_true", help="変換済みのファイルも変換する")
+    parser.add_argument("-q", "--quiet", action="store_true", default=QUIET, help="進捗を表示しない")
+    parser.add_argument("--anomaly-samples", type=int, default=ANOMALY_SAMPLE_NUM, help="異常の種類ごとに表示する例(パケット番号)の件数")
+    args = parser.parse_args()
+
+    result_list = convert_batch(args.src, args.output_dir, args.format, args.columns, args.workers, args.force, args.quiet, args.anomaly_samples)
+    if any(result.error_m is not None for result in result_list):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
+    # ログは蓄積せずに逐次出力する
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
     main()
-
-# ログ出力
-print(log_stream.getvalue())
@@ -1,5 +1,8 @@
 """PSDファイルに格納されたパケットのうち Status bytes を扱う"""
 
+# RSSI に加味するデバイスに応じたオフセット
+RSSI_OFFSET = -94
+
 
 class StatusBytes:
     """Status bytesの情報"""
@@ -14,7 +17,7 @@ class StatusBytes:
     def __set_rssi(self) -> None:
         """RSSIを保持する"""
         # デバイスに応じたオフセットを加味した値を保持する
-        self.rssi_m = -94 + self.raw_data_m[0]
+        self.rssi_m = RSSI_OFFSET + self.raw_data_m[0]
 
     def __set_indicate_crc(self) -> None:
         """CRCの状態を保持する
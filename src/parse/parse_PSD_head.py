@@ -1,5 +1,7 @@
 """PSDファイルに格納されたパケットのうちヘッダ部分を扱う"""
 
+import struct
+
 
 class FieldCommon:
     """パケット内に共通するフィールドの情報"""
@@ -24,6 +26,14 @@ class FieldCommon:
         self.data_m = bytes_data_r[: self.length_m]
         return bytes_data_r[self.length_m :]
 
+    def set_data(self, data_r: bytes) -> None:
+        """切り出し済みのbytesデータをそのまま保持する
+
+        Args:
+            data_r (bytes): フィールド長分のbytesデータ
+        """
+        self.data_m = data_r
+
 
 class FieldInformation(FieldCommon):
     """Packet Information フィールド固有の情報"""
@@ -69,12 +79,38 @@ class FieldTimestamp(FieldCommon):
         Returns:
             int: 取得したタイムスタンプ[us]
         """
-        time_ms = int.from_bytes(self.data_m, "little")
-        time_lo = time_ms & 0xFFFF
-        time_hi = time_ms >> 16
-        time_stamp = time_hi * 5000 + time_lo
-        time_stamp_us = time_stamp / 32
-        return int(time_stamp_us)
+        return convert_time_us(int.from_bytes(self.data_m, "little"))
+
+
+def convert_time_us(time_raw_r: int) -> int:
+    """Timestampフィールドの値を[us]に変換する
+
+    Args:
+        time_raw_r (int): Timestampフィールドの値
+
+    Returns:
+        int: 0起算ではないタイムスタンプ[us]
+    """
+    time_lo = time_raw_r & 0xFFFF
+    time_hi = time_raw_r >> 16
+    time_stamp = time_hi * 5000 + time_lo
+    time_stamp_us = time_stamp / 32
+    return int(time_stamp_us)
+
+
+def convert_time_raw(time_us_r: int) -> int:
+    """[us]をTimestampフィールドの値に変換する
+
+    convert_time_us の逆変換
+
+    Args:
+        time_us_r (int): 0起算ではないタイムスタンプ[us]
+
+    Returns:
+        int: Timestampフィールドの値
+    """
+    time_stamp = time_us_r * 32
+    return ((time_stamp // 5000) << 16) | (time_stamp % 5000)
 
 
 class FieldLength(FieldCommon):
@@ -103,3 +139,18 @@ class FieldPayloadWStatusbytes(FieldCommon):
 
     def __init__(self) -> None:
         super().__init__(self.length_m, self.mean_m)
+
+
+# 1パケット(レコード)分のサイズ
+PSD_RECORD_SIZE = (
+    FieldInformation.length_m + FieldNumber.length_m + FieldTimestamp.length_m + FieldLength.length_m + FieldPayloadWStatusbytes.length_m
+)
+
+# 1パケット(レコード)内の各フィールドの先頭位置
+OFFSET_NUMBER = FieldInformation.length_m
+OFFSET_TIMESTAMP = OFFSET_NUMBER + FieldNumber.length_m
+OFFSET_LENGTH = OFFSET_TIMESTAMP + FieldTimestamp.length_m
+OFFSET_PAYLOAD = OFFSET_LENGTH + FieldLength.length_m
+
+# Payload を除いたフィールドを数値として取り出すための unpacker
+PSD_HEADER_STRUCT = struct.Struct("<BIQH")
@@ -1,6 +1,26 @@
-import logging
+from collections.abc import Callable, Iterator
+from typing import Any, BinaryIO, TypeVar
 
-from parse_adv_pdu import AdvertisePdu
+from parse_adv_pdu import PDU_TYPE_TABLE, PDU_TYPE_UNKNOWN, AdvertisePdu
+from parse_anomaly import (
+    ANOMALY_ADV_AA_ON_DATA_CHANNEL,
+    ANOMALY_CRC_NG,
+    ANOMALY_DATA_AA_ON_ADV_CHANNEL,
+    ANOMALY_INVALID_LENGTH,
+    ANOMALY_UNKNOWN_PDU_TYPE,
+    add_anomaly,
+)
+from parse_progress import Progress, StageTimer, measure_optional
+from parse_PSD_head import (
+    OFFSET_LENGTH,
+    OFFSET_NUMBER,
+    OFFSET_PAYLOAD,
+    OFFSET_TIMESTAMP,
+    PSD_HEADER_STRUCT,
+    PSD_RECORD_SIZE,
+    FieldCommon,
+    convert_time_us,
+)
 from parse_PSD_head import FieldInformation as FInfo
 from parse_PSD_head import FieldLength as FLength
 from parse_PSD_head import FieldNumber as FNumber
@@ -12,29 +32,145 @@ from parse_PSD_SB import StatusBytes
 ADVERTISING_PACKET_ACCESS_ADRS = 0x8E89BED6
 ADVERTISING_PACKET_CHANNEL_LIST = [37, 38, 39]
 
+# パケットの分類
+PACKET_TYPE_UNKNOWN = 0
+PACKET_TYPE_ADVERTISING = 1
+PACKET_TYPE_DATA = 2
+
+# 1回の読み込みで扱うパケット数
+CHUNK_PACKET_NUM = 4096
+
+# Payload 内の各フィールドの先頭位置
+PAYLOAD_OFFSET_ACCESS_ADRS = 1
+PAYLOAD_OFFSET_BLE_HEADER = 5
+PAYLOAD_OFFSET_BLE_PAYLOAD = 7
+
+FieldT = TypeVar("FieldT", bound=FieldCommon)
+
 
 class PacketData:
-    def __init__(self, info_r: FInfo, no_r: FNumber, time_r: FTimeStamp, len_r: FLength, pay_r: FPayloadWSb) -> None:
-        self.fld_info_m = info_r
-        self.fld_no_m = no_r
-        self.fld_timestamp_m = time_r
-        self.fld_length_m = len_r
-        self.fld_payload_w_sb_m = pay_r
+    """PSDファイルに格納された1パケット分の情報
 
-        self.__set_payload()
-        self.__set_status_bytes()
+    共有するbytesデータへの参照と先頭位置のみを保持し、
+    Payload, StatusBytes, AdvertisePdu は最初に参照されたときに解析する
+    """
+
+    __slots__ = ("buffer_m", "offset_m", "timestamp_m", "packet_type_m", "pdu_type_m", "__payload", "__status_bytes", "__adv_pdu")
+
+    def __init__(self, buffer_r: bytes | memoryview, offset_r: int = 0) -> None:
+        self.buffer_m = buffer_r
+        self.offset_m = offset_r
+        self.timestamp_m = 0
+
+        self.__payload: Payload | None = None
+        self.__status_bytes: StatusBytes | None = None
+        self.__adv_pdu: AdvertisePdu | None = None
 
         self.__set_pdu_type()
 
-    def __set_payload(self) -> None:
-        """payloadをbytesデータのまま保持する"""
-        raw_data = self.fld_payload_w_sb_m.data_m[: self.fld_length_m.get_data() - 2]
-        self.fld_payload_m = Payload(raw_data)
+    def __getstate__(self) -> dict[str, Any]:
+        # 共有するbytesデータ全体ではなく、自身のパケット分のみを複製対象とする
+        # 復元時は __init__ を経由しないため、分類をやり直さない(異常を重複して集計しない)
+        # 派生クラスで追加された属性も含め、解析結果のキャッシュ以外を保持する
+        state = {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, "__slots__", ()) if not name.startswith("__")}
+        state["buffer_m"] = self.get_record()
+        state["offset_m"] = 0
+        return state
+
+    def __setstate__(self, state_r: dict[str, Any]) -> None:
+        for name, value in state_r.items():
+            setattr(self, name, value)
+        self.__payload = None
+        self.__status_bytes = None
+        self.__adv_pdu = None
+
+    def get_record(self) -> bytes:
+        """1パケット分のbytesデータを取得する
+
+        Returns:
+            bytes: 1パケット分のbytesデータ
+        """
+        return bytes(self.buffer_m[self.offset_m : self.offset_m + PSD_RECORD_SIZE])
+
+    def __get_field(self, field_r: FieldT, offset_r: int) -> FieldT:
+        """フィールドにbytesデータを格納する"""
+        start = self.offset_m + offset_r
+        field_r.set_data(bytes(self.buffer_m[start : start + field_r.length_m]))
+        return field_r
+
+    @property
+    def fld_info_m(self) -> FInfo:
+        return self.__get_field(FInfo(), 0)
+
+    @property
+    def fld_no_m(self) -> FNumber:
+        return self.__get_field(FNumber(), OFFSET_NUMBER)
+
+    @property
+    def fld_timestamp_m(self) -> FTimeStamp:
+        return self.__get_field(FTimeStamp(), OFFSET_TIMESTAMP)
+
+    @property
+    def fld_length_m(self) -> FLength:
+        return self.__get_field(FLength(), OFFSET_LENGTH)
 
-    def __set_status_bytes(self) -> None:
-        """status bytesをbytesデータのまま保持する"""
-        raw_data = self.fld_payload_w_sb_m.data_m[self.fld_length_m.get_data() - 2 : self.fld_length_m.get_data()]
-        self.fld_status_bytes_m = StatusBytes(raw_data)
+    @property
+    def fld_payload_w_sb_m(self) -> FPayloadWSb:
+        return self.__get_field(FPayloadWSb(), OFFSET_PAYLOAD)
+
+    def get_no(self) -> int:
+        """パケット番号を取得する
+
+        Returns:
+            int: パケット番号
+        """
+        return PSD_HEADER_STRUCT.unpack_from(self.buffer_m, self.offset_m)[1]
+
+    def get_time_us(self) -> int:
+        """0起算ではないタイムスタンプを取得する
+
+        Returns:
+            int: タイムスタンプ[us]
+        """
+        return convert_time_us(PSD_HEADER_STRUCT.unpack_from(self.buffer_m, self.offset_m)[2])
+
+    def get_length(self) -> int:
+        """Payload+StatusBytes長を取得する
+
+        Returns:
+            int: Payload+StatusBytes長
+        """
+        return PSD_HEADER_STRUCT.unpack_from(self.buffer_m, self.offset_m)[3]
+
+    @property
+    def fld_payload_m(self) -> Payload:
+        """payloadを取得する"""
+        if self.__payload is None:
+            raw_data = self.fld_payload_w_sb_m.data_m[: self.get_length() - 2]
+            self.__payload = Payload(raw_data)
+        return self.__payload
+
+    @property
+    def fld_status_bytes_m(self) -> StatusBytes:
+        """status bytesを取得する"""
+        if self.__status_bytes is None:
+            length = self.get_length()
+            raw_data = self.fld_payload_w_sb_m.data_m[length - 2 : length]
+            self.__status_bytes = StatusBytes(raw_data)
+        return self.__status_bytes
+
+    @property
+    def adv_pdu_m(self) -> AdvertisePdu | None:
+        """アドバタイジングパケットの解析結果を取得する
+
+        Returns:
+            AdvertisePdu | None: Advertise Packet ではない場合は None
+        """
+        if self.packet_type_m != PACKET_TYPE_ADVERTISING:
+            return None
+        if self.__adv_pdu is None:
+            self.__adv_pdu = AdvertisePdu(self.fld_payload_m.ble_header, self.fld_payload_m.ble_payload)
+        return self.__adv_pdu
 
     def set_timestamp(self, time_us: int) -> None:
         """0起算のタイムスタンプを保持する
@@ -45,58 +181,176 @@ class PacketData:
         self.timestamp_m = time_us
 
     def __set_pdu_type(self) -> None:
+        """Access Address と Channel からパケットを分類する
+
+        Advertise Packet の場合は BLE Header から PDU Type も取得する
+        Payload, StatusBytes を生成せずに、bytesデータを直接参照する
+        """
+        self.packet_type_m = PACKET_TYPE_UNKNOWN
+        self.pdu_type_m = PDU_TYPE_UNKNOWN
+
+        length = self.get_length()
+        if not 2 <= length <= FPayloadWSb.length_m:
+            # Status bytes を含まない長さは解析しても意味がない
+            add_anomaly(ANOMALY_INVALID_LENGTH, self.get_no)
+            return
+
+        payload_pos = self.offset_m + OFFSET_PAYLOAD
+        crc_ch = self.buffer_m[payload_pos + length - 1]
         # CRCがエラーの場合、解析しても意味がないので何もせずに終了する
-        if self.fld_status_bytes_m.indicate_crc_m is False:
+        if not crc_ch & 0x80:
+            add_anomaly(ANOMALY_CRC_NG, self.get_no)
             return
 
-        if ADVERTISING_PACKET_ACCESS_ADRS == self.fld_payload_m.access_adrs_m:
-            if self.fld_status_bytes_m.channel_m in ADVERTISING_PACKET_CHANNEL_LIST:
+        channel = crc_ch & 0x7F
+        access_adrs = int.from_bytes(
+            self.buffer_m[payload_pos + PAYLOAD_OFFSET_ACCESS_ADRS : payload_pos + min(PAYLOAD_OFFSET_BLE_HEADER, length - 2)], "little"
+        )
+        if ADVERTISING_PACKET_ACCESS_ADRS == access_adrs:
+            if channel in ADVERTISING_PACKET_CHANNEL_LIST:
                 # Access Address と Channelの両方を満足したとき Advertise Packet とみなす
-                AdvertisePdu(self.fld_payload_m.ble_header)
+                self.packet_type_m = PACKET_TYPE_ADVERTISING
+                if length - 2 <= PAYLOAD_OFFSET_BLE_HEADER:
+                    # BLE Header を含まない
+                    add_anomaly(ANOMALY_INVALID_LENGTH, self.get_no)
+                    return
+                self.pdu_type_m = PDU_TYPE_TABLE[self.buffer_m[payload_pos + PAYLOAD_OFFSET_BLE_HEADER]]
+                if self.pdu_type_m == PDU_TYPE_UNKNOWN:
+                    add_anomaly(ANOMALY_UNKNOWN_PDU_TYPE, self.get_no)
             else:
                 # Channelが異なるので読み捨てる
-                logging.warn("Err")
+                add_anomaly(ANOMALY_ADV_AA_ON_DATA_CHANNEL, self.get_no)
         else:
-            if self.fld_status_bytes_m.channel_m in ADVERTISING_PACKET_CHANNEL_LIST:
+            if channel in ADVERTISING_PACKET_CHANNEL_LIST:
                 # Channelが異なるので読み捨てる
-                logging.warn("Err")
+                add_anomaly(ANOMALY_DATA_AA_ON_ADV_CHANNEL, self.get_no)
             else:
                 # Access Address と Channelの両方を満足したとき DataPhys Packet とみなす
-                # logging.debug(f"Phy: {self.fld_payload_m.access_adrs_m}, {self.fld_status_bytes_m.channel_m}")
-                pass
+                self.packet_type_m = PACKET_TYPE_DATA
+
+
+def make_packet(buffer_r: bytes | memoryview, offset_r: int) -> PacketData:
+    """bytesデータの指定位置から1パケット分を切り出す
+
+    bytesデータは複製せず、パケット間で共有する
+
+    Args:
+        buffer_r (bytes | memoryview): PSDファイルの内容
+        offset_r (int): 切り出すパケットの先頭位置
 
+    Returns:
+        PacketData: パケットデータ(タイムスタンプは未設定)
+    """
+    return PacketData(buffer_r, offset_r)
+
+
+def get_packet_list(file_contents_r: bytes, progress_r: Progress | None = None) -> list[PacketData]:
+    """bytesデータをパケット単位に分割して取得する
+
+    ファイル全体を再スライスせず、オフセットを進めながら1度だけ走査する
+    末尾の1パケットに満たないデータは読み捨てる
+
+    Args:
+        file_contents_r (bytes): PSDファイルの内容
+        progress_r (Progress | None): 進捗の通知先. 省略時はコンソールに表示する
+
+    Returns:
+        list[PacketData]: パケットデータのリスト
+    """
+    if progress_r is None:
+        progress_r = Progress()
 
-def get_packet_list(file_contents_r: bytes) -> list[PacketData]:
     # パケット数を計算しておく
-    packet_size = FInfo.length_m + FNumber.length_m + FTimeStamp.length_m + FLength.length_m + FPayloadWSb.length_m
-    total_packet = int(len(file_contents_r) / packet_size)
+    total_packet = len(file_contents_r) // PSD_RECORD_SIZE
 
-    cnt = 0
+    base_time_us = 0
     psd_list: list[PacketData] = []
-    while file_contents_r:
-        print(f"\rGetting... {cnt:0{len(str(total_packet))}}:{total_packet}", end="")
-
-        # フィールド単位で格納する
-        pkt_info = FInfo()
-        pkt_no = FNumber()
-        pkt_time = FTimeStamp()
-        pkt_len = FLength()
-        pkt_payload = FPayloadWSb()
-
-        file_contents_r = pkt_info.hold_data(file_contents_r)
-        file_contents_r = pkt_no.hold_data(file_contents_r)
-        file_contents_r = pkt_time.hold_data(file_contents_r)
-        file_contents_r = pkt_len.hold_data(file_contents_r)
-        file_contents_r = pkt_payload.hold_data(file_contents_r)
-        pkt = PacketData(pkt_info, pkt_no, pkt_time, pkt_len, pkt_payload)
+    for cnt in range(total_packet):
+        progress_r.update(cnt, total_packet)
+
+        pkt = make_packet(file_contents_r, cnt * PSD_RECORD_SIZE)
 
         # タイムスタンプを0リセットする
+        time_us = pkt.get_time_us()
         if 0 == cnt:
-            base_time_us = pkt_time.get_data()
-        pkt.set_timestamp(pkt_time.get_data() - base_time_us)
+            base_time_us = time_us
+        pkt.set_timestamp(time_us - base_time_us)
 
         psd_list.append(pkt)
-        cnt += 1
 
-    print(f"\rCompleted! {cnt}:{total_packet}")
+    progress_r.finish(total_packet, total_packet)
     return psd_list
+
+
+def iter_packets(
+    file_r: BinaryIO,
+    chunk_packet_num_r: int = CHUNK_PACKET_NUM,
+    progress_r: Progress | None = None,
+    timer_r: StageTimer | None = None,
+    base_time_us_r: int | None = None,
+    make_packet_r: Callable[[bytes | memoryview, int], PacketData] = make_packet,
+) -> Iterator[PacketData]:
+    """ファイルからパケットを1つずつ取得する
+
+    まとまった数のパケット単位でファイルを読み込むため、
+    ファイルサイズによらず使用メモリは読み込み単位分に収まる
+    末尾の1パケットに満たないデータは読み捨てる
+
+    Args:
+        file_r (BinaryIO): バイナリモードで開いたPSDファイル
+        chunk_packet_num_r (int): 1回の読み込みで扱うパケット数
+        progress_r (Progress | None): 進捗の通知先. 省略時は通知しない
+        timer_r (StageTimer | None): 読み込み(read)と解析(decode)の経過時間の積算先. 分類は解析に含まれる
+        base_time_us_r (int | None): タイムスタンプの基準点[us]. 省略時は最初のパケットのタイムスタンプ
+        make_packet_r (Callable[[bytes | memoryview, int], PacketData]): パケットデータの生成方法
+
+    Yields:
+        PacketData: タイムスタンプ設定済みのパケットデータ
+    """
+    chunk_size = PSD_RECORD_SIZE * chunk_packet_num_r
+
+    cnt = 0
+    base_time_us = base_time_us_r
+    while True:
+        with measure_optional(timer_r, "read"):
+            chunk = _read_chunk(file_r, chunk_size)
+
+        with measure_optional(timer_r, "decode"):
+            packet_list = [make_packet_r(chunk, offset) for offset in range(0, len(chunk) - PSD_RECORD_SIZE + 1, PSD_RECORD_SIZE)]
+            for pkt in packet_list:
+                # タイムスタンプを0リセットする
+                time_us = pkt.get_time_us()
+                if base_time_us is None:
+                    base_time_us = time_us
+                pkt.set_timestamp(time_us - base_time_us)
+
+        yield from packet_list
+        cnt += len(packet_list)
+        if progress_r is not None:
+            progress_r.update(cnt)
+
+        if len(chunk) < chunk_size:
+            break
+
+    if progress_r is not None:
+        progress_r.finish(cnt)
+
+
+def _read_chunk(file_r: BinaryIO, size_r: int) -> bytes:
+    """指定サイズに達するかファイル終端までデータを読み込む
+
+    Args:
+        file_r (BinaryIO): 読み込み対象のファイル
+        size_r (int): 読み込みたいサイズ
+
+    Returns:
+        bytes: 読み込んだデータ
+    """
+    chunk = file_r.read(size_r)
+    while 0 < len(chunk) < size_r:
+        # パイプ等で読み込みが途中で返った場合は読み足す
+        rest = file_r.read(size_r - len(chunk))
+        if not rest:
+            break
+        chunk += rest
+    return chunk
@@ -1,6 +1,7 @@
 """アドバタイジングパケットの解析を行う"""
 
-import logging
+from collections.abc import Callable
+from typing import Any
 
 PDU_TYPE_IND = 0
 PDU_TYPE_DIRECT_IND = 1
@@ -9,31 +10,194 @@ PDU_TYPE_SCAN_REQ = 3
 PDU_TYPE_SCAN_RSP = 4
 PDU_TYPE_CONNECT_IND = 5
 PDU_TYPE_SCAN_IND = 6
+PDU_TYPE_UNKNOWN = 0xFF
+
+# PDU Type の名称
+PDU_TYPE_NAMES = {
+    PDU_TYPE_IND: "ADV_IND",
+    PDU_TYPE_DIRECT_IND: "ADV_DIRECT_IND",
+    PDU_TYPE_NONCONN_IND: "ADV_NONCONN_IND",
+    PDU_TYPE_SCAN_REQ: "SCAN_REQ",
+    PDU_TYPE_SCAN_RSP: "SCAN_RSP",
+    PDU_TYPE_CONNECT_IND: "CONNECT_IND",
+    PDU_TYPE_SCAN_IND: "ADV_SCAN_IND",
+}
+
+# ヘッダ1byte目の値から各ビットを取り出す変換表
+PDU_TYPE_TABLE = bytes(value & 0x0F if value & 0x0F in PDU_TYPE_NAMES else PDU_TYPE_UNKNOWN for value in range(256))
+CH_SEL_TABLE = bytes((value >> 5) & 0x01 for value in range(256))
+TX_ADD_TABLE = bytes((value >> 6) & 0x01 for value in range(256))
+RX_ADD_TABLE = bytes((value >> 7) & 0x01 for value in range(256))
+
+# BDアドレスの長さ
+BD_ADRS_LENGTH = 6
+
+# PDU Type ごとの Payload の配置: AdvA の位置, 相手のアドレス(TargetA, ScanA, InitA)の位置, AD Structure の位置
+PDU_LAYOUT_TABLE: dict[int, tuple[int, int | None, int | None]] = {
+    PDU_TYPE_IND: (0, None, 6),
+    PDU_TYPE_DIRECT_IND: (0, 6, None),
+    PDU_TYPE_NONCONN_IND: (0, None, 6),
+    PDU_TYPE_SCAN_REQ: (6, 0, None),
+    PDU_TYPE_SCAN_RSP: (0, None, 6),
+    PDU_TYPE_CONNECT_IND: (6, 0, None),
+    PDU_TYPE_SCAN_IND: (0, None, 6),
+}
+
+# CONNECT_IND の LLData の位置と長さ
+LL_DATA_OFFSET = 12
+LL_DATA_LENGTH = 22
+
+# AD Type
+AD_TYPE_FLAGS = 0x01
+AD_TYPE_UUID16_INCOMPLETE = 0x02
+AD_TYPE_UUID16_COMPLETE = 0x03
+AD_TYPE_UUID32_INCOMPLETE = 0x04
+AD_TYPE_UUID32_COMPLETE = 0x05
+AD_TYPE_UUID128_INCOMPLETE = 0x06
+AD_TYPE_UUID128_COMPLETE = 0x07
+AD_TYPE_NAME_SHORT = 0x08
+AD_TYPE_NAME_COMPLETE = 0x09
+AD_TYPE_TX_POWER = 0x0A
+AD_TYPE_MANUFACTURER = 0xFF
+
+
+def convert_bd_adrs(raw_data_r: bytes) -> str:
+    """リトルエンディアンのBDアドレスを文字列に変換する
+
+    Args:
+        raw_data_r (bytes): 6byteのBDアドレス
+
+    Returns:
+        str: コロン区切りのBDアドレス
+    """
+    return raw_data_r[::-1].hex(":")
+
+
+def _split_uuid(size_r: int) -> Callable[[bytes], list[str]]:
+    """UUIDの一覧を取り出す関数を取得する"""
+
+    def split_uuid(data_r: bytes) -> list[str]:
+        return [data_r[i : i + size_r][::-1].hex() for i in range(0, len(data_r) - size_r + 1, size_r)]
+
+    return split_uuid
+
+
+def _decode_manufacturer(data_r: bytes) -> tuple[int, bytes]:
+    """Company ID とデータに分ける"""
+    return int.from_bytes(data_r[:2], "little"), data_r[2:]
+
+
+# AD Type ごとの解析結果を格納する属性と解析方法
+AD_DECODER_TABLE: dict[int, tuple[str, Callable[[bytes], Any]]] = {
+    AD_TYPE_FLAGS: ("flags_m", lambda data: data[0] if data else 0),
+    AD_TYPE_UUID16_INCOMPLETE: ("uuid_list_m", _split_uuid(2)),
+    AD_TYPE_UUID16_COMPLETE: ("uuid_list_m", _split_uuid(2)),
+    AD_TYPE_UUID32_INCOMPLETE: ("uuid_list_m", _split_uuid(4)),
+    AD_TYPE_UUID32_COMPLETE: ("uuid_list_m", _split_uuid(4)),
+    AD_TYPE_UUID128_INCOMPLETE: ("uuid_list_m", _split_uuid(16)),
+    AD_TYPE_UUID128_COMPLETE: ("uuid_list_m", _split_uuid(16)),
+    AD_TYPE_NAME_SHORT: ("local_name_m", lambda data: data.decode("utf-8", "replace")),
+    AD_TYPE_NAME_COMPLETE: ("local_name_m", lambda data: data.decode("utf-8", "replace")),
+    AD_TYPE_TX_POWER: ("tx_power_m", lambda data: int.from_bytes(data[:1], "little", signed=True)),
+    AD_TYPE_MANUFACTURER: ("manufacturer_data_m", _decode_manufacturer),
+}
+
+
+def split_ad_structures(adv_data_r: bytes) -> list[tuple[int, bytes]]:
+    """AdvData を AD Structure 単位に分割する
+
+    Args:
+        adv_data_r (bytes): AdvData または ScanRspData
+
+    Returns:
+        list[tuple[int, bytes]]: AD Type とデータのリスト. AD Type を含まない末尾の Length は読み捨てる
+    """
+    ad_list = []
+    pos = 0
+    data_length = len(adv_data_r)
+    while pos + 1 < data_length:
+        length = adv_data_r[pos]
+        if length == 0:
+            # 残りは未使用領域
+            break
+        # Length が残りのデータを超える場合(受信データの破損など)は残りのデータのみを取り出す
+        ad_list.append((adv_data_r[pos + 1], adv_data_r[pos + 2 : min(pos + 1 + length, data_length)]))
+        pos += 1 + length
+    return ad_list
 
 
 class AdvertisePdu:
-    def __init__(self, raw_data_r: bytes) -> None:
+    """アドバタイジングパケットの解析結果"""
+
+    def __init__(self, raw_data_r: bytes, payload_r: bytes = b"") -> None:
         self.data_m = raw_data_r
+        self.payload_m = payload_r
+
+        self.__set_header()
+        self.__set_payload()
+
+    def __set_header(self) -> None:
+        """ヘッダを解析する"""
+        # 受信データが BLE Header を含まない場合は PDU Type を判別できない
+        value = self.data_m[0] if self.data_m else 0
+        self.self_pdu_type_m = PDU_TYPE_TABLE[value] if self.data_m else PDU_TYPE_UNKNOWN
+        self.ch_sel_m = CH_SEL_TABLE[value]
+        self.tx_add_m = TX_ADD_TABLE[value]
+        self.rx_add_m = RX_ADD_TABLE[value]
+        self.length_m = self.data_m[1] if 1 < len(self.data_m) else 0
+
+    def __set_payload(self) -> None:
+        """PDU Type に応じて Payload を解析する"""
+        self.adv_adrs_m: str | None = None
+        self.target_adrs_m: str | None = None
+        self.ll_data_m = b""
+        self.ad_structures_m: list[tuple[int, bytes]] = []
+        self.flags_m: int | None = None
+        self.local_name_m: str | None = None
+        self.tx_power_m: int | None = None
+        self.uuid_list_m: list[str] = []
+        self.manufacturer_data_m: list[tuple[int, bytes]] = []
+
+        layout = PDU_LAYOUT_TABLE.get(self.self_pdu_type_m)
+        if layout is None:
+            return
+        adv_adrs_pos, target_adrs_pos, ad_pos = layout
+
+        adv_adrs = self.payload_m[adv_adrs_pos : adv_adrs_pos + BD_ADRS_LENGTH]
+        if len(adv_adrs) == BD_ADRS_LENGTH:
+            self.adv_adrs_m = convert_bd_adrs(adv_adrs)
+        if target_adrs_pos is not None:
+            target_adrs = self.payload_m[target_adrs_pos : target_adrs_pos + BD_ADRS_LENGTH]
+            if len(target_adrs) == BD_ADRS_LENGTH:
+                self.target_adrs_m = convert_bd_adrs(target_adrs)
+        if self.self_pdu_type_m == PDU_TYPE_CONNECT_IND:
+            self.ll_data_m = self.payload_m[LL_DATA_OFFSET : LL_DATA_OFFSET + LL_DATA_LENGTH]
+        if ad_pos is not None:
+            self.__set_ad_structures(self.payload_m[ad_pos:])
+
+    def __set_ad_structures(self, adv_data_r: bytes) -> None:
+        """AD Structure を解析する"""
+        self.ad_structures_m = split_ad_structures(adv_data_r)
+        for ad_type, data in self.ad_structures_m:
+            decoder = AD_DECODER_TABLE.get(ad_type)
+            if decoder is None:
+                continue
+
+            attr_name, decode = decoder
+            value = decode(data)
+            if isinstance(getattr(self, attr_name), list):
+                # 複数回現れる可能性のある AD Type は追加する
+                if isinstance(value, list):
+                    getattr(self, attr_name).extend(value)
+                else:
+                    getattr(self, attr_name).append(value)
+            else:
+                setattr(self, attr_name, value)
+
+    def get_pdu_type_name(self) -> str:
+        """PDU Type の名称を取得する
 
-        self.__set_pdu_type()
-
-    def __set_pdu_type(self) -> None:
-        """アドバタイジングパケットを分類する"""
-        value = self.data_m[0] & 0x0F
-        if value == 0:
-            self.self_pdu_type_m = PDU_TYPE_IND
-        elif value == 1:
-            self.self_pdu_type_m = PDU_TYPE_DIRECT_IND
-        elif value == 2:
-            self.self_pdu_type_m = PDU_TYPE_NONCONN_IND
-        elif value == 3:
-            self.self_pdu_type_m = PDU_TYPE_SCAN_REQ
-        elif value == 4:
-            self.self_pdu_type_m = PDU_TYPE_SCAN_RSP
-        elif value == 5:
-            self.self_pdu_type_m = PDU_TYPE_CONNECT_IND
-        elif value == 6:
-            self.self_pdu_type_m = PDU_TYPE_SCAN_IND
-        else:
-            logging.warn(f"Err PDU Type {value}")
-            self.self_pdu_type_m = 0xFF
+        Returns:
+            str: PDU Type の名称
+        """
+        return PDU_TYPE_NAMES.get(self.self_pdu_type_m, "UNKNOWN")
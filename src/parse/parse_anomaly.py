@@ -0,0 +1,104 @@
+"""パケットの分類・解析で見つかった異常を種類ごとに集計する
+
+異常はパケットごとにログ出力せず件数のみを積算し、最後に1度だけ集計結果を出力する
+任意で種類ごとに数件の例(パケット番号など)を保持する
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+# 異常の種類
+ANOMALY_INVALID_LENGTH = "invalid_length"
+ANOMALY_CRC_NG = "crc_ng"
+ANOMALY_ADV_AA_ON_DATA_CHANNEL = "adv_aa_on_data_channel"
+ANOMALY_DATA_AA_ON_ADV_CHANNEL = "data_aa_on_adv_channel"
+ANOMALY_UNKNOWN_PDU_TYPE = "unknown_pdu_type"
+
+# 種類ごとに保持する例の既定の件数
+ANOMALY_SAMPLE_NUM = 0
+
+
+class AnomalyTracker:
+    """異常の件数を種類ごとに積算する"""
+
+    def __init__(self, sample_num_r: int = ANOMALY_SAMPLE_NUM) -> None:
+        self.sample_num_m = sample_num_r
+        self.counts_m: dict[str, int] = {}
+        self.samples_m: dict[str, list[Any]] = {}
+
+    def add(self, category_r: str, sample_r: Callable[[], Any] | None = None) -> None:
+        """異常を1件積算する
+
+        Args:
+            category_r (str): 異常の種類
+            sample_r (Callable[[], Any] | None): 例を取得する関数. 例を保持する場合のみ呼び出す
+        """
+        count = self.counts_m.get(category_r, 0)
+        self.counts_m[category_r] = count + 1
+        if count < self.sample_num_m and sample_r is not None:
+            self.samples_m.setdefault(category_r, []).append(sample_r())
+
+    def merge(self, other_r: "AnomalyTracker") -> None:
+        """別の集計結果(子プロセスの集計など)を加える
+
+        Args:
+            other_r (AnomalyTracker): 加える集計結果
+        """
+        for category, count in other_r.counts_m.items():
+            self.counts_m[category] = self.counts_m.get(category, 0) + count
+        for category, sample_list in other_r.samples_m.items():
+            samples = self.samples_m.setdefault(category, [])
+            samples.extend(sample_list[: max(0, self.sample_num_m - len(samples))])
+
+    def get_total(self) -> int:
+        """全種類の件数の合計を取得する"""
+        return sum(self.counts_m.values())
+
+    def report(self) -> str:
+        """集計結果を文字列で取得する
+
+        Returns:
+            str: 件数の多い順に並べた種類ごとの件数と例
+        """
+        if not self.counts_m:
+            return "Anomaly: none"
+        lines = [f"Anomaly total: {self.get_total()}"]
+        for category, count in sorted(self.counts_m.items(), key=lambda item: -item[1]):
+            line = f"  {category}: {count}"
+            if category in self.samples_m:
+                line += f" (e.g. {', '.join(map(str, self.samples_m[category]))})"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# 分類・解析処理が積算するプロセス内で共通の集計先
+_tracker = AnomalyTracker()
+
+
+def get_anomaly_tracker() -> AnomalyTracker:
+    """プロセス内で共通の集計先を取得する"""
+    return _tracker
+
+
+def reset_anomaly_tracker(sample_num_r: int | None = None) -> AnomalyTracker:
+    """プロセス内で共通の集計先を空にする
+
+    Args:
+        sample_num_r (int | None): 種類ごとに保持する例の件数. 省略時は変更しない
+
+    Returns:
+        AnomalyTracker: 空にした集計先
+    """
+    global _tracker
+    _tracker = AnomalyTracker(_tracker.sample_num_m if sample_num_r is None else sample_num_r)
+    return _tracker
+
+
+def add_anomaly(category_r: str, sample_r: Callable[[], Any] | None = None) -> None:
+    """プロセス内で共通の集計先に異常を1件積算する
+
+    Args:
+        category_r (str): 異常の種類
+        sample_r (Callable[[], Any] | None): 例を取得する関数. 例を保持する場合のみ呼び出す
+    """
+    _tracker.add(category_r, sample_r)
@@ -0,0 +1,206 @@
+"""解析結果をPSDファイルの隣にサイドカーファイルとして保存し、次回以降は再解析せずに利用する
+
+サイドカーファイルはPSDファイルのサイズ、更新日時、先頭と末尾のハッシュ値で元ファイルと対応付け、
+一致しない場合は作り直す
+"""
+
+import glob
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from typing import cast
+
+from parse_intern import PayloadPool
+from parse_packet_table import COLUMN_TYPES, PacketTable, TypeCode, load_packet_table
+
+# サイドカーファイルの拡張子
+SIDECAR_EXT = ".psdc"
+
+# サイドカーファイルの識別子と形式のバージョン
+SIDECAR_MAGIC = b"PSDC"
+SIDECAR_VERSION = 2
+
+# ヘッダ: 識別子, バージョン, PSDファイルのサイズ, 更新日時[ns], ハッシュ値, パケット数, 重複を除いたPayload数, Payload領域のサイズ
+SIDECAR_HEADER_STRUCT = struct.Struct("<4sIQQ16sQQQ")
+
+# ハッシュ値の計算に使用する先頭と末尾のサイズ
+HASH_SAMPLE_SIZE = 1024 * 1024
+
+# 同じディレクトリに置くサイドカーファイルの合計サイズの上限
+CACHE_SIZE_BUDGET = 1024 * 1024 * 1024
+
+# 各列の先頭位置の境界
+ALIGNMENT = 8
+
+
+def get_sidecar_path(filepath_r: str) -> str:
+    """PSDファイルに対応するサイドカーファイルのパスを取得する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        str: サイドカーファイルのパス
+    """
+    return filepath_r + SIDECAR_EXT
+
+
+def calc_file_key(filepath_r: str) -> tuple[int, int, bytes]:
+    """PSDファイルとサイドカーファイルを対応付ける値を取得する
+
+    ファイル全体ではなく先頭と末尾のみをハッシュ値の計算に使用する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        tuple[int, int, bytes]: ファイルサイズ, 更新日時[ns], ハッシュ値
+    """
+    stat = os.stat(filepath_r)
+    hash_obj = hashlib.blake2b(digest_size=16)
+    with open(filepath_r, "rb") as f:
+        hash_obj.update(f.read(HASH_SAMPLE_SIZE))
+        if HASH_SAMPLE_SIZE < stat.st_size:
+            f.seek(max(HASH_SAMPLE_SIZE, stat.st_size - HASH_SAMPLE_SIZE))
+            hash_obj.update(f.read(HASH_SAMPLE_SIZE))
+    return stat.st_size, stat.st_mtime_ns, hash_obj.digest()
+
+
+def _get_padding(size_r: int) -> int:
+    """境界に揃えるために必要なサイズを取得する"""
+    return -size_r % ALIGNMENT
+
+
+def write_sidecar(sidecar_path_r: str, table_r: PacketTable, key_r: tuple[int, int, bytes]) -> None:
+    """テーブルをサイドカーファイルに保存する
+
+    途中で中断しても壊れたファイルが残らないよう、一時ファイルに書き込んでから置き換える
+
+    Args:
+        sidecar_path_r (str): サイドカーファイルのパス
+        table_r (PacketTable): 保存するテーブル
+        key_r (tuple[int, int, bytes]): calc_file_key で取得した値
+    """
+    file_size, mtime_ns, digest = key_r
+    tmp_path = sidecar_path_r + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pool = table_r.pool_m
+        f.write(SIDECAR_HEADER_STRUCT.pack(SIDECAR_MAGIC, SIDECAR_VERSION, file_size, mtime_ns, digest, len(table_r), len(pool), len(pool.arena_m)))
+        f.write(b"\x00" * _get_padding(SIDECAR_HEADER_STRUCT.size))
+        for column in [*[table_r[name] for name in COLUMN_TYPES], pool.offsets_m, pool.counts_m]:
+            column_bytes = memoryview(column).cast("B")
+            f.write(column_bytes)
+            f.write(b"\x00" * _get_padding(len(column_bytes)))
+        f.write(pool.arena_m)
+    os.replace(tmp_path, sidecar_path_r)
+
+
+def read_sidecar(sidecar_path_r: str, key_r: tuple[int, int, bytes]) -> PacketTable | None:
+    """サイドカーファイルをメモリマップしてテーブルとして参照する
+
+    Args:
+        sidecar_path_r (str): サイドカーファイルのパス
+        key_r (tuple[int, int, bytes]): calc_file_key で取得した値
+
+    Returns:
+        PacketTable | None: PSDファイルと対応しない場合は None
+    """
+    if not os.path.isfile(sidecar_path_r):
+        return None
+
+    with open(sidecar_path_r, "rb") as f:
+        if os.fstat(f.fileno()).st_size < SIDECAR_HEADER_STRUCT.size:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, file_size, mtime_ns, digest, packet_num, payload_num, arena_size = SIDECAR_HEADER_STRUCT.unpack_from(buffer, 0)
+    if (magic, version, (file_size, mtime_ns, digest)) != (SIDECAR_MAGIC, SIDECAR_VERSION, key_r):
+        buffer.close()
+        return None
+
+    layout: list[tuple[str, TypeCode, int]] = [
+        *[(name, code, struct.calcsize(code) * packet_num) for name, code in COLUMN_TYPES.items()],
+        ("payload_offset", "Q", struct.calcsize("Q") * (payload_num + 1)),
+        ("payload_count", "Q", struct.calcsize("Q") * payload_num),
+    ]
+    start = SIDECAR_HEADER_STRUCT.size + _get_padding(SIDECAR_HEADER_STRUCT.size)
+    if len(buffer) != start + sum(size + _get_padding(size) for _, _, size in layout) + arena_size:
+        # 書き込み途中で切り詰められたなど、ヘッダと内容が一致しない
+        buffer.close()
+        return None
+
+    view = memoryview(buffer)
+    offset = start
+    columns: dict[str, memoryview] = {}
+    for name, type_code, size in layout:
+        columns[name] = view[offset : offset + size].cast(type_code)
+        offset += size + _get_padding(size)
+
+    # 読み取り専用の memoryview を、同じ型コードの array の代わりに参照させる(追加はできない)
+    arrays = cast(dict[str, array], columns)
+    pool = PayloadPool(cast(bytearray, view[offset : offset + arena_size]), arrays.pop("payload_offset"), arrays.pop("payload_count"))
+
+    # 最近使用したサイドカーファイルを削除対象から外すため、更新日時を更新する
+    os.utime(sidecar_path_r)
+    return PacketTable(arrays, pool)
+
+
+def evict_sidecars(dir_path_r: str, budget_r: int = CACHE_SIZE_BUDGET, keep_path_r: str | None = None) -> list[str]:
+    """サイドカーファイルの合計サイズが上限を超える場合、古いものから削除する
+
+    Args:
+        dir_path_r (str): サイドカーファイルを置いたディレクトリ
+        budget_r (int): 合計サイズの上限
+        keep_path_r (str | None): 削除対象から外すサイドカーファイルのパス
+
+    Returns:
+        list[str]: 削除したサイドカーファイルのパス
+    """
+    sidecar_list = []
+    for path in glob.glob(os.path.join(glob.escape(dir_path_r), "*" + SIDECAR_EXT)):
+        stat = os.stat(path)
+        sidecar_list.append((stat.st_mtime_ns, stat.st_size, path))
+    sidecar_list.sort()
+
+    total_size = sum(size for _, size, _ in sidecar_list)
+    removed_list = []
+    for _, size, path in sidecar_list:
+        if total_size <= budget_r:
+            break
+        if keep_path_r is not None and os.path.samefile(path, keep_path_r):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # 使用中のサイドカーファイルは削除できないので残す
+            continue
+        total_size -= size
+        removed_list.append(path)
+    return removed_list
+
+
+def load_packet_table_cached(filepath_r: str, budget_r: int = CACHE_SIZE_BUDGET) -> PacketTable:
+    """サイドカーファイルを利用してPSDファイルのテーブルを取得する
+
+    サイドカーファイルが無いか古い場合は解析して作り直す
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+        budget_r (int): 同じディレクトリに置くサイドカーファイルの合計サイズの上限
+
+    Returns:
+        PacketTable: 全パケットのテーブル
+    """
+    sidecar_path = get_sidecar_path(filepath_r)
+    key = calc_file_key(filepath_r)
+
+    table = read_sidecar(sidecar_path, key)
+    if table is not None:
+        return table
+
+    table = load_packet_table(filepath_r)
+    write_sidecar(sidecar_path, table, key)
+    evict_sidecars(os.path.dirname(os.path.abspath(sidecar_path)), budget_r, sidecar_path)
+    return table
@@ -0,0 +1,229 @@
+"""PSDファイル全体をNumPyの構造化配列として列単位に解析する
+
+パケットごとのオブジェクトを生成しないため、集計用途では parse_PacketData より高速に動作する
+NumPyがインストールされていない環境では利用できない
+"""
+
+import os
+from collections.abc import Mapping
+from typing import Any
+
+from parse_adv_pdu import BD_ADRS_LENGTH, CH_SEL_TABLE, PDU_LAYOUT_TABLE, PDU_TYPE_TABLE, PDU_TYPE_UNKNOWN, RX_ADD_TABLE, TX_ADD_TABLE
+from parse_PacketData import ADVERTISING_PACKET_ACCESS_ADRS, ADVERTISING_PACKET_CHANNEL_LIST
+from parse_PSD_head import PSD_RECORD_SIZE, FieldInformation, FieldPayloadWStatusbytes
+from parse_PSD_SB import RSSI_OFFSET
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+# StatusBytes の長さ
+STATUS_BYTES_LENGTH = 2
+
+# PayloadData 内の BLE Payload の位置(Length, Access Address, BLE Header の後)
+BLE_PAYLOAD_OFFSET = 7
+
+# PayloadData 末尾のCRCの長さ
+BLE_CRC_LENGTH = 3
+
+# AdvA を取得できないパケットの adv_adrs の値(6byteの整数と重ならない値)
+ADV_ADRS_NONE = 0xFFFFFFFFFFFFFFFF
+
+if np is not None:
+    # PSDファイル1パケット分のレイアウト
+    PSD_RECORD_DTYPE = np.dtype(
+        [
+            ("info", "u1", (FieldInformation.length_m,)),
+            ("no", "<u4"),
+            ("time", "<u8"),
+            ("length", "<u2"),
+            ("payload", "u1", (FieldPayloadWStatusbytes.length_m,)),
+        ]
+    )
+
+
+def is_available() -> bool:
+    """NumPyによる解析が利用できるか判定する
+
+    Returns:
+        bool: 利用できる:True, 利用できない:False
+    """
+    return np is not None
+
+
+def _check_available() -> None:
+    """NumPyが利用できない場合は例外を送出する"""
+    if np is None:
+        raise ImportError("NumPyがインストールされていません")
+
+
+def get_records(buffer_r: bytes | memoryview) -> "np.ndarray":
+    """bytesデータを構造化配列として参照する
+
+    データはコピーせず、末尾の1パケットに満たないデータは読み捨てる
+
+    Args:
+        buffer_r (bytes | memoryview): PSDファイルの内容
+
+    Returns:
+        np.ndarray: PSD_RECORD_DTYPE の配列
+    """
+    _check_available()
+    return np.frombuffer(buffer_r, dtype=PSD_RECORD_DTYPE, count=len(buffer_r) // PSD_RECORD_SIZE)
+
+
+def load_records(filepath_r: str) -> "np.ndarray":
+    """PSDファイルをメモリマップして構造化配列として参照する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        np.ndarray: PSD_RECORD_DTYPE の配列
+    """
+    _check_available()
+    packet_num = os.path.getsize(filepath_r) // PSD_RECORD_SIZE
+    if 0 == packet_num:
+        return np.zeros(0, dtype=PSD_RECORD_DTYPE)
+    return np.memmap(filepath_r, dtype=PSD_RECORD_DTYPE, mode="r", shape=(packet_num,))
+
+
+def convert_time_us(time_raw_r: "np.ndarray") -> "np.ndarray":
+    """Timestampフィールドの値をまとめて[us]に変換する
+
+    FieldTimestamp.get_data と同じ計算を行う
+
+    Args:
+        time_raw_r (np.ndarray): Timestampフィールドの値
+
+    Returns:
+        np.ndarray: 0起算ではないタイムスタンプ[us]
+    """
+    time_raw = time_raw_r.astype(np.int64)
+    time_lo = time_raw & 0xFFFF
+    time_hi = time_raw >> 16
+    return (time_hi * 5000 + time_lo) // 32
+
+
+def decode_columns(records_r: "np.ndarray", base_time_us_r: int | None = None) -> dict[str, "np.ndarray"]:
+    """構造化配列から各フィールドを列単位で取得する
+
+    Args:
+        records_r (np.ndarray): PSD_RECORD_DTYPE の配列
+        base_time_us_r (int | None): タイムスタンプの基準点. 省略時は先頭パケットを基準点(0)とする
+
+    Returns:
+        dict[str, np.ndarray]: 列名をキーとした各フィールドの値
+            no: パケット番号
+            timestamp: 0起算のタイムスタンプ[us]
+            length: Payload+StatusBytes長
+            rssi: RSSI
+            crc_ok: CRCの状態 True: OK、False: NG
+            channel: channel
+            access_adrs: Access Address
+            ble_header: BLE Header(1byte目を下位とした値)
+    """
+    _check_available()
+    packet_num = len(records_r)
+    payload = records_r["payload"]
+    length = records_r["length"].astype(np.int64)
+
+    # Status bytes は Payload の直後にある
+    sb_pos = np.clip(length - STATUS_BYTES_LENGTH, 0, FieldPayloadWStatusbytes.length_m - STATUS_BYTES_LENGTH)
+    rows = np.arange(packet_num)
+    sb_rssi = payload[rows, sb_pos]
+    sb_crc_ch = payload[rows, sb_pos + 1]
+
+    # Access Address はリトルエンディアンの4byte
+    access_adrs_bytes = payload[:, 1:5].astype(np.uint32)
+    access_adrs = access_adrs_bytes[:, 0] | (access_adrs_bytes[:, 1] << 8) | (access_adrs_bytes[:, 2] << 16) | (access_adrs_bytes[:, 3] << 24)
+
+    # BLE Header はリトルエンディアンの2byte
+    ble_header = payload[:, 5].astype(np.uint16) | (payload[:, 6].astype(np.uint16) << 8)
+
+    time_us = convert_time_us(records_r["time"])
+    if base_time_us_r is None:
+        base_time_us_r = int(time_us[0]) if 0 < packet_num else 0
+
+    return {
+        "no": records_r["no"].astype(np.uint32),
+        "timestamp": time_us - base_time_us_r,
+        "length": length.astype(np.uint16),
+        "rssi": sb_rssi.astype(np.int16) + RSSI_OFFSET,
+        "crc_ok": (sb_crc_ch & 0x80) != 0,
+        "channel": (sb_crc_ch & 0x7F).astype(np.uint8),
+        "access_adrs": access_adrs,
+        "ble_header": ble_header,
+    }
+
+
+def is_advertising(columns_r: Mapping[str, "np.ndarray"]) -> "np.ndarray":
+    """Advertise Packet とみなせるパケットを判定する
+
+    Args:
+        columns_r (Mapping[str, np.ndarray]): decode_columns で取得した列
+
+    Returns:
+        np.ndarray: Advertise Packet:True, それ以外:False
+    """
+    _check_available()
+    return (columns_r["access_adrs"] == ADVERTISING_PACKET_ACCESS_ADRS) & np.isin(columns_r["channel"], ADVERTISING_PACKET_CHANNEL_LIST)
+
+
+def decode_adv_headers(columns_r: Mapping[str, Any], records_r: "np.ndarray | None" = None) -> dict[str, "np.ndarray"]:
+    """Advertise Packet のヘッダを列単位でまとめて解析する
+
+    AdvertisePdu と同じ変換表を使用し、CRCがOKの Advertise Packet 以外の pdu_type は PDU_TYPE_UNKNOWN とする
+    PacketTable の列も同様に扱える
+
+    Args:
+        columns_r (Mapping[str, Any]): access_adrs, channel, crc_ok, ble_header を含む列(np.ndarray または PacketTable の列)
+        records_r (np.ndarray | None): PSD_RECORD_DTYPE の配列. 指定した場合は AdvA も取得する
+
+    Returns:
+        dict[str, np.ndarray]: 列名をキーとした各ビットの値
+            pdu_type: PDU Type
+            ch_sel: ChSel
+            tx_add: TxAdd
+            rx_add: RxAdd
+            adv_length: Length
+            adv_adrs: AdvA(records_r を指定した場合のみ. リトルエンディアンの6byteを整数とした値)
+                AdvertisePdu.adv_adrs_m が None となるパケット(予約値の PDU Type, AdvA を含まない長さ)は ADV_ADRS_NONE
+            has_adv_adrs: AdvA を取得できたパケット:True(records_r を指定した場合のみ)
+    """
+    _check_available()
+    columns = {name: np.asarray(columns_r[name]) for name in ["access_adrs", "channel", "crc_ok", "ble_header"]}
+    is_adv = is_advertising(columns) & (columns["crc_ok"] != 0)
+    header_lo = (columns["ble_header"] & 0xFF).astype(np.uint8)
+    header_hi = (columns["ble_header"] >> 8).astype(np.uint8)
+
+    pdu_type = np.where(is_adv, np.frombuffer(PDU_TYPE_TABLE, dtype=np.uint8)[header_lo], PDU_TYPE_UNKNOWN).astype(np.uint8)
+    result = {
+        "pdu_type": pdu_type,
+        "ch_sel": np.frombuffer(CH_SEL_TABLE, dtype=np.uint8)[header_lo],
+        "tx_add": np.frombuffer(TX_ADD_TABLE, dtype=np.uint8)[header_lo],
+        "rx_add": np.frombuffer(RX_ADD_TABLE, dtype=np.uint8)[header_lo],
+        "adv_length": header_hi,
+    }
+
+    if records_r is not None:
+        # PDU Type ごとの AdvA の位置から6byteを取り出す. AdvA を持たない PDU Type の位置は -1 とする
+        adv_adrs_pos = np.full(256, -1, dtype=np.int64)
+        for type_value, (pos, _, _) in PDU_LAYOUT_TABLE.items():
+            adv_adrs_pos[type_value] = pos
+        adv_adrs_start = adv_adrs_pos[pdu_type]
+        # AdvertisePdu と同様に、受信した BLE Payload の長さ(Length フィールドではない)に AdvA が収まる場合のみ取得する
+        ble_payload_length = records_r["length"].astype(np.int64) - (STATUS_BYTES_LENGTH + BLE_PAYLOAD_OFFSET + BLE_CRC_LENGTH)
+        has_adv_adrs = is_adv & (0 <= adv_adrs_start) & (adv_adrs_start + BD_ADRS_LENGTH <= ble_payload_length)
+
+        start = BLE_PAYLOAD_OFFSET + np.maximum(adv_adrs_start, 0)
+        rows = np.arange(len(records_r))
+        payload = records_r["payload"]
+        adv_adrs = np.zeros(len(records_r), dtype=np.uint64)
+        for i in range(BD_ADRS_LENGTH):
+            adv_adrs |= payload[rows, start + i].astype(np.uint64) << np.uint64(8 * i)
+        result["adv_adrs"] = np.where(has_adv_adrs, adv_adrs, np.uint64(ADV_ADRS_NONE))
+        result["has_adv_adrs"] = has_adv_adrs
+
+    return result
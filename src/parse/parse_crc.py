@@ -0,0 +1,168 @@
+"""BLEパケットのCRC-24を計算し、スニファが判定したCRCの状態と照合する
+
+CRCの初期値は Advertise Packet では 0x555555、データチャネルパケットでは CONNECT_IND の CRCInit を使用する
+"""
+
+from collections.abc import Iterable
+
+from parse_data_pdu import ConnectionTracker
+from parse_PacketData import ADVERTISING_PACKET_ACCESS_ADRS, PacketData
+from parse_PSD_head import OFFSET_PAYLOAD
+
+# Advertise Packet のCRC初期値
+ADVERTISING_CRC_INIT = 0x555555
+
+# 生成多項式 x^24 + x^10 + x^9 + x^6 + x^4 + x^3 + x + 1 を送信順(LSB first)に合わせてビット反転した値
+CRC_POLY_REFLECTED = 0xDA6000
+
+# CRCの長さ
+CRC_LENGTH = 3
+
+# 不一致として記録するパケット番号の上限
+MAX_MISMATCH_SAMPLE = 100
+
+
+# 1byte のビット順を反転する変換表
+_REVERSE_BYTE_TABLE = tuple(int(f"{value:08b}"[::-1], 2) for value in range(256))
+
+
+def reverse_bits24(value_r: int) -> int:
+    """24bitの値のビット順を反転する
+
+    Args:
+        value_r (int): 24bitの値
+
+    Returns:
+        int: ビット順を反転した値
+    """
+    table = _REVERSE_BYTE_TABLE
+    return (table[value_r & 0xFF] << 16) | (table[(value_r >> 8) & 0xFF] << 8) | table[(value_r >> 16) & 0xFF]
+
+
+def _make_crc_table() -> tuple[int, ...]:
+    """1byte分のシフトをまとめた変換表を作成する"""
+    table = []
+    for value in range(256):
+        crc = value
+        for _ in range(8):
+            crc = (crc >> 1) ^ CRC_POLY_REFLECTED if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _make_crc_table()
+
+# ビット反転済みの Advertise Packet のCRC初期値
+_ADVERTISING_CRC_INIT_REFLECTED = reverse_bits24(ADVERTISING_CRC_INIT)
+
+
+def calc_crc24(crc_init_r: int, data_r: bytes | memoryview) -> int:
+    """PDU(ヘッダとPayload)のCRCを計算する
+
+    Args:
+        crc_init_r (int): CRC初期値
+        data_r (bytes | memoryview): PDU
+
+    Returns:
+        int: 送信されるCRCの3byteをリトルエンディアンとして読んだ値
+    """
+    table = CRC_TABLE
+    crc = reverse_bits24(crc_init_r)
+    for byte in data_r:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+class CrcChecker:
+    """パケットのCRCを計算し、スニファが判定したCRCの状態との不一致を集計する
+
+    データチャネルパケットのCRC初期値を得るため、CONNECT_IND を含めて受信順にパケットを渡す
+    """
+
+    def __init__(self, tracker_r: ConnectionTracker | None = None) -> None:
+        self.tracker_m = tracker_r if tracker_r is not None else ConnectionTracker()
+        self.checked_count_m = 0
+        self.ng_count_m = 0
+        self.unknown_count_m = 0
+        self.mismatch_count_m = 0
+        self.mismatch_list_m: list[int] = []
+
+    def process(self, packet_r: PacketData) -> bool | None:
+        """パケットのCRCを確認する
+
+        Args:
+            packet_r (PacketData): 受信順に渡すパケットデータ
+
+        Returns:
+            bool | None: CRC一致:True, 不一致:False, CRC初期値が不明:None
+        """
+        self.tracker_m.process(packet_r)
+
+        length = packet_r.get_length()
+        buffer = packet_r.buffer_m
+        payload_pos = packet_r.offset_m + OFFSET_PAYLOAD
+        # Length(1byte), Access Address(4byte) の後に PDU, CRC, Status bytes(2byte) が続く
+        pdu_start = payload_pos + 5
+        crc_start = payload_pos + length - 2 - CRC_LENGTH
+        if crc_start < pdu_start:
+            self.unknown_count_m += 1
+            return None
+
+        access_adrs = int.from_bytes(buffer[payload_pos + 1 : pdu_start], "little")
+        crc_init = self.__get_crc_init(access_adrs)
+        if crc_init is None:
+            self.unknown_count_m += 1
+            return None
+
+        table = CRC_TABLE
+        crc = crc_init
+        for byte in buffer[pdu_start:crc_start]:
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        is_ok = crc == int.from_bytes(buffer[crc_start : crc_start + CRC_LENGTH], "little")
+
+        self.checked_count_m += 1
+        if not is_ok:
+            self.ng_count_m += 1
+        if is_ok != bool(buffer[payload_pos + length - 1] & 0x80):
+            self.mismatch_count_m += 1
+            if len(self.mismatch_list_m) < MAX_MISMATCH_SAMPLE:
+                self.mismatch_list_m.append(packet_r.get_no())
+        return is_ok
+
+    def __get_crc_init(self, access_adrs_r: int) -> int | None:
+        """Access Address に対応するビット反転済みのCRC初期値を取得する
+
+        接続の破棄や Access Address の再利用に追従するため、毎回 ConnectionTracker から引き直す
+        """
+        if access_adrs_r == ADVERTISING_PACKET_ACCESS_ADRS:
+            return _ADVERTISING_CRC_INIT_REFLECTED
+        connection = self.tracker_m.get_connection(access_adrs_r)
+        if connection is None:
+            return None
+        return reverse_bits24(connection.crc_init_m)
+
+    def report(self) -> str:
+        """集計結果を文字列で取得する
+
+        Returns:
+            str: 集計結果
+        """
+        return (
+            f"CRC checked: {self.checked_count_m}, NG: {self.ng_count_m}, unknown CRCInit: {self.unknown_count_m}, "
+            f"mismatch with status bytes: {self.mismatch_count_m} {self.mismatch_list_m}"
+        )
+
+
+def check_crc(packets_r: Iterable[PacketData]) -> CrcChecker:
+    """全パケットのCRCを確認する
+
+    Args:
+        packets_r (Iterable[PacketData]): 受信順のパケットデータ
+
+    Returns:
+        CrcChecker: 集計結果
+    """
+    checker = CrcChecker()
+    for packet in packets_r:
+        checker.process(packet)
+    return checker
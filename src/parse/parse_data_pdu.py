@@ -0,0 +1,314 @@
+"""データチャネルパケットの解析を行う
+
+CONNECT_IND から接続ごとの Access Address を学習し、
+以降のパケットを LL Control, L2CAP, ATT として解析する
+"""
+
+import struct
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+
+from parse_adv_pdu import PDU_TYPE_CONNECT_IND
+from parse_PacketData import PACKET_TYPE_ADVERTISING, PACKET_TYPE_DATA, PacketData
+
+# LLID
+LLID_DATA_CONTINUE = 1
+LLID_DATA_START = 2
+LLID_CONTROL = 3
+
+# LL Control PDU の Opcode の名称
+LL_CONTROL_NAMES = {
+    0x00: "LL_CONNECTION_UPDATE_IND",
+    0x01: "LL_CHANNEL_MAP_IND",
+    0x02: "LL_TERMINATE_IND",
+    0x03: "LL_ENC_REQ",
+    0x04: "LL_ENC_RSP",
+    0x05: "LL_START_ENC_REQ",
+    0x06: "LL_START_ENC_RSP",
+    0x07: "LL_UNKNOWN_RSP",
+    0x08: "LL_FEATURE_REQ",
+    0x09: "LL_FEATURE_RSP",
+    0x0A: "LL_PAUSE_ENC_REQ",
+    0x0B: "LL_PAUSE_ENC_RSP",
+    0x0C: "LL_VERSION_IND",
+    0x0D: "LL_REJECT_IND",
+    0x0E: "LL_PERIPHERAL_FEATURE_REQ",
+    0x0F: "LL_CONNECTION_PARAM_REQ",
+    0x10: "LL_CONNECTION_PARAM_RSP",
+    0x11: "LL_REJECT_EXT_IND",
+    0x12: "LL_PING_REQ",
+    0x13: "LL_PING_RSP",
+    0x14: "LL_LENGTH_REQ",
+    0x15: "LL_LENGTH_RSP",
+    0x16: "LL_PHY_REQ",
+    0x17: "LL_PHY_RSP",
+    0x18: "LL_PHY_UPDATE_IND",
+    0x19: "LL_MIN_USED_CHANNELS_IND",
+}
+LL_CONTROL_TERMINATE_IND = 0x02
+
+# L2CAP の Channel ID
+L2CAP_CID_ATT = 0x0004
+L2CAP_CID_LE_SIGNALING = 0x0005
+L2CAP_CID_SMP = 0x0006
+L2CAP_HEADER_STRUCT = struct.Struct("<HH")
+
+# ATT の Opcode の名称
+ATT_OPCODE_NAMES = {
+    0x01: "ATT_ERROR_RSP",
+    0x02: "ATT_EXCHANGE_MTU_REQ",
+    0x03: "ATT_EXCHANGE_MTU_RSP",
+    0x04: "ATT_FIND_INFORMATION_REQ",
+    0x05: "ATT_FIND_INFORMATION_RSP",
+    0x06: "ATT_FIND_BY_TYPE_VALUE_REQ",
+    0x07: "ATT_FIND_BY_TYPE_VALUE_RSP",
+    0x08: "ATT_READ_BY_TYPE_REQ",
+    0x09: "ATT_READ_BY_TYPE_RSP",
+    0x0A: "ATT_READ_REQ",
+    0x0B: "ATT_READ_RSP",
+    0x0C: "ATT_READ_BLOB_REQ",
+    0x0D: "ATT_READ_BLOB_RSP",
+    0x0E: "ATT_READ_MULTIPLE_REQ",
+    0x0F: "ATT_READ_MULTIPLE_RSP",
+    0x10: "ATT_READ_BY_GROUP_TYPE_REQ",
+    0x11: "ATT_READ_BY_GROUP_TYPE_RSP",
+    0x12: "ATT_WRITE_REQ",
+    0x13: "ATT_WRITE_RSP",
+    0x16: "ATT_PREPARE_WRITE_REQ",
+    0x17: "ATT_PREPARE_WRITE_RSP",
+    0x18: "ATT_EXECUTE_WRITE_REQ",
+    0x19: "ATT_EXECUTE_WRITE_RSP",
+    0x1B: "ATT_HANDLE_VALUE_NTF",
+    0x1D: "ATT_HANDLE_VALUE_IND",
+    0x1E: "ATT_HANDLE_VALUE_CFM",
+    0x52: "ATT_WRITE_CMD",
+    0xD2: "ATT_SIGNED_WRITE_CMD",
+}
+ATT_OPCODE_ERROR_RSP = 0x01
+
+# Opcode の直後に Attribute Handle を持つ ATT の Opcode
+ATT_HANDLE_OPCODES = frozenset([0x0A, 0x0C, 0x12, 0x16, 0x17, 0x1B, 0x1D, 0x52, 0xD2])
+
+# CONNECT_IND の LLData: AA, CRCInit, WinSize, WinOffset, Interval, Latency, Timeout, ChM, Hop+SCA
+LL_DATA_STRUCT = struct.Struct("<I3sBHHHH5sB")
+
+# 同時に保持する接続の上限
+MAX_CONNECTION_NUM = 1024
+
+
+class Connection:
+    """CONNECT_IND から学習した接続の情報と、L2CAP の再構築状態"""
+
+    __slots__ = (
+        "access_adrs_m",
+        "crc_init_m",
+        "interval_m",
+        "latency_m",
+        "timeout_m",
+        "channel_map_m",
+        "hop_m",
+        "init_adrs_m",
+        "adv_adrs_m",
+        "packet_count_m",
+        "terminated_m",
+        "__fragment",
+        "__fragment_length",
+    )
+
+    def __init__(self, ll_data_r: bytes, init_adrs_r: str | None = None, adv_adrs_r: str | None = None) -> None:
+        access_adrs, crc_init, _, _, interval, latency, timeout, channel_map, hop_sca = LL_DATA_STRUCT.unpack(ll_data_r)
+        self.access_adrs_m = access_adrs
+        self.crc_init_m = int.from_bytes(crc_init, "little")
+        self.interval_m = interval
+        self.latency_m = latency
+        self.timeout_m = timeout
+        self.channel_map_m = int.from_bytes(channel_map, "little")
+        self.hop_m = hop_sca & 0x1F
+        self.init_adrs_m = init_adrs_r
+        self.adv_adrs_m = adv_adrs_r
+        self.packet_count_m = 0
+        self.terminated_m = False
+
+        self.__fragment: bytearray | None = None
+        self.__fragment_length = 0
+
+    def reassemble(self, llid_r: int, payload_r: bytes) -> bytes | None:
+        """L2CAP のフラグメントを結合する
+
+        送信方向は区別できないため、結合途中に新たな開始フラグメントを受信した場合は結合途中のデータを破棄する
+
+        Args:
+            llid_r (int): LLID
+            payload_r (bytes): BLE Payload
+
+        Returns:
+            bytes | None: 結合が完了した L2CAP の PDU(ヘッダを含む). 未完了の場合は None
+        """
+        if llid_r == LLID_DATA_START:
+            if len(payload_r) < L2CAP_HEADER_STRUCT.size:
+                self.__fragment = None
+                return None
+            self.__fragment = bytearray(payload_r)
+            self.__fragment_length = L2CAP_HEADER_STRUCT.size + L2CAP_HEADER_STRUCT.unpack_from(payload_r)[0]
+        elif llid_r == LLID_DATA_CONTINUE and self.__fragment is not None:
+            if not payload_r:
+                # Empty PDU は結合対象としない
+                return None
+            self.__fragment += payload_r
+        else:
+            return None
+
+        if len(self.__fragment) < self.__fragment_length:
+            return None
+        l2cap = bytes(self.__fragment[: self.__fragment_length])
+        self.__fragment = None
+        return l2cap
+
+
+class DataPdu:
+    """データチャネルパケットの解析結果"""
+
+    __slots__ = (
+        "connection_m",
+        "llid_m",
+        "nesn_m",
+        "sn_m",
+        "md_m",
+        "length_m",
+        "ll_control_opcode_m",
+        "l2cap_m",
+        "l2cap_cid_m",
+        "att_opcode_m",
+        "att_handle_m",
+    )
+
+    def __init__(self, connection_r: Connection, ble_header_r: bytes, payload_r: bytes) -> None:
+        self.connection_m = connection_r
+
+        # 受信データが BLE Header より短い場合は、存在しないビットを0とみなす
+        value = ble_header_r[0] if ble_header_r else 0
+        self.llid_m = value & 0x03
+        self.nesn_m = (value >> 2) & 0x01
+        self.sn_m = (value >> 3) & 0x01
+        self.md_m = (value >> 4) & 0x01
+        self.length_m = ble_header_r[1] if 1 < len(ble_header_r) else 0
+
+        self.ll_control_opcode_m: int | None = None
+        self.l2cap_m: bytes | None = None
+        self.l2cap_cid_m: int | None = None
+        self.att_opcode_m: int | None = None
+        self.att_handle_m: int | None = None
+
+        if self.llid_m == LLID_CONTROL:
+            if payload_r:
+                self.ll_control_opcode_m = payload_r[0]
+                if self.ll_control_opcode_m == LL_CONTROL_TERMINATE_IND:
+                    connection_r.terminated_m = True
+        else:
+            self.__set_l2cap(connection_r.reassemble(self.llid_m, payload_r))
+
+    def __set_l2cap(self, l2cap_r: bytes | None) -> None:
+        """結合が完了した L2CAP の PDU を解析する"""
+        if l2cap_r is None:
+            return
+        self.l2cap_m = l2cap_r
+        self.l2cap_cid_m = L2CAP_HEADER_STRUCT.unpack_from(l2cap_r)[1]
+
+        att = l2cap_r[L2CAP_HEADER_STRUCT.size :]
+        if self.l2cap_cid_m != L2CAP_CID_ATT or not att:
+            return
+        self.att_opcode_m = att[0]
+        if self.att_opcode_m in ATT_HANDLE_OPCODES and 3 <= len(att):
+            self.att_handle_m = int.from_bytes(att[1:3], "little")
+        elif self.att_opcode_m == ATT_OPCODE_ERROR_RSP and 4 <= len(att):
+            self.att_handle_m = int.from_bytes(att[2:4], "little")
+
+    def get_name(self) -> str:
+        """LL Control または ATT の名称を取得する
+
+        Returns:
+            str: 名称. 判別できない場合は空文字
+        """
+        if self.ll_control_opcode_m is not None:
+            return LL_CONTROL_NAMES.get(self.ll_control_opcode_m, f"LL_CONTROL_0x{self.ll_control_opcode_m:02X}")
+        if self.att_opcode_m is not None:
+            return ATT_OPCODE_NAMES.get(self.att_opcode_m, f"ATT_0x{self.att_opcode_m:02X}")
+        return ""
+
+
+class ConnectionTracker:
+    """CONNECT_IND から接続を学習し、データチャネルパケットを接続ごとに解析する
+
+    保持する接続数が上限を超えた場合は、最も長くパケットを受信していない接続から破棄する
+    """
+
+    def __init__(self, max_connection_num_r: int = MAX_CONNECTION_NUM) -> None:
+        self.max_connection_num_m = max_connection_num_r
+        self.connections_m: OrderedDict[int, Connection] = OrderedDict()
+        self.unknown_count_m = 0
+
+    def process(self, packet_r: PacketData) -> DataPdu | None:
+        """パケットを1つ解析する
+
+        Args:
+            packet_r (PacketData): 受信順に渡すパケットデータ
+
+        Returns:
+            DataPdu | None: 学習済みの接続のデータチャネルパケットの場合は解析結果. それ以外は None
+        """
+        if packet_r.packet_type_m == PACKET_TYPE_ADVERTISING:
+            self.__learn(packet_r)
+            return None
+        if packet_r.packet_type_m != PACKET_TYPE_DATA:
+            return None
+
+        payload = packet_r.fld_payload_m
+        connection = self.connections_m.get(payload.access_adrs_m)
+        if connection is None:
+            self.unknown_count_m += 1
+            return None
+
+        self.connections_m.move_to_end(payload.access_adrs_m)
+        connection.packet_count_m += 1
+        return DataPdu(connection, payload.ble_header, payload.ble_payload)
+
+    def __learn(self, packet_r: PacketData) -> None:
+        """CONNECT_IND から接続を学習する"""
+        adv_pdu = packet_r.adv_pdu_m
+        if adv_pdu is None or adv_pdu.self_pdu_type_m != PDU_TYPE_CONNECT_IND or len(adv_pdu.ll_data_m) != LL_DATA_STRUCT.size:
+            return
+
+        connection = Connection(adv_pdu.ll_data_m, adv_pdu.target_adrs_m, adv_pdu.adv_adrs_m)
+        self.connections_m[connection.access_adrs_m] = connection
+        self.connections_m.move_to_end(connection.access_adrs_m)
+        while self.max_connection_num_m < len(self.connections_m):
+            self.connections_m.popitem(last=False)
+
+    def get_connection(self, access_adrs_r: int) -> Connection | None:
+        """学習済みの接続を取得する
+
+        Args:
+            access_adrs_r (int): Access Address
+
+        Returns:
+            Connection | None: 未学習の場合は None
+        """
+        return self.connections_m.get(access_adrs_r)
+
+
+def iter_data_pdus(packets_r: Iterable[PacketData], tracker_r: ConnectionTracker | None = None) -> Iterator[tuple[PacketData, DataPdu]]:
+    """データチャネルパケットの解析結果を順に取得する
+
+    Args:
+        packets_r (Iterable[PacketData]): 受信順のパケットデータ
+        tracker_r (ConnectionTracker | None): 使用する接続の管理. 省略時は新たに作成する
+
+    Yields:
+        tuple[PacketData, DataPdu]: パケットデータと解析結果
+    """
+    if tracker_r is None:
+        tracker_r = ConnectionTracker()
+    for packet in packets_r:
+        data_pdu = tracker_r.process(packet)
+        if data_pdu is not None:
+            yield packet, data_pdu
@@ -0,0 +1,320 @@
+"""パケットデータをファイルに出力する
+
+CSV, JSON Lines, NumPyの .npz, pcap 形式に対応し、出力する列を選択できる
+パケットはまとめて文字列に変換してから書き込む
+"""
+
+import json
+import shutil
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Callable, Iterable
+from itertools import accumulate
+from types import TracebackType
+from typing import IO, Any
+
+import parse_columns
+from parse_PacketData import PacketData
+from parse_pcap import PcapWriter
+from parse_progress import StageTimer, measure_optional
+
+# 出力できる列と値の取得方法
+COLUMN_GETTERS: dict[str, Callable[[PacketData], Any]] = {
+    "no": lambda pkt: pkt.get_no(),
+    "timestamp": lambda pkt: pkt.timestamp_m,
+    "length": lambda pkt: pkt.get_length(),
+    "channel": lambda pkt: pkt.fld_status_bytes_m.channel_m,
+    "access_adrs": lambda pkt: pkt.fld_payload_m.access_adrs_m,
+    "rssi": lambda pkt: pkt.fld_status_bytes_m.rssi_m,
+    "crc_ok": lambda pkt: pkt.fld_status_bytes_m.indicate_crc_m,
+    "ble_payload": lambda pkt: pkt.fld_payload_m.ble_payload,
+    # 複数ファイルをまとめた場合の読み込み元のファイルの番号(parse_merge.SourcePacket 以外は0)
+    "source": lambda pkt: getattr(pkt, "source_m", 0),
+}
+
+# 列を省略した場合に出力する列
+DEFAULT_COLUMNS = ["no", "timestamp", "channel", "access_adrs", "rssi", "crc_ok", "ble_payload"]
+
+# 1回の書き込みでまとめるパケット数
+BATCH_PACKET_NUM = 4096
+
+
+def _format_csv_value(name_r: str) -> Callable[[Any], str]:
+    """CSVに出力する際の値の変換方法を取得する"""
+    if name_r == "access_adrs":
+        return hex
+    if name_r == "ble_payload":
+        # 1byteずつカンマで区切る
+        return lambda value: value.hex(",")
+    return str
+
+
+def format_csv(packet_list_r: Iterable[PacketData], columns_r: list[str] | None = None) -> str:
+    """パケットデータをCSV形式の文字列に変換する
+
+    Args:
+        packet_list_r (Iterable[PacketData]): 変換するパケットデータ
+        columns_r (list[str] | None): 出力する列. 省略時は DEFAULT_COLUMNS
+
+    Returns:
+        str: CSV形式の文字列
+    """
+    columns = DEFAULT_COLUMNS if columns_r is None else columns_r
+    getters = [(COLUMN_GETTERS[name], _format_csv_value(name)) for name in columns]
+    return "".join(",".join([fmt(get(pkt)) for get, fmt in getters]) + "\n" for pkt in packet_list_r)
+
+
+def format_jsonl(packet_list_r: Iterable[PacketData], columns_r: list[str] | None = None) -> str:
+    """パケットデータをJSON Lines形式の文字列に変換する
+
+    BLE Payload は16進文字列として出力する
+
+    Args:
+        packet_list_r (Iterable[PacketData]): 変換するパケットデータ
+        columns_r (list[str] | None): 出力する列. 省略時は DEFAULT_COLUMNS
+
+    Returns:
+        str: JSON Lines形式の文字列
+    """
+    columns = DEFAULT_COLUMNS if columns_r is None else columns_r
+    getters = [(name, COLUMN_GETTERS[name]) for name in columns]
+    result_list = []
+    for pkt in packet_list_r:
+        row = {name: get(pkt) for name, get in getters}
+        if "ble_payload" in row:
+            row["ble_payload"] = row["ble_payload"].hex()
+        result_list.append(json.dumps(row, separators=(",", ":")) + "\n")
+    return "".join(result_list)
+
+
+class ExporterCommon(ABC):
+    """出力形式に共通する処理"""
+
+    def __init__(self, filepath_r: str, columns_r: list[str] | None = None) -> None:
+        self.filepath_m = filepath_r
+        self.columns_m = DEFAULT_COLUMNS if columns_r is None else columns_r
+        for name in self.columns_m:
+            if name not in COLUMN_GETTERS:
+                raise ValueError(f"出力できない列です: {name}")
+        self.packet_count_m = 0
+
+    def write(self, packets_r: Iterable[PacketData], timer_r: StageTimer | None = None) -> None:
+        """パケットデータをまとめて出力する
+
+        Args:
+            packets_r (Iterable[PacketData]): 出力するパケットデータ
+            timer_r (StageTimer | None): 出力(export)の経過時間の積算先
+        """
+        batch: list[PacketData] = []
+        for packet in packets_r:
+            batch.append(packet)
+            if BATCH_PACKET_NUM <= len(batch):
+                with measure_optional(timer_r, "export"):
+                    self._write_batch(batch)
+                batch = []
+        if batch:
+            with measure_optional(timer_r, "export"):
+                self._write_batch(batch)
+
+    @abstractmethod
+    def _write_batch(self, packet_list_r: list[PacketData]) -> None:
+        """まとめたパケットデータを出力する"""
+
+    def flush(self) -> None:
+        """出力済みのデータをファイルに反映する
+
+        ファイル終了時にまとめて出力する形式では何もしない
+        """
+        return
+
+    @abstractmethod
+    def close(self) -> None:
+        """出力を完了してファイルを閉じる"""
+
+    def __enter__(self) -> "ExporterCommon":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class TextExporterCommon(ExporterCommon):
+    """テキスト形式の出力に共通する処理"""
+
+    # パケットデータを文字列に変換する関数
+    format_func_m: Callable[[Iterable[PacketData], list[str] | None], str]
+
+    def __init__(self, filepath_r: str, columns_r: list[str] | None = None) -> None:
+        super().__init__(filepath_r, columns_r)
+        self.__file = open(filepath_r, "w", encoding="utf-8")
+
+    def _write_batch(self, packet_list_r: list[PacketData]) -> None:
+        self.write_text(self.format_func_m(packet_list_r, self.columns_m), len(packet_list_r))
+
+    def write_text(self, text_r: str, packet_count_r: int) -> None:
+        """変換済みの文字列をそのまま出力する
+
+        Args:
+            text_r (str): format_func_m で変換した文字列
+            packet_count_r (int): 文字列に含まれるパケット数
+        """
+        self.__file.write(text_r)
+        self.packet_count_m += packet_count_r
+
+    def flush(self) -> None:
+        self.__file.flush()
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class CsvExporter(TextExporterCommon):
+    """CSV形式で出力する"""
+
+    format_func_m = staticmethod(format_csv)
+
+
+class JsonlExporter(TextExporterCommon):
+    """JSON Lines形式で出力する"""
+
+    format_func_m = staticmethod(format_jsonl)
+
+
+class NpzExporter(ExporterCommon):
+    """列ごとの配列として .npz 形式で出力する
+
+    各列は一時ファイルに追記し、close で .npy 形式のヘッダを付けて .npz にまとめる
+    そのため、使用メモリはパケット数によらず書き込み単位分に収まる
+    BLE Payload は連結した ble_payload と、各パケットの終端位置 ble_payload_offset として出力する
+    """
+
+    # 列と array の型コード
+    COLUMN_TYPES = {
+        "no": "I",
+        "timestamp": "q",
+        "length": "H",
+        "channel": "B",
+        "access_adrs": "I",
+        "rssi": "h",
+        "crc_ok": "B",
+        "source": "H",
+    }
+
+    def __init__(self, filepath_r: str, columns_r: list[str] | None = None) -> None:
+        if not parse_columns.is_available():
+            raise ImportError("NumPyがインストールされていません")
+        super().__init__(filepath_r, columns_r)
+        np = parse_columns.np
+
+        # 出力する配列と型
+        self.__dtypes = {name: np.dtype(self.COLUMN_TYPES[name]) for name in self.columns_m if name != "ble_payload"}
+        if "crc_ok" in self.__dtypes:
+            self.__dtypes["crc_ok"] = np.dtype(bool)
+        if "ble_payload" in self.columns_m:
+            self.__dtypes["ble_payload"] = np.dtype(np.uint8)
+            self.__dtypes["ble_payload_offset"] = np.dtype(np.uint64)
+        self.__files: dict[str, IO[bytes]] = {name: tempfile.TemporaryFile() for name in self.__dtypes}
+
+        self.__arena_size = 0
+        if "ble_payload" in self.columns_m:
+            self.__files["ble_payload_offset"].write(array("Q", [0]))
+
+    def _write_batch(self, packet_list_r: list[PacketData]) -> None:
+        for name in self.columns_m:
+            if name != "ble_payload":
+                self.__files[name].write(array(self.COLUMN_TYPES[name], map(COLUMN_GETTERS[name], packet_list_r)))
+        if "ble_payload" in self.columns_m:
+            payload_list = [packet.fld_payload_m.ble_payload for packet in packet_list_r]
+            offsets = array("Q", accumulate(map(len, payload_list), initial=self.__arena_size))
+            self.__arena_size = offsets[-1]
+            self.__files["ble_payload"].write(b"".join(payload_list))
+            self.__files["ble_payload_offset"].write(offsets[1:])
+        self.packet_count_m += len(packet_list_r)
+
+    def close(self) -> None:
+        np = parse_columns.np
+        try:
+            # np.savez と同じく、無圧縮の zip に配列ごとの .npy を格納する
+            with zipfile.ZipFile(self.filepath_m, "w", zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+                for name, dtype in self.__dtypes.items():
+                    file = self.__files[name]
+                    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (file.tell() // dtype.itemsize,)}
+                    file.seek(0)
+                    with zip_file.open(name + ".npy", "w", force_zip64=True) as npy_file:
+                        np.lib.format.write_array_header_1_0(npy_file, header)
+                        shutil.copyfileobj(file, npy_file)
+        finally:
+            for file in self.__files.values():
+                file.close()
+
+
+class PcapExporter(ExporterCommon):
+    """pcap形式で出力する
+
+    出力内容は固定のため、出力する列の指定は無視する
+    """
+
+    def __init__(self, filepath_r: str, columns_r: list[str] | None = None) -> None:
+        super().__init__(filepath_r, columns_r)
+        self.__writer = PcapWriter(filepath_r)
+
+    def _write_batch(self, packet_list_r: list[PacketData]) -> None:
+        self.__writer.write(packet_list_r)
+        self.packet_count_m += len(packet_list_r)
+
+    def flush(self) -> None:
+        self.__writer.flush()
+
+    def close(self) -> None:
+        self.__writer.close()
+
+
+def format_chunk(
+    packet_list_r: list[PacketData], format_func_r: Callable[[Iterable[PacketData], list[str] | None], str], columns_r: list[str] | None
+) -> tuple[str, int]:
+    """複数プロセスで変換する際に、変換した文字列とパケット数をまとめて返す
+
+    Args:
+        packet_list_r (list[PacketData]): 変換するパケットデータ
+        format_func_r (Callable[[Iterable[PacketData], list[str] | None], str]): 変換に使用する関数
+        columns_r (list[str] | None): 出力する列
+
+    Returns:
+        tuple[str, int]: 変換した文字列, パケット数
+    """
+    return format_func_r(packet_list_r, columns_r), len(packet_list_r)
+
+
+# 拡張子と出力形式
+EXPORTER_TYPES: dict[str, type[ExporterCommon]] = {
+    ".csv": CsvExporter,
+    ".jsonl": JsonlExporter,
+    ".npz": NpzExporter,
+    ".pcap": PcapExporter,
+}
+
+
+def open_exporter(filepath_r: str, columns_r: list[str] | None = None) -> ExporterCommon:
+    """出力先の拡張子に応じた出力形式を取得する
+
+    Args:
+        filepath_r (str): 出力先のパス
+        columns_r (list[str] | None): 出力する列. 省略時は DEFAULT_COLUMNS
+
+    Raises:
+        ValueError: 対応していない拡張子の場合
+
+    Returns:
+        ExporterCommon: 出力形式
+    """
+    for ext, exporter_type in EXPORTER_TYPES.items():
+        if filepath_r.lower().endswith(ext):
+            return exporter_type(filepath_r, columns_r)
+    raise ValueError(f"対応していない出力形式です: {filepath_r}")
@@ -0,0 +1,86 @@
+"""同じ内容の BLE Payload を1つにまとめて保持する
+
+ビーコンのように同じ Payload が繰り返し受信される場合、
+内容ごとに1回だけ保持し、パケットには Payload の番号のみを持たせる
+"""
+
+from array import array
+from collections.abc import Iterator
+
+
+class PayloadPool:
+    """重複を除いた BLE Payload の格納領域
+
+    各 Payload は連続した arena_m に格納し、番号ごとの終端位置を offsets_m に、受信数を counts_m に保持する
+    """
+
+    def __init__(
+        self,
+        arena_r: bytearray | None = None,
+        offsets_r: array | None = None,
+        counts_r: array | None = None,
+    ) -> None:
+        self.arena_m = arena_r if arena_r is not None else bytearray()
+        self.offsets_m = offsets_r if offsets_r is not None else array("Q", [0])
+        self.counts_m = counts_r if counts_r is not None else array("Q")
+
+        # 内容から番号を引く辞書は、追加が必要になった時点で作成する
+        self.__ids: dict[bytes, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.counts_m)
+
+    def intern(self, payload_r: bytes) -> int:
+        """Payload を追加して番号を取得する
+
+        既に同じ内容がある場合は受信数のみを加算する
+
+        Args:
+            payload_r (bytes): BLE Payload
+
+        Returns:
+            int: Payload の番号
+        """
+        if self.__ids is None:
+            self.__ids = {self.get_payload(payload_id): payload_id for payload_id in range(len(self))}
+
+        payload_id = self.__ids.get(payload_r)
+        if payload_id is None:
+            payload_id = len(self)
+            self.__ids[bytes(payload_r)] = payload_id
+            self.arena_m.extend(payload_r)
+            self.offsets_m.append(len(self.arena_m))
+            self.counts_m.append(0)
+        self.counts_m[payload_id] += 1
+        return payload_id
+
+    def get_payload(self, payload_id_r: int) -> bytes:
+        """番号に対応する Payload を取得する
+
+        Args:
+            payload_id_r (int): Payload の番号
+
+        Returns:
+            bytes: BLE Payload
+        """
+        return bytes(self.arena_m[self.offsets_m[payload_id_r] : self.offsets_m[payload_id_r + 1]])
+
+    def get_count(self, payload_id_r: int) -> int:
+        """番号に対応する Payload の受信数を取得する
+
+        Args:
+            payload_id_r (int): Payload の番号
+
+        Returns:
+            int: 受信数
+        """
+        return self.counts_m[payload_id_r]
+
+    def items(self) -> Iterator[tuple[bytes, int]]:
+        """重複を除いた Payload と受信数を番号順に取得する
+
+        Yields:
+            tuple[bytes, int]: BLE Payload, 受信数
+        """
+        for payload_id in range(len(self)):
+            yield self.get_payload(payload_id), self.counts_m[payload_id]
@@ -0,0 +1,117 @@
+"""複数のPSDファイルをタイムスタンプ順に1つの時系列にまとめる
+
+各ファイルはまとまった数のパケット単位で読み込みながら、ヒープでタイムスタンプ順に並べる
+そのため、使用メモリはファイルサイズによらず、ファイル数×読み込み単位分に収まる
+"""
+
+import argparse
+import functools
+import heapq
+from collections.abc import Iterator
+from contextlib import ExitStack
+from typing import cast
+
+import parse_export
+from parse_PacketData import CHUNK_PACKET_NUM, PacketData, iter_packets
+from parse_PSD_head import PSD_HEADER_STRUCT, convert_time_us
+from parse_psd_writer import PsdWriter
+
+# 1ファイルあたり1回の読み込みで扱うパケット数
+MERGE_CHUNK_PACKET_NUM = CHUNK_PACKET_NUM // 4
+
+
+class SourcePacket(PacketData):
+    """読み込み元のファイルの番号を付けたパケットデータ"""
+
+    __slots__ = ("source_m",)
+
+    def __init__(self, buffer_r: bytes | memoryview, offset_r: int = 0, source_r: int = 0) -> None:
+        super().__init__(buffer_r, offset_r)
+        self.source_m = source_r
+
+
+def get_first_time_us(filepath_r: str) -> int | None:
+    """先頭パケットの0起算ではないタイムスタンプを取得する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        int | None: タイムスタンプ[us]. パケットが無い場合はNone
+    """
+    with open(filepath_r, "rb") as f:
+        header = f.read(PSD_HEADER_STRUCT.size)
+    if len(header) < PSD_HEADER_STRUCT.size:
+        return None
+    return convert_time_us(PSD_HEADER_STRUCT.unpack(header)[2])
+
+
+def iter_merged_packets(filepath_list_r: list[str], chunk_packet_num_r: int = MERGE_CHUNK_PACKET_NUM) -> Iterator[SourcePacket]:
+    """複数のPSDファイルのパケットをタイムスタンプ順に取得する
+
+    各ファイル内のパケットはタイムスタンプ順に並んでいることを前提とする
+    タイムスタンプが同じ場合は、ファイルの指定順とする
+
+    Args:
+        filepath_list_r (list[str]): PSDファイルのパス
+        chunk_packet_num_r (int): 1ファイルあたり1回の読み込みで扱うパケット数
+
+    Yields:
+        SourcePacket: 全ファイルで最も早いパケットを基準点(0)としたタイムスタンプ設定済みのパケットデータ.
+            source_m は filepath_list_r 内の位置
+    """
+    first_time_list = [time_us for time_us in map(get_first_time_us, filepath_list_r) if time_us is not None]
+    if not first_time_list:
+        return
+    base_time_us = min(first_time_list)
+
+    with ExitStack() as stack:
+        iterators: list[Iterator[SourcePacket]] = []
+        for source, filepath in enumerate(filepath_list_r):
+            f = stack.enter_context(open(filepath, "rb"))
+            make_packet = functools.partial(SourcePacket, source_r=source)
+            # make_packet_r で生成したパケットを取得するため、SourcePacket として扱える
+            packets = iter_packets(f, chunk_packet_num_r, base_time_us_r=base_time_us, make_packet_r=make_packet)
+            iterators.append(cast(Iterator[SourcePacket], packets))
+        yield from heapq.merge(*iterators, key=lambda pkt: pkt.timestamp_m)
+
+
+def merge_psd(filepath_list_r: list[str], dst_filepath_r: str, columns_r: list[str] | None = None) -> int:
+    """複数のPSDファイルをタイムスタンプ順にまとめて出力する
+
+    .psd の場合はパケットを読み込んだときのbytesデータのまま書き込むため、読み込み元のファイルの番号は残らない
+    それ以外は parse_export の出力形式に従い、"source" 列で読み込み元のファイルの番号を出力できる
+
+    Args:
+        filepath_list_r (list[str]): PSDファイルのパス
+        dst_filepath_r (str): 出力先のパス. 拡張子で出力形式を選択する
+        columns_r (list[str] | None): 出力する列
+
+    Returns:
+        int: 出力したパケット数
+    """
+    packets = iter_merged_packets(filepath_list_r)
+    if dst_filepath_r.lower().endswith(".psd"):
+        with PsdWriter(dst_filepath_r) as writer:
+            writer.write(packets)
+        return writer.packet_count_m
+
+    with parse_export.open_exporter(dst_filepath_r, columns_r) as exporter:
+        exporter.write(packets)
+    return exporter.packet_count_m
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="複数のPSDファイルをタイムスタンプ順に1つにまとめる")
+    parser.add_argument("src", nargs="+", help="PSDファイルのパス")
+    parser.add_argument("-o", "--output", required=True, help="出力先のパス(.psd, .csv, .jsonl, .npz, .pcap)")
+    parser.add_argument("-c", "--columns", nargs="+", default=["source"] + parse_export.DEFAULT_COLUMNS, help="出力する列")
+    args = parser.parse_args()
+
+    for source, filepath in enumerate(args.src):
+        print(f"Source {source}: {filepath}")
+    print(f"Packet count: {merge_psd(args.src, args.output, args.columns)}")
+
+
+if __name__ == "__main__":
+    main()
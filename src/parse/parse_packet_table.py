@@ -0,0 +1,177 @@
+"""パケットデータを列単位の配列に格納して、条件に合うパケットを高速に抽出する"""
+
+import bisect
+from array import array
+from collections.abc import Iterable
+from typing import Literal
+
+from parse_intern import PayloadPool
+from parse_PacketData import PacketData, iter_packets
+
+# array と memoryview に共通で指定する整数の型コード
+TypeCode = Literal["B", "h", "H", "I", "q", "Q"]
+
+# 列名と array の型コード
+COLUMN_TYPES: dict[str, TypeCode] = {
+    "no": "I",
+    "timestamp": "q",
+    "length": "H",
+    "rssi": "h",
+    "crc_ok": "B",
+    "channel": "B",
+    "access_adrs": "I",
+    "ble_header": "H",
+    "packet_type": "B",
+    "payload_id": "I",
+}
+
+
+class PacketTable:
+    """列単位に格納したパケットデータ
+
+    固定長のフィールドは列ごとの配列に、可変長の BLE Payload は重複を除いて1つの連続領域(pool_m)に格納し、
+    各パケットの BLE Payload は payload_id の番号から参照する
+    """
+
+    def __init__(self, columns_r: dict[str, array] | None = None, pool_r: PayloadPool | None = None) -> None:
+        if columns_r is None:
+            columns_r = {name: array(type_code) for name, type_code in COLUMN_TYPES.items()}
+        self.columns_m = columns_r
+        self.pool_m = pool_r if pool_r is not None else PayloadPool()
+
+    def __len__(self) -> int:
+        return len(self.columns_m["no"])
+
+    def __getitem__(self, name_r: str) -> array:
+        return self.columns_m[name_r]
+
+    def append(self, packet_r: PacketData) -> None:
+        """パケットデータを末尾に追加する
+
+        Args:
+            packet_r (PacketData): タイムスタンプ設定済みのパケットデータ
+        """
+        status_bytes = packet_r.fld_status_bytes_m
+        payload = packet_r.fld_payload_m
+
+        columns = self.columns_m
+        columns["no"].append(packet_r.get_no())
+        columns["timestamp"].append(packet_r.timestamp_m)
+        columns["length"].append(packet_r.get_length())
+        columns["rssi"].append(status_bytes.rssi_m)
+        columns["crc_ok"].append(status_bytes.indicate_crc_m)
+        columns["channel"].append(status_bytes.channel_m)
+        columns["access_adrs"].append(payload.access_adrs_m)
+        columns["ble_header"].append(int.from_bytes(payload.ble_header, "little"))
+        columns["packet_type"].append(packet_r.packet_type_m)
+        columns["payload_id"].append(self.pool_m.intern(payload.ble_payload))
+
+    def extend(self, packets_r: Iterable[PacketData]) -> None:
+        """複数のパケットデータを末尾に追加する
+
+        Args:
+            packets_r (Iterable[PacketData]): タイムスタンプ設定済みのパケットデータ
+        """
+        for packet in packets_r:
+            self.append(packet)
+
+    def get_ble_payload(self, index_r: int) -> bytes:
+        """BLE Payload を取得する
+
+        Args:
+            index_r (int): パケットの位置
+
+        Returns:
+            bytes: BLE Payload
+        """
+        return self.pool_m.get_payload(self.columns_m["payload_id"][index_r])
+
+    def get_time_range(self, start_us_r: int, end_us_r: int) -> range:
+        """タイムスタンプが範囲内のパケットの位置を取得する
+
+        タイムスタンプは昇順に並んでいるため二分探索で求める
+
+        Args:
+            start_us_r (int): 範囲の開始[us](含む)
+            end_us_r (int): 範囲の終了[us](含まない)
+
+        Returns:
+            range: 範囲内のパケットの位置
+        """
+        timestamp = self.columns_m["timestamp"]
+        start = bisect.bisect_left(timestamp, start_us_r)
+        end = bisect.bisect_left(timestamp, end_us_r, lo=start)
+        return range(start, end)
+
+    def select(
+        self,
+        channel_r: Iterable[int] | None = None,
+        access_adrs_r: int | None = None,
+        crc_ok_r: bool | None = None,
+        time_range_r: tuple[int, int] | None = None,
+    ) -> list[int]:
+        """条件をすべて満たすパケットの位置を取得する
+
+        省略した条件は判定しない
+
+        Args:
+            channel_r (Iterable[int] | None): channel の候補
+            access_adrs_r (int | None): Access Address
+            crc_ok_r (bool | None): CRCの状態 True: OK、False: NG
+            time_range_r (tuple[int, int] | None): タイムスタンプの範囲[us](開始は含み、終了は含まない)
+
+        Returns:
+            list[int]: 条件を満たすパケットの位置
+        """
+        if time_range_r is None:
+            index_list: Iterable[int] = range(len(self))
+        else:
+            index_list = self.get_time_range(*time_range_r)
+
+        if channel_r is not None:
+            channel_set = set(channel_r)
+            channel = self.columns_m["channel"]
+            index_list = [i for i in index_list if channel[i] in channel_set]
+        if access_adrs_r is not None:
+            access_adrs = self.columns_m["access_adrs"]
+            index_list = [i for i in index_list if access_adrs[i] == access_adrs_r]
+        if crc_ok_r is not None:
+            crc_ok = self.columns_m["crc_ok"]
+            index_list = [i for i in index_list if bool(crc_ok[i]) == crc_ok_r]
+        return list(index_list)
+
+    def take(self, index_list_r: Iterable[int]) -> "PacketTable":
+        """指定した位置のパケットのみを持つテーブルを取得する
+
+        Args:
+            index_list_r (Iterable[int]): パケットの位置
+
+        Returns:
+            PacketTable: 抽出したパケットのテーブル
+        """
+        index_list = list(index_list_r)
+        result = PacketTable()
+        for name in COLUMN_TYPES:
+            if name == "payload_id":
+                continue
+            column = self.columns_m[name]
+            result.columns_m[name].extend(column[i] for i in index_list)
+
+        # 抽出したパケットの Payload のみで番号を振り直す
+        result.columns_m["payload_id"].extend(result.pool_m.intern(self.get_ble_payload(i)) for i in index_list)
+        return result
+
+
+def load_packet_table(filepath_r: str) -> PacketTable:
+    """PSDファイルを読み込んでテーブルを作成する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+
+    Returns:
+        PacketTable: 全パケットのテーブル
+    """
+    table = PacketTable()
+    with open(filepath_r, "rb") as f:
+        table.extend(iter_packets(f))
+    return table
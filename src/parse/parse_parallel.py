@@ -0,0 +1,93 @@
+"""PSDファイルをパケット単位の範囲に分割し、複数プロセスで並列に解析する"""
+
+import itertools
+import os
+from collections import deque
+from collections.abc import Callable, Generator
+from concurrent.futures import ProcessPoolExecutor
+from typing import TypeVar
+
+from parse_anomaly import AnomalyTracker, get_anomaly_tracker, reset_anomaly_tracker
+from parse_PacketData import CHUNK_PACKET_NUM, PacketData
+from parse_psd_file import PsdFile
+
+T = TypeVar("T")
+
+# 1プロセスに割り当てるパケット数の上限
+RANGE_PACKET_NUM = CHUNK_PACKET_NUM * 16
+
+# 1プロセスあたりの、結果を取り出していない範囲の数の上限
+# 結果の出力が解析より遅い場合に、未出力の結果が親プロセスに溜まり続けないようにする
+PENDING_RANGE_NUM_PER_WORKER = 2
+
+
+def get_packet_ranges(packet_num_r: int, worker_num_r: int) -> list[tuple[int, int]]:
+    """パケット全体をプロセスに割り当てる範囲に分割する
+
+    Args:
+        packet_num_r (int): パケット数
+        worker_num_r (int): プロセス数
+
+    Returns:
+        list[tuple[int, int]]: 先頭位置と終端位置(終端は含まない)のリスト
+    """
+    # 処理の偏りを抑えるため、プロセス数より多めに分割する
+    range_num = max(1, min(RANGE_PACKET_NUM, -(-packet_num_r // (worker_num_r * 4))))
+    return [(start, min(start + range_num, packet_num_r)) for start in range(0, packet_num_r, range_num)]
+
+
+def _run_range(filepath_r: str, func_r: Callable[[list[PacketData]], T], start_r: int, stop_r: int, sample_num_r: int) -> tuple[T, AnomalyTracker]:
+    """子プロセスで指定範囲のパケットを解析し、関数を適用する
+
+    タイムスタンプの基準点は PsdFile によりファイル先頭のパケットとなる
+    範囲内で見つかった異常は、親プロセスで集計できるよう結果と合わせて返す
+    """
+    tracker = reset_anomaly_tracker(sample_num_r)
+    with PsdFile(filepath_r) as psd:
+        return func_r(psd[start_r:stop_r]), tracker
+
+
+def map_packet_ranges(filepath_r: str, func_r: Callable[[list[PacketData]], T], worker_num_r: int | None = None) -> Generator[T, None, None]:
+    """パケットの範囲ごとに関数を並列に適用し、パケット順に結果を取得する
+
+    関数は子プロセスで実行されるため、モジュールのトップレベルで定義されている必要がある
+    結果は親プロセスへ複製されるため、関数は PacketData のリストではなく
+    変換後の文字列や集計結果など、小さくまとめた値を返すこと
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+        func_r (Callable[[list[PacketData]], T]): 範囲内のパケットを受け取る関数
+        worker_num_r (int | None): プロセス数. 省略時はCPU数
+
+    Yields:
+        T: パケット順に並べた関数の結果. 途中で close した場合は、未実行の範囲を実行しない
+    """
+    if worker_num_r is None:
+        worker_num_r = os.cpu_count() or 1
+
+    with PsdFile(filepath_r) as psd:
+        packet_num = len(psd)
+    ranges = get_packet_ranges(packet_num, worker_num_r)
+
+    sample_num = get_anomaly_tracker().sample_num_m
+    range_iter = iter(ranges)
+    with ProcessPoolExecutor(max_workers=worker_num_r) as executor:
+        # 先頭の範囲から順に、上限の数まで投入した範囲の結果を取り出すごとに次の範囲を投入する
+        pending = deque(
+            executor.submit(_run_range, filepath_r, func_r, start, stop, sample_num)
+            for start, stop in itertools.islice(range_iter, worker_num_r * PENDING_RANGE_NUM_PER_WORKER)
+        )
+        try:
+            while pending:
+                result, range_tracker = pending.popleft().result()
+                next_range = next(range_iter, None)
+                if next_range is not None:
+                    start, stop = next_range
+                    pending.append(executor.submit(_run_range, filepath_r, func_r, start, stop, sample_num))
+                # 子プロセスで見つかった異常を、親プロセスの集計先に加える
+                get_anomaly_tracker().merge(range_tracker)
+                yield result
+        finally:
+            # 途中で取り出しを止めた場合は、未実行の範囲を実行しない
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,117 @@
+"""パケットデータをWiresharkで扱えるpcap形式(LINKTYPE_BLUETOOTH_LE_LL_WITH_PHDR)に変換する"""
+
+import struct
+from collections.abc import Iterable
+
+from parse_PacketData import PacketData
+from parse_PSD_head import OFFSET_PAYLOAD
+
+# pcapファイルのヘッダ: magic, version(major, minor), thiszone, sigfigs, snaplen, network
+PCAP_HEADER_STRUCT = struct.Struct("<IHHiIII")
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_VERSION_MAJOR = 2
+PCAP_VERSION_MINOR = 4
+PCAP_SNAPLEN = 0xFFFF
+LINKTYPE_BLUETOOTH_LE_LL_WITH_PHDR = 256
+
+# パケットごとのヘッダ: ts_sec, ts_usec, incl_len, orig_len
+# 続けて疑似ヘッダ: rf_channel, signal_power, noise_power, access_address_offenses, reference_access_address, flags
+PCAP_RECORD_STRUCT = struct.Struct("<IIIIBbbBIH")
+PHDR_SIZE = 10
+
+# 疑似ヘッダの flags
+LE_DEWHITENED = 0x0001
+LE_SIGPOWER_VALID = 0x0002
+LE_CRC_CHECKED = 0x0400
+LE_CRC_VALID = 0x0800
+
+
+def convert_rf_channel(channel_r: int) -> int:
+    """channel index を RF channel(2402MHzを0とした番号)に変換する
+
+    Args:
+        channel_r (int): channel index(0-39)
+
+    Returns:
+        int: RF channel
+    """
+    if channel_r == 37:
+        return 0
+    if channel_r == 38:
+        return 12
+    if channel_r == 39:
+        return 39
+    if channel_r <= 10:
+        return channel_r + 1
+    return channel_r + 2
+
+
+# channel index から RF channel への変換表
+RF_CHANNEL_TABLE = bytes(convert_rf_channel(channel) for channel in range(128))
+
+
+class PcapWriter:
+    """pcap形式でファイルに書き込む
+
+    ヘッダは使い回すバッファに書き込み、複数パケット分をまとめてファイルへ書き込む
+    各パケットの時刻は、0起算のタイムスタンプに base_time_us_r(UNIX時間[us])を加算したものとなる
+    """
+
+    def __init__(self, filepath_r: str, base_time_us_r: int = 0) -> None:
+        self.base_time_us_m = base_time_us_r
+        self.packet_count_m = 0
+
+        self.__header = bytearray(PCAP_RECORD_STRUCT.size)
+        self.__file = open(filepath_r, "wb")
+        self.__file.write(
+            PCAP_HEADER_STRUCT.pack(PCAP_MAGIC, PCAP_VERSION_MAJOR, PCAP_VERSION_MINOR, 0, 0, PCAP_SNAPLEN, LINKTYPE_BLUETOOTH_LE_LL_WITH_PHDR)
+        )
+
+    def write(self, packet_list_r: Iterable[PacketData]) -> None:
+        """パケットデータをまとめて書き込む
+
+        Args:
+            packet_list_r (Iterable[PacketData]): 出力するパケットデータ
+        """
+        header = self.__header
+        pack_into = PCAP_RECORD_STRUCT.pack_into
+        batch = bytearray()
+        for packet in packet_list_r:
+            status_bytes = packet.fld_status_bytes_m
+
+            # Payload の Length を除いた Access Address から CRC までが LE パケットとなる
+            start = packet.offset_m + OFFSET_PAYLOAD + 1
+            le_packet = packet.buffer_m[start : start + max(0, packet.get_length() - 3)]
+
+            flags = LE_DEWHITENED | LE_SIGPOWER_VALID | LE_CRC_CHECKED
+            if status_bytes.indicate_crc_m:
+                flags |= LE_CRC_VALID
+
+            time_us = self.base_time_us_m + packet.timestamp_m
+            packet_size = PHDR_SIZE + len(le_packet)
+            pack_into(
+                header,
+                0,
+                time_us // 1000000,
+                time_us % 1000000,
+                packet_size,
+                packet_size,
+                RF_CHANNEL_TABLE[status_bytes.channel_m],
+                max(-128, min(127, status_bytes.rssi_m)),
+                0,
+                0,
+                0,
+                flags,
+            )
+            batch += header
+            batch += le_packet
+            self.packet_count_m += 1
+
+        self.__file.write(batch)
+
+    def flush(self) -> None:
+        """書き込んだデータをファイルに反映する"""
+        self.__file.flush()
+
+    def close(self) -> None:
+        self.__file.close()
@@ -0,0 +1,128 @@
+"""解析の進捗通知と処理段階ごとの計測を行う"""
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+# 進捗を通知する最大頻度[回/s]
+PROGRESS_RATE_HZ = 4.0
+
+
+def print_progress(done_r: int, total_r: int) -> None:
+    """進捗をコンソールに表示する
+
+    Args:
+        done_r (int): 処理済みのパケット数
+        total_r (int): 全パケット数(不明な場合は0)
+    """
+    if 0 < total_r:
+        print(f"\rGetting... {done_r:0{len(str(total_r))}}:{total_r}", end="")
+    else:
+        print(f"\rGetting... {done_r}", end="")
+
+
+class Progress:
+    """進捗の通知頻度を制限して通知先に渡す
+
+    callback_r は処理済みのパケット数と全パケット数を受け取る
+    quiet_r が True の場合は通知しない
+    """
+
+    def __init__(
+        self,
+        callback_r: Callable[[int, int], None] | None = print_progress,
+        rate_hz_r: float = PROGRESS_RATE_HZ,
+        quiet_r: bool = False,
+    ) -> None:
+        self.callback_m = None if quiet_r else callback_r
+        self.interval_m = 1.0 / rate_hz_r
+        self.__next_time = 0.0
+
+    def update(self, done_r: int, total_r: int = 0) -> None:
+        """前回の通知から一定時間経過している場合のみ進捗を通知する
+
+        Args:
+            done_r (int): 処理済みのパケット数
+            total_r (int): 全パケット数(不明な場合は0)
+        """
+        if self.callback_m is None:
+            return
+        now = time.monotonic()
+        if now < self.__next_time:
+            return
+        self.__next_time = now + self.interval_m
+        self.callback_m(done_r, total_r)
+
+    def finish(self, done_r: int, total_r: int = 0) -> None:
+        """完了時の進捗を必ず通知する
+
+        Args:
+            done_r (int): 処理済みのパケット数
+            total_r (int): 全パケット数(不明な場合は0)
+        """
+        if self.callback_m is None:
+            return
+        self.callback_m(done_r, total_r)
+        if self.callback_m is print_progress:
+            print(f"\rCompleted! {done_r}:{total_r if 0 < total_r else done_r}")
+
+
+class StageTimer:
+    """処理段階ごとの経過時間を積算する"""
+
+    def __init__(self) -> None:
+        self.elapsed_m: dict[str, float] = {}
+
+    def add(self, stage_r: str, elapsed_r: float) -> None:
+        """経過時間を積算する
+
+        Args:
+            stage_r (str): 処理段階の名前
+            elapsed_r (float): 経過時間[s]
+        """
+        self.elapsed_m[stage_r] = self.elapsed_m.get(stage_r, 0.0) + elapsed_r
+
+    def merge(self, other_r: "StageTimer") -> None:
+        """別の積算結果(子プロセスの積算など)を加える
+
+        Args:
+            other_r (StageTimer): 加える積算結果
+        """
+        for stage, elapsed in other_r.elapsed_m.items():
+            self.add(stage, elapsed)
+
+    @contextmanager
+    def measure(self, stage_r: str) -> Iterator[None]:
+        """with文の範囲の経過時間を積算する
+
+        Args:
+            stage_r (str): 処理段階の名前
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage_r, time.perf_counter() - start)
+
+    def report(self) -> str:
+        """処理段階ごとの経過時間を文字列で取得する
+
+        Returns:
+            str: 処理段階ごとの経過時間
+        """
+        return ", ".join(f"{stage}: {elapsed:.3f}s" for stage, elapsed in self.elapsed_m.items())
+
+
+@contextmanager
+def measure_optional(timer_r: StageTimer | None, stage_r: str) -> Iterator[None]:
+    """計測が指定されている場合のみ経過時間を積算する
+
+    Args:
+        timer_r (StageTimer | None): 積算先
+        stage_r (str): 処理段階の名前
+    """
+    if timer_r is None:
+        yield
+    else:
+        with timer_r.measure(stage_r):
+            yield
@@ -0,0 +1,149 @@
+"""PSDファイルをメモリマップしてパケット単位でランダムアクセスする"""
+
+import bisect
+import mmap
+import os
+from types import TracebackType
+from typing import overload
+
+from parse_PacketData import PacketData, make_packet
+from parse_PSD_head import PSD_HEADER_STRUCT, PSD_RECORD_SIZE, convert_time_us
+
+
+class PsdFile:
+    """メモリマップしたPSDファイル
+
+    パケットはアクセスされた分だけ解析するため、ファイルサイズによらず一定時間で開ける
+    """
+
+    def __init__(self, filepath_r: str) -> None:
+        self.filepath_m = filepath_r
+
+        self.__file = open(filepath_r, "rb")
+        file_size = os.fstat(self.__file.fileno()).st_size
+        if 0 < file_size:
+            self.__map: mmap.mmap | None = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__view = memoryview(self.__map)
+        else:
+            # 空のファイルはメモリマップできない
+            self.__map = None
+            self.__view = memoryview(b"")
+
+        # 末尾の1パケットに満たないデータは扱わない
+        self.__packet_num = file_size // PSD_RECORD_SIZE
+
+        self.__set_base_time()
+
+    def __set_base_time(self) -> None:
+        """タイムスタンプの基準点(先頭パケットのタイムスタンプ)を保持する"""
+        self.base_time_us_m = 0
+        if 0 < self.__packet_num:
+            self.base_time_us_m = self.get_raw_time_us(0)
+
+    def get_raw_time_us(self, index_r: int) -> int:
+        """指定したパケットの0起算ではないタイムスタンプを取得する
+
+        Args:
+            index_r (int): パケットの位置
+
+        Returns:
+            int: タイムスタンプ[us]
+        """
+        return convert_time_us(PSD_HEADER_STRUCT.unpack_from(self.__view, index_r * PSD_RECORD_SIZE)[2])
+
+    def seek_time(self, time_us_r: int) -> int:
+        """タイムスタンプが指定時刻以降となる最初のパケットの位置を取得する
+
+        タイムスタンプは単調増加するため、各パケットのTimestampフィールドを二分探索する
+
+        Args:
+            time_us_r (int): 先頭パケットを基準点(0)とした時刻[us]
+
+        Returns:
+            int: パケットの位置. 該当するパケットが無い場合はパケット数
+        """
+        return bisect.bisect_left(range(self.__packet_num), time_us_r, key=lambda index: self.get_raw_time_us(index) - self.base_time_us_m)
+
+    def get_time_range(self, start_us_r: int, end_us_r: int) -> range:
+        """タイムスタンプが範囲内のパケットの位置を取得する
+
+        Args:
+            start_us_r (int): 範囲の開始[us](含む)
+            end_us_r (int): 範囲の終了[us](含まない)
+
+        Returns:
+            range: 範囲内のパケットの位置
+        """
+        start = self.seek_time(start_us_r)
+        end = max(start, self.seek_time(end_us_r))
+        return range(start, end)
+
+    def get_buffer(self) -> memoryview:
+        """ファイル全体のデータを取得する
+
+        Returns:
+            memoryview: パケット単位に揃えたファイルの内容
+        """
+        return self.__view[: self.__packet_num * PSD_RECORD_SIZE]
+
+    def __len__(self) -> int:
+        return self.__packet_num
+
+    @overload
+    def __getitem__(self, index_r: int) -> PacketData: ...
+
+    @overload
+    def __getitem__(self, index_r: slice) -> list[PacketData]: ...
+
+    def __getitem__(self, index_r: int | slice) -> PacketData | list[PacketData]:
+        if isinstance(index_r, slice):
+            return [self.__get_packet(index) for index in range(*index_r.indices(self.__packet_num))]
+
+        if index_r < 0:
+            index_r += self.__packet_num
+        if not 0 <= index_r < self.__packet_num:
+            raise IndexError("パケットの位置が範囲外です")
+        return self.__get_packet(index_r)
+
+    def __get_packet(self, index_r: int) -> PacketData:
+        """指定したパケットのみを解析する
+
+        Args:
+            index_r (int): パケットの位置
+
+        Returns:
+            PacketData: 先頭パケットを基準点(0)としたタイムスタンプ設定済みのパケットデータ
+        """
+        # メモリマップを閉じられるよう、パケット分のみを複製して渡す
+        offset = index_r * PSD_RECORD_SIZE
+        pkt = make_packet(bytes(self.__view[offset : offset + PSD_RECORD_SIZE]), 0)
+        pkt.set_timestamp(pkt.get_time_us() - self.base_time_us_m)
+        return pkt
+
+    def close(self) -> None:
+        """メモリマップとファイルを閉じる
+
+        get_buffer で取得したバッファが残っている場合、メモリマップはそのバッファが解放された時点で閉じる
+        """
+        try:
+            self.__view.release()
+            if self.__map is not None:
+                try:
+                    self.__map.close()
+                except BufferError:
+                    # 参照中のバッファがあると閉じられないため、参照を外して解放を委ねる
+                    pass
+                self.__map = None
+        finally:
+            self.__file.close()
+
+    def __enter__(self) -> "PsdFile":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -0,0 +1,296 @@
+"""PSDファイルからデバイス, channel, 時間帯で絞り込んだパケットを抽出し、または分割する
+
+パケットは解析・再構築せず、メモリマップしたファイルから1パケット分のbytesデータを直接複製する
+そのため、抽出したパケットは元のファイルとバイト単位で一致する
+"""
+
+import argparse
+import os
+from collections.abc import Iterable, Iterator
+
+from parse_adv_pdu import BD_ADRS_LENGTH, PDU_LAYOUT_TABLE
+from parse_PacketData import ADVERTISING_PACKET_ACCESS_ADRS, PAYLOAD_OFFSET_ACCESS_ADRS, PAYLOAD_OFFSET_BLE_HEADER, PAYLOAD_OFFSET_BLE_PAYLOAD
+from parse_psd_file import PsdFile
+from parse_PSD_head import OFFSET_LENGTH, OFFSET_PAYLOAD, PSD_RECORD_SIZE, FieldPayloadWStatusbytes
+from parse_psd_writer import PsdWriter
+
+# 1回の書き込みで扱うパケット数の上限
+WRITE_PACKET_NUM = 4096
+
+
+def parse_device(device_r: str) -> int | bytes:
+    """デバイスの指定を解釈する
+
+    Args:
+        device_r (str): "11:22:33:44:55:66" 形式の AdvA または "0x50654b1d" 形式の Access Address
+
+    Returns:
+        int | bytes: Access Address またはリトルエンディアンの AdvA
+    """
+    if ":" in device_r:
+        adv_adrs = bytes.fromhex(device_r.replace(":", ""))
+        if len(adv_adrs) != BD_ADRS_LENGTH:
+            raise ValueError(f"BDアドレスの形式が不正です: {device_r}")
+        return adv_adrs[::-1]
+    return int(device_r, 0)
+
+
+class RecordView:
+    """メモリマップしたPSDファイルのパケットを、PacketData を生成せずに参照する"""
+
+    def __init__(self, buffer_r: memoryview) -> None:
+        self.buffer_m = buffer_r
+
+    def get_payload_pos(self, index_r: int) -> tuple[int, int] | None:
+        """Payload の先頭位置と Payload+StatusBytes長を取得する
+
+        Args:
+            index_r (int): パケットの位置
+
+        Returns:
+            tuple[int, int] | None: 先頭位置と長さ. 長さが不正な場合はNone
+        """
+        offset = index_r * PSD_RECORD_SIZE
+        length = int.from_bytes(self.buffer_m[offset + OFFSET_LENGTH : offset + OFFSET_PAYLOAD], "little")
+        if not 2 <= length <= FieldPayloadWStatusbytes.length_m:
+            return None
+        return offset + OFFSET_PAYLOAD, length
+
+    def get_channel(self, index_r: int) -> int | None:
+        """channelを取得する"""
+        pos = self.get_payload_pos(index_r)
+        if pos is None:
+            return None
+        payload_pos, length = pos
+        return self.buffer_m[payload_pos + length - 1] & 0x7F
+
+    def get_crc_ok(self, index_r: int) -> bool:
+        """CRCの状態を取得する"""
+        pos = self.get_payload_pos(index_r)
+        if pos is None:
+            return False
+        payload_pos, length = pos
+        return bool(self.buffer_m[payload_pos + length - 1] & 0x80)
+
+    def match_device(self, index_r: int, device_r: int | bytes) -> bool:
+        """デバイスが一致するか判定する
+
+        Args:
+            index_r (int): パケットの位置
+            device_r (int | bytes): Access Address またはリトルエンディアンの AdvA
+
+        Returns:
+            bool: True: 一致する
+        """
+        pos = self.get_payload_pos(index_r)
+        if pos is None:
+            return False
+        payload_pos, length = pos
+        access_adrs = int.from_bytes(self.buffer_m[payload_pos + PAYLOAD_OFFSET_ACCESS_ADRS : payload_pos + PAYLOAD_OFFSET_BLE_HEADER], "little")
+        if isinstance(device_r, int):
+            return access_adrs == device_r
+        if access_adrs != ADVERTISING_PACKET_ACCESS_ADRS or length < PAYLOAD_OFFSET_BLE_PAYLOAD:
+            return False
+
+        layout = PDU_LAYOUT_TABLE.get(self.buffer_m[payload_pos + PAYLOAD_OFFSET_BLE_HEADER] & 0x0F)
+        if layout is None:
+            return False
+        adv_adrs_pos = payload_pos + PAYLOAD_OFFSET_BLE_PAYLOAD + layout[0]
+        return self.buffer_m[adv_adrs_pos : adv_adrs_pos + BD_ADRS_LENGTH] == device_r
+
+
+def select_records(
+    psd_r: PsdFile,
+    device_r: int | bytes | None = None,
+    channel_r: Iterable[int] | None = None,
+    time_range_r: tuple[int, int] | None = None,
+    crc_ok_r: bool | None = None,
+) -> Iterator[int]:
+    """条件に一致するパケットの位置を取得する
+
+    指定しなかった条件は判定しない
+
+    Args:
+        psd_r (PsdFile): PSDファイル
+        device_r (int | bytes | None): Access Address またはリトルエンディアンの AdvA
+        channel_r (Iterable[int] | None): channelの候補
+        time_range_r (tuple[int, int] | None): 先頭パケットを基準点(0)とした時間帯[us](終了は含まない)
+        crc_ok_r (bool | None): CRCの状態 True: OK、False: NG
+
+    Yields:
+        int: 条件に一致するパケットの位置
+    """
+    index_range = range(len(psd_r)) if time_range_r is None else psd_r.get_time_range(*time_range_r)
+    if device_r is None and channel_r is None and crc_ok_r is None:
+        yield from index_range
+        return
+
+    channel_set = None if channel_r is None else frozenset(channel_r)
+    view = RecordView(psd_r.get_buffer())
+    try:
+        for index in index_range:
+            if channel_set is not None and view.get_channel(index) not in channel_set:
+                continue
+            if crc_ok_r is not None and view.get_crc_ok(index) != crc_ok_r:
+                continue
+            if device_r is not None and not view.match_device(index, device_r):
+                continue
+            yield index
+    finally:
+        view.buffer_m.release()
+
+
+def get_runs(index_list_r: Iterable[int], max_num_r: int = WRITE_PACKET_NUM) -> Iterator[tuple[int, int]]:
+    """連続するパケットの位置をまとめる
+
+    Args:
+        index_list_r (Iterable[int]): 昇順のパケットの位置
+        max_num_r (int): 1つにまとめるパケット数の上限
+
+    Yields:
+        tuple[int, int]: 先頭位置と終端位置(終端は含まない)
+    """
+    start = stop = -1
+    for index in index_list_r:
+        if index == stop and stop - start < max_num_r:
+            stop += 1
+            continue
+        if start < stop:
+            yield start, stop
+        start, stop = index, index + 1
+    if start < stop:
+        yield start, stop
+
+
+def copy_records(psd_r: PsdFile, writer_r: PsdWriter, index_list_r: Iterable[int]) -> int:
+    """パケットをメモリマップから直接書き込む
+
+    Args:
+        psd_r (PsdFile): 複製元のPSDファイル
+        writer_r (PsdWriter): 書き込み先
+        index_list_r (Iterable[int]): 昇順のパケットの位置
+
+    Returns:
+        int: 書き込んだパケット数
+    """
+    count = 0
+    with psd_r.get_buffer() as buffer:
+        for start, stop in get_runs(index_list_r):
+            writer_r.write_records(buffer[start * PSD_RECORD_SIZE : stop * PSD_RECORD_SIZE])
+            count += stop - start
+    return count
+
+
+def filter_psd(
+    src_filepath_r: str,
+    dst_filepath_r: str,
+    device_r: int | bytes | None = None,
+    channel_r: Iterable[int] | None = None,
+    time_range_r: tuple[int, int] | None = None,
+    crc_ok_r: bool | None = None,
+) -> int:
+    """条件に一致するパケットのみを別のPSDファイルに書き出す
+
+    Args:
+        src_filepath_r (str): 抽出元のPSDファイルのパス
+        dst_filepath_r (str): 書き出し先のPSDファイルのパス
+        device_r (int | bytes | None): Access Address またはリトルエンディアンの AdvA
+        channel_r (Iterable[int] | None): channelの候補
+        time_range_r (tuple[int, int] | None): 先頭パケットを基準点(0)とした時間帯[us](終了は含まない)
+        crc_ok_r (bool | None): CRCの状態 True: OK、False: NG
+
+    Returns:
+        int: 書き出したパケット数
+    """
+    with PsdFile(src_filepath_r) as psd, PsdWriter(dst_filepath_r) as writer:
+        return copy_records(psd, writer, select_records(psd, device_r, channel_r, time_range_r, crc_ok_r))
+
+
+def get_split_ranges(psd_r: PsdFile, period_us_r: int | None = None, size_r: int | None = None) -> list[tuple[int, int]]:
+    """PSDファイルを分割する範囲を取得する
+
+    Args:
+        psd_r (PsdFile): PSDファイル
+        period_us_r (int | None): 1ファイルあたりの時間[us]
+        size_r (int | None): 1ファイルあたりのサイズの上限[byte]. 1パケット未満の場合も1パケットは含める
+
+    Returns:
+        list[tuple[int, int]]: 先頭位置と終端位置(終端は含まない)のリスト
+    """
+    packet_num = len(psd_r)
+    if period_us_r is None and size_r is not None:
+        range_num = max(1, size_r // PSD_RECORD_SIZE)
+        return [(start, min(start + range_num, packet_num)) for start in range(0, packet_num, range_num)]
+    if period_us_r is None or size_r is not None:
+        raise ValueError("分割する時間とサイズのどちらか一方を指定してください")
+
+    ranges = []
+    start = 0
+    while start < packet_num:
+        # 区切りは先頭パケットを基準とした時間の倍数とする
+        period_no = (psd_r.get_raw_time_us(start) - psd_r.base_time_us_m) // period_us_r + 1
+        stop = max(start + 1, psd_r.seek_time(period_no * period_us_r))
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def split_psd(src_filepath_r: str, dst_dir_r: str, period_us_r: int | None = None, size_r: int | None = None) -> list[str]:
+    """PSDファイルを時間またはサイズで分割する
+
+    分割したファイルは "<元のファイル名>_<連番>.psd" とする
+
+    Args:
+        src_filepath_r (str): 分割元のPSDファイルのパス
+        dst_dir_r (str): 分割したファイルの保存先
+        period_us_r (int | None): 1ファイルあたりの時間[us]
+        size_r (int | None): 1ファイルあたりのサイズの上限[byte]
+
+    Returns:
+        list[str]: 分割したファイルのパス
+    """
+    stem = os.path.splitext(os.path.basename(src_filepath_r))[0]
+    filepath_list = []
+    with PsdFile(src_filepath_r) as psd:
+        ranges = get_split_ranges(psd, period_us_r, size_r)
+        for part_no, (start, stop) in enumerate(ranges, 1):
+            filepath = os.path.join(dst_dir_r, f"{stem}_{part_no:0{max(3, len(str(len(ranges))))}}.psd")
+            with PsdWriter(filepath) as writer:
+                copy_records(psd, writer, range(start, stop))
+            filepath_list.append(filepath)
+    return filepath_list
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PSDファイルのパケットを絞り込んで抽出する、または分割する")
+    parser.add_argument("src", help="PSDファイルのパス")
+    parser.add_argument("dst", help="抽出先のPSDファイルのパス. 分割時は保存先のディレクトリ")
+    parser.add_argument("--device", help='"11:22:33:44:55:66" 形式の AdvA または "0x50654b1d" 形式の Access Address')
+    parser.add_argument("--channel", type=int, nargs="+", help="channel")
+    parser.add_argument("--start", type=float, help="先頭パケットを基準点(0)とした抽出開始時刻[s]")
+    parser.add_argument("--end", type=float, help="先頭パケットを基準点(0)とした抽出終了時刻[s]")
+    parser.add_argument("--crc-ok", action="store_true", help="CRCが正常なパケットのみを抽出する")
+    parser.add_argument("--split-minutes", type=float, help="指定した分ごとに分割する")
+    parser.add_argument("--split-mb", type=float, help="指定したMBごとに分割する")
+    args = parser.parse_args()
+
+    if args.split_minutes is not None or args.split_mb is not None:
+        period_us = None if args.split_minutes is None else int(args.split_minutes * 60 * 1000000)
+        size = None if args.split_mb is None else int(args.split_mb * (1 << 20))
+        os.makedirs(args.dst, exist_ok=True)
+        for filepath in split_psd(args.src, args.dst, period_us, size):
+            print(filepath)
+        return
+
+    time_range = None
+    if args.start is not None or args.end is not None:
+        start_us = 0 if args.start is None else int(args.start * 1000000)
+        end_us = (1 << 63) - 1 if args.end is None else int(args.end * 1000000)
+        time_range = (start_us, end_us)
+    device = None if args.device is None else parse_device(args.device)
+    count = filter_psd(args.src, args.dst, device, args.channel, time_range, True if args.crc_ok else None)
+    print(f"Packet count: {count}")
+
+
+if __name__ == "__main__":
+    main()
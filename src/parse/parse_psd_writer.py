@@ -0,0 +1,127 @@
+"""PSDファイルを書き出す
+
+parse_PSD_head のフィールド配置の逆変換を行う
+既存のパケットは解析結果から組み立て直さず、1パケット分のbytesデータをそのまま書き込む
+"""
+
+from collections.abc import Iterable
+from types import TracebackType
+
+from parse_PacketData import PacketData
+from parse_PSD_head import PSD_HEADER_STRUCT, PSD_RECORD_SIZE, FieldPayloadWStatusbytes
+from parse_PSD_SB import RSSI_OFFSET
+
+# Packet Information フィールドの値
+PACKET_INFORMATION = 0x01
+
+# 書き込み時のバッファサイズ
+WRITE_BUFFER_SIZE = PSD_RECORD_SIZE * 4096
+
+
+def pack_payload(
+    access_adrs_r: int,
+    ble_header_r: bytes,
+    ble_payload_r: bytes,
+    crc_r: bytes,
+    rssi_r: int,
+    crc_ok_r: bool,
+    channel_r: int,
+) -> bytes:
+    """Payload と StatusBytes を組み立てる
+
+    Payload, StatusBytes の逆変換
+
+    Args:
+        access_adrs_r (int): Access Address
+        ble_header_r (bytes): BLE Header
+        ble_payload_r (bytes): BLE Payload
+        crc_r (bytes): 受信したままの並びのCRC
+        rssi_r (int): RSSI
+        crc_ok_r (bool): CRCの状態 True: OK、False: NG
+        channel_r (int): channel
+
+    Returns:
+        bytes: Payload+StatusBytes
+    """
+    pdu = ble_header_r + ble_payload_r
+    payload = bytes([len(pdu)]) + access_adrs_r.to_bytes(4, "little") + pdu + crc_r
+    status_bytes = bytes([rssi_r - RSSI_OFFSET, (0x80 if crc_ok_r else 0x00) | channel_r])
+    return payload + status_bytes
+
+
+def pack_record(no_r: int, time_raw_r: int, payload_w_sb_r: bytes, information_r: int = PACKET_INFORMATION) -> bytes:
+    """1パケット分のbytesデータを組み立てる
+
+    Args:
+        no_r (int): パケット番号
+        time_raw_r (int): Timestampフィールドの値. [us]からは convert_time_raw で変換する
+        payload_w_sb_r (bytes): Payload+StatusBytes
+        information_r (int): Packet Information フィールドの値
+
+    Returns:
+        bytes: 1パケット分のbytesデータ
+    """
+    if FieldPayloadWStatusbytes.length_m < len(payload_w_sb_r):
+        raise ValueError(f"Payload+StatusBytes が{FieldPayloadWStatusbytes.length_m}byteを超えています")
+    header = PSD_HEADER_STRUCT.pack(information_r, no_r, time_raw_r, len(payload_w_sb_r))
+    return header + payload_w_sb_r.ljust(FieldPayloadWStatusbytes.length_m, b"\x00")
+
+
+class PsdWriter:
+    """PSDファイルにパケットを書き込む"""
+
+    def __init__(self, filepath_r: str) -> None:
+        self.filepath_m = filepath_r
+        self.packet_count_m = 0
+        self.__file = open(filepath_r, "wb", buffering=WRITE_BUFFER_SIZE)
+
+    def write_records(self, records_r: bytes | memoryview) -> None:
+        """パケット単位に揃ったbytesデータをそのまま書き込む
+
+        メモリマップしたPSDファイルの一部を渡すと、複製せずに書き込める
+
+        Args:
+            records_r (bytes | memoryview): 1パケット以上のbytesデータ
+        """
+        size = len(records_r)
+        if size % PSD_RECORD_SIZE:
+            raise ValueError(f"データ長がパケット単位({PSD_RECORD_SIZE}byte)に揃っていません")
+        self.__file.write(records_r)
+        self.packet_count_m += size // PSD_RECORD_SIZE
+
+    def write_packet(self, packet_r: PacketData) -> None:
+        """パケットを読み込んだときのbytesデータのまま書き込む
+
+        Args:
+            packet_r (PacketData): パケットデータ
+        """
+        offset = packet_r.offset_m
+        self.write_records(memoryview(packet_r.buffer_m)[offset : offset + PSD_RECORD_SIZE])
+
+    def write(self, packets_r: Iterable[PacketData]) -> None:
+        """パケットを順に書き込む
+
+        Args:
+            packets_r (Iterable[PacketData]): パケットデータ
+        """
+        for packet in packets_r:
+            self.write_packet(packet)
+
+    def flush(self) -> None:
+        """書き込み済みのデータをファイルに反映する"""
+        self.__file.flush()
+
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        self.__file.close()
+
+    def __enter__(self) -> "PsdWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -0,0 +1,441 @@
+"""条件式でパケットを絞り込む
+
+条件式は1度だけ構文解析し、parse_columns で取得した列に対する配列演算に変換する
+そのため、パケットごとに PacketData を生成せずに絞り込める(NumPyが必要)
+
+条件式の例:
+    chan in (37, 38, 39) and rssi > -70 and adv.type == ADV_IND and crc_ok
+    aa == 0x50654b1d and not crc_ok
+    adv.adrs == "11:22:33:44:55:66"
+"""
+
+import argparse
+import operator
+import re
+import time
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+
+import parse_columns
+import parse_export
+from parse_adv_pdu import PDU_TYPE_NAMES, PDU_TYPE_UNKNOWN
+from parse_packet_table import PacketTable
+from parse_PacketData import ADVERTISING_PACKET_ACCESS_ADRS, ADVERTISING_PACKET_CHANNEL_LIST
+from parse_psd_file import PsdFile
+from parse_psd_filter import copy_records
+from parse_psd_writer import PsdWriter
+
+# 1回の絞り込みで扱うパケット数
+QUERY_CHUNK_PACKET_NUM = 1 << 20
+
+# 条件式で使用できるフィールドと、対応する列
+FIELD_TABLE = {
+    # PSDファイルのヘッダ
+    "no": "no",
+    "timestamp": "timestamp",
+    "length": "length",
+    # StatusBytes
+    "rssi": "rssi",
+    "crc_ok": "crc_ok",
+    "channel": "channel",
+    "chan": "channel",
+    # Payload
+    "access_adrs": "access_adrs",
+    "aa": "access_adrs",
+    "ble_header": "ble_header",
+    # AdvertisePdu
+    "adv.type": "pdu_type",
+    "adv.ch_sel": "ch_sel",
+    "adv.tx_add": "tx_add",
+    "adv.rx_add": "rx_add",
+    "adv.length": "adv_length",
+    "adv.adrs": "adv_adrs",
+    # パケットの分類(PacketData.packet_type_m と同じ判定)
+    "adv": "adv",
+    "data": "data",
+}
+
+# decode_adv_headers で取得する列
+ADV_COLUMNS = {"pdu_type", "ch_sel", "tx_add", "rx_add", "adv_length", "adv_adrs", "has_adv_adrs"}
+
+# 他の列から求める列と、求めるのに必要な列
+DERIVED_COLUMNS: dict[str, tuple[Callable[[Mapping[str, Any]], Any], list[str]]] = {
+    # PDU Type が予約値の Advertise Packet も含めるため、pdu_type ではなく Access Address, Channel, CRCの状態で判定する
+    "adv": (lambda columns: parse_columns.is_advertising(columns) & (columns["crc_ok"] != 0), ["crc_ok", "access_adrs", "channel"]),
+    "data": (
+        lambda columns: (
+            (columns["crc_ok"] != 0)
+            & (columns["access_adrs"] != ADVERTISING_PACKET_ACCESS_ADRS)
+            & ~parse_columns.np.isin(columns["channel"], ADVERTISING_PACKET_CHANNEL_LIST)
+        ),
+        ["crc_ok", "access_adrs", "channel"],
+    ),
+}
+
+# 条件式で使用できる定数
+CONSTANT_TABLE: dict[str, int] = {name: value for value, name in PDU_TYPE_NAMES.items()}
+CONSTANT_TABLE.update({"UNKNOWN": PDU_TYPE_UNKNOWN, "true": 1, "false": 0})
+
+# 比較演算子
+COMPARE_TABLE = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# 字句
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>-?(?:0[xX][0-9a-fA-F]+|\d+))"
+    r"|(?P<string>\"[^\"]*\"|'[^']*')"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_.]*)"
+    r"|(?P<op>==|!=|<=|>=|<|>|\(|\)|,)"
+    r")"
+)
+KEYWORDS = {"and", "or", "not", "in"}
+
+
+def tokenize(text_r: str) -> list[tuple[str, Any, int]]:
+    """条件式を字句に分割する
+
+    Args:
+        text_r (str): 条件式
+
+    Returns:
+        list[tuple[str, Any, int]]: 字句の種類, 値, 条件式内の位置
+    """
+    tokens: list[tuple[str, Any, int]] = []
+    pos = 0
+    text = text_r.rstrip()
+    while pos < len(text):
+        match = TOKEN_PATTERN.match(text, pos)
+        kind = match.lastgroup if match is not None else None
+        if match is None or kind is None or match.end() == pos:
+            raise ValueError(f"解釈できない文字です: {text[pos:].strip()[:10]!r} (位置 {pos})")
+        start = match.start(kind)
+        value: Any = match.group(kind)
+        if kind == "number":
+            value = int(value, 0)
+        elif kind == "string":
+            value = value[1:-1]
+        elif kind == "name" and value in KEYWORDS:
+            kind = value
+        tokens.append((kind, value, start))
+        pos = match.end()
+    tokens.append(("end", None, len(text)))
+    return tokens
+
+
+def parse_literal(kind_r: str, value_r: Any, pos_r: int) -> int:
+    """定数の字句を値に変換する
+
+    文字列は "11:22:33:44:55:66" 形式のBDアドレスのみ使用でき、adv.adrs と同じ整数とする
+    """
+    if kind_r == "number":
+        return value_r
+    if kind_r == "string":
+        try:
+            adrs = bytes.fromhex(value_r.replace(":", ""))
+        except ValueError:
+            adrs = b""
+        if len(adrs) != 6:
+            raise ValueError(f"BDアドレスの形式が不正です: {value_r!r} (位置 {pos_r})")
+        return int.from_bytes(adrs, "big")
+    if kind_r == "name" and value_r in CONSTANT_TABLE:
+        return CONSTANT_TABLE[value_r]
+    if kind_r == "name":
+        raise ValueError(f"フィールドまたは定数ではありません: {value_r!r} (位置 {pos_r})")
+    raise ValueError(f"値が必要な位置に {value_r!r} があります (位置 {pos_r})")
+
+
+class _Parser:
+    """字句を構文木に変換する
+
+    構文木は ("or", [...]), ("and", [...]), ("not", node), ("cmp", 演算子, node, node),
+    ("in", node, [値], 否定), ("field", 列名), ("const", 値) の組み合わせとする
+    """
+
+    def __init__(self, text_r: str) -> None:
+        self.tokens_m = tokenize(text_r)
+        self.pos_m = 0
+
+    def peek(self) -> tuple[str, Any, int]:
+        return self.tokens_m[self.pos_m]
+
+    def take(self, kind_r: str | None = None, value_r: Any = None) -> tuple[str, Any, int]:
+        token = self.tokens_m[self.pos_m]
+        if (kind_r is not None and token[0] != kind_r) or (value_r is not None and token[1] != value_r):
+            expected = value_r if value_r is not None else kind_r
+            found = "終端" if token[0] == "end" else repr(token[1])
+            raise ValueError(f"{expected!r} が必要な位置に {found} があります (位置 {token[2]})")
+        self.pos_m += 1
+        return token
+
+    def parse(self) -> tuple:
+        node = self.parse_or()
+        self.take("end")
+        return node
+
+    def parse_or(self) -> tuple:
+        nodes = [self.parse_and()]
+        while self.peek()[0] == "or":
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self) -> tuple:
+        nodes = [self.parse_not()]
+        while self.peek()[0] == "and":
+            self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self) -> tuple:
+        if self.peek()[0] == "not":
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_compare()
+
+    def parse_compare(self) -> tuple:
+        left = self.parse_operand()
+        kind, value, _ = self.peek()
+        if kind == "op" and value in COMPARE_TABLE:
+            self.take()
+            return ("cmp", value, left, self.parse_operand())
+        if kind == "in" or (kind == "not" and self.tokens_m[self.pos_m + 1][0] == "in"):
+            negate = kind == "not"
+            if negate:
+                self.take()
+            self.take("in")
+            return ("in", left, self.parse_literal_list(), negate)
+        return left
+
+    def parse_literal_list(self) -> list[int]:
+        self.take("op", "(")
+        values = [parse_literal(*self.take())]
+        while self.peek()[1] == ",":
+            self.take()
+            values.append(parse_literal(*self.take()))
+        self.take("op", ")")
+        return values
+
+    def parse_operand(self) -> tuple:
+        kind, value, pos = self.take()
+        if kind == "op" and value == "(":
+            node = self.parse_or()
+            self.take("op", ")")
+            return node
+        if kind == "name" and value in FIELD_TABLE:
+            return ("field", FIELD_TABLE[value])
+        return ("const", parse_literal(kind, value, pos))
+
+
+class CompiledFilter:
+    """列に対する配列演算に変換した条件式"""
+
+    def __init__(self, text_r: str) -> None:
+        self.text_m = text_r
+        self.fields_m: set[str] = set()
+        self.__predicate = self.__compile(_Parser(text_r).parse())
+
+    def __compile(self, node_r: tuple) -> Callable[[Mapping[str, Any]], Any]:
+        """構文木を列を受け取る関数に変換する"""
+        kind = node_r[0]
+        if kind == "const":
+            value = node_r[1]
+            return lambda columns: value
+        if kind == "field":
+            name = node_r[1]
+            self.fields_m.add(name)
+            return lambda columns: columns[name]
+        if kind == "not":
+            func = self.__compile(node_r[1])
+            return lambda columns: ~_to_bool(func(columns))
+        if kind in ("and", "or"):
+            funcs = [self.__compile(node) for node in node_r[1]]
+            combine = operator.and_ if kind == "and" else operator.or_
+
+            def _combine(columns: Mapping[str, Any]) -> Any:
+                result = _to_bool(funcs[0](columns))
+                for func in funcs[1:]:
+                    result = combine(result, _to_bool(func(columns)))
+                return result
+
+            return _combine
+        if kind == "cmp":
+            compare = COMPARE_TABLE[node_r[1]]
+            left, right = self.__compile(node_r[2]), self.__compile(node_r[3])
+            return self.__limit_adv([node_r[2], node_r[3]], lambda columns: compare(left(columns), right(columns)))
+        # in
+        func = self.__compile(node_r[1])
+        values, negate = node_r[2], node_r[3]
+        return self.__limit_adv([node_r[1]], lambda columns: parse_columns.np.isin(func(columns), values, invert=negate))
+
+    def __limit_adv(self, operands_r: list[tuple], func_r: Callable[[Mapping[str, Any]], Any]) -> Callable[[Mapping[str, Any]], Any]:
+        """adv.* のフィールドとの比較は、Advertise Packet 以外では偽とする
+
+        Advertise Packet 以外のヘッダの列は、ヘッダとして解析しただけの意味のない値のため
+        adv.adrs との比較は、AdvA を取得できない Advertise Packet(予約値の PDU Type など)でも偽とする
+        """
+        names = {node[1] for node in operands_r if node[0] == "field" and node[1] in ADV_COLUMNS}
+        if not names:
+            return func_r
+        mask_name = "has_adv_adrs" if "adv_adrs" in names else "adv"
+        self.fields_m.add(mask_name)
+        return lambda columns: _to_bool(func_r(columns)) & columns[mask_name]
+
+    def get_required_columns(self) -> set[str]:
+        """条件式の評価に必要な列を取得する
+
+        Returns:
+            set[str]: decode_columns, decode_adv_headers で取得する列名
+        """
+        required = set()
+        for name in self.fields_m:
+            if name in DERIVED_COLUMNS:
+                required.update(DERIVED_COLUMNS[name][1])
+            else:
+                required.add(name)
+        return required
+
+    def evaluate(self, columns_r: Mapping[str, Any], packet_num_r: int) -> "parse_columns.np.ndarray":
+        """条件式を評価する
+
+        Args:
+            columns_r (Mapping[str, Any]): get_required_columns の列を含む列
+            packet_num_r (int): パケット数
+
+        Returns:
+            np.ndarray: 条件に一致するパケット:True, それ以外:False
+        """
+        columns = dict(columns_r)
+        for name in self.fields_m & DERIVED_COLUMNS.keys():
+            columns[name] = DERIVED_COLUMNS[name][0](columns)
+        mask = _to_bool(self.__predicate(columns))
+        if mask.ndim == 0:
+            # 定数のみの条件式
+            mask = parse_columns.np.full(packet_num_r, bool(mask))
+        return mask
+
+
+def _to_bool(value_r: Any) -> "parse_columns.np.ndarray":
+    """評価結果を真偽値の配列に変換する(数値の列は0以外を真とする)"""
+    value = parse_columns.np.asarray(value_r)
+    return value if value.dtype == bool else value != 0
+
+
+def compile_filter(text_r: str) -> CompiledFilter:
+    """条件式を構文解析して変換する
+
+    Args:
+        text_r (str): 条件式
+
+    Returns:
+        CompiledFilter: 変換した条件式
+    """
+    parse_columns._check_available()
+    return CompiledFilter(text_r)
+
+
+def get_filter_columns(compiled_r: CompiledFilter, records_r: "parse_columns.np.ndarray", base_time_us_r: int | None = None) -> dict[str, Any]:
+    """条件式の評価に必要な列を取得する
+
+    Advertise Packet のヘッダは条件式で使用する場合のみ解析する
+
+    Args:
+        compiled_r (CompiledFilter): 変換した条件式
+        records_r (np.ndarray): PSD_RECORD_DTYPE の配列
+        base_time_us_r (int | None): タイムスタンプの基準点
+
+    Returns:
+        dict[str, Any]: 列名をキーとした各フィールドの値
+    """
+    required = compiled_r.get_required_columns()
+    columns = parse_columns.decode_columns(records_r, base_time_us_r)
+    if required & ADV_COLUMNS:
+        columns.update(parse_columns.decode_adv_headers(columns, records_r if "adv_adrs" in required else None))
+    return columns
+
+
+def query_records(
+    compiled_r: CompiledFilter, records_r: "parse_columns.np.ndarray", chunk_packet_num_r: int = QUERY_CHUNK_PACKET_NUM
+) -> Iterator["parse_columns.np.ndarray"]:
+    """条件に一致するパケットの位置を取得する
+
+    使用メモリを抑えるため、まとまった数のパケット単位で列を取得して評価する
+
+    Args:
+        compiled_r (CompiledFilter): 変換した条件式
+        records_r (np.ndarray): PSD_RECORD_DTYPE の配列. load_records でメモリマップした配列も扱える
+        chunk_packet_num_r (int): 1回の評価で扱うパケット数
+
+    Yields:
+        np.ndarray: 条件に一致するパケットの位置(昇順)
+    """
+    np = parse_columns.np
+    packet_num = len(records_r)
+    base_time_us = int(parse_columns.convert_time_us(records_r["time"][:1])[0]) if 0 < packet_num else 0
+    for start in range(0, packet_num, chunk_packet_num_r):
+        chunk = records_r[start : start + chunk_packet_num_r]
+        mask = compiled_r.evaluate(get_filter_columns(compiled_r, chunk, base_time_us), len(chunk))
+        yield np.flatnonzero(mask) + start
+
+
+def query_table(compiled_r: CompiledFilter, table_r: PacketTable) -> list[int]:
+    """PacketTable から条件に一致するパケットの位置を取得する
+
+    PacketTable は AdvA を保持しないため、adv.adrs は使用できない
+
+    Args:
+        compiled_r (CompiledFilter): 変換した条件式
+        table_r (PacketTable): パケットのテーブル
+
+    Returns:
+        list[int]: 条件に一致するパケットの位置(昇順). PacketTable.take にそのまま渡せる
+    """
+    np = parse_columns.np
+    required = compiled_r.get_required_columns()
+    if "adv_adrs" in required:
+        raise ValueError("PacketTable では adv.adrs を使用できません")
+    columns: dict[str, Any] = {name: np.asarray(table_r[name]) for name in required - ADV_COLUMNS}
+    if required & ADV_COLUMNS:
+        header_columns = {name: np.asarray(table_r[name]) for name in ["access_adrs", "channel", "crc_ok", "ble_header"]}
+        columns.update(parse_columns.decode_adv_headers(header_columns))
+    return np.flatnonzero(compiled_r.evaluate(columns, len(table_r))).tolist()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="条件式でPSDファイルのパケットを絞り込む")
+    parser.add_argument("src", help="PSDファイルのパス")
+    parser.add_argument("expression", help='条件式. 例: "chan in (37,38,39) and rssi > -70 and adv.type == ADV_IND and crc_ok"')
+    parser.add_argument("-o", "--output", help="一致したパケットの出力先(.psd, .csv, .jsonl, .npz, .pcap)")
+    parser.add_argument("-c", "--columns", nargs="+", default=None, help="出力する列")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        compiled = compile_filter(args.expression)
+    except ValueError as e:
+        parser.error(str(e))
+    records = parse_columns.load_records(args.src)
+    np = parse_columns.np
+    index_list = np.concatenate([np.empty(0, dtype=np.int64), *query_records(compiled, records)])
+    print(f"Matched: {len(index_list)}/{len(records)}, Elapsed: {time.perf_counter() - start:.3f}s")
+    del records
+
+    if args.output is None:
+        return
+    with PsdFile(args.src) as psd:
+        if args.output.lower().endswith(".psd"):
+            with PsdWriter(args.output) as writer:
+                copy_records(psd, writer, index_list.tolist())
+        else:
+            with parse_export.open_exporter(args.output, args.columns) as exporter:
+                exporter.write(psd[int(index)] for index in index_list)
+
+
+if __name__ == "__main__":
+    main()
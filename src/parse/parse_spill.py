@@ -0,0 +1,270 @@
+"""メモリに収まらないPSDファイルを、列をディスクに書き出しながらテーブル化する
+
+一定数のパケットごとに PacketTable を作成して列ごとのファイルに追記し、
+完了後に各ファイルをメモリマップして PacketTable として参照する
+解析中の使用メモリは読み込み単位分の列と、上限付きの重複を除いた Payload の辞書に収まり、
+参照時の使用メモリはOSが必要に応じて解放できるファイルのページとなる
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from types import TracebackType
+from typing import cast
+
+from parse_intern import PayloadPool
+from parse_packet_table import COLUMN_TYPES, PacketTable, TypeCode
+from parse_PacketData import iter_packets
+
+# 解析中の使用メモリの既定の上限[byte]
+SPILL_RSS_BUDGET = 256 * 1024 * 1024
+
+# 解析中に1パケットあたりに使用するメモリの見積もり[byte]
+# (読み込み単位の列, Payload とその辞書. 読み込み単位内の Payload がすべて異なる場合を想定する)
+SPILL_PACKET_MEMORY = 512
+
+# ファイル全体で重複を除く Payload の辞書に使用するメモリの、Payload 1つあたりの見積もり[byte]
+# (Payload の長さを除いた bytes と辞書の要素, 番号と受信数)
+SPILL_PAYLOAD_ID_MEMORY = 160
+
+# 解析中の使用メモリの上限の下限[byte]
+SPILL_MIN_RSS_BUDGET = 16 * 1024 * 1024
+
+# BLE Payload の格納領域のファイルと型コード
+POOL_FILE_TYPES: dict[str, TypeCode] = {
+    "payload_offset": "Q",
+    "payload_count": "Q",
+    "payload_arena": "B",
+}
+
+# 書き出すファイルの拡張子
+SPILL_FILE_EXT = ".bin"
+
+
+def get_chunk_packet_num(rss_budget_r: int) -> int:
+    """使用メモリの上限から読み込み単位のパケット数を取得する
+
+    Args:
+        rss_budget_r (int): 解析中の使用メモリの上限[byte]
+
+    Returns:
+        int: 読み込み単位のパケット数
+
+    Raises:
+        ValueError: 使用メモリの上限が SPILL_MIN_RSS_BUDGET 未満の場合
+    """
+    if rss_budget_r < SPILL_MIN_RSS_BUDGET:
+        raise ValueError(f"使用メモリの上限は{SPILL_MIN_RSS_BUDGET}byte以上を指定してください: {rss_budget_r}")
+    # 使用メモリの上限の半分を読み込み単位に、残りを Payload の辞書に割り当てる
+    return rss_budget_r // 2 // SPILL_PACKET_MEMORY
+
+
+class _PayloadIndex:
+    """ファイル全体で重複を除いた Payload の番号と受信数
+
+    番号は受信順に割り当てるため、メモリ上で作成した PacketTable と同じ番号となる
+    辞書の使用メモリが上限に達した後に初めて受信した Payload は辞書に追加しないため、
+    読み込み単位をまたいで同じ内容が別の番号となる(読み込み単位内では1つにまとめる)
+    受信数は番号を割り当てた時点でファイルに書き出し、後のパケットで加算される辞書内の Payload のみ最後に書き直す
+    """
+
+    def __init__(self, memory_limit_r: int) -> None:
+        self.payload_num_m = 0
+        # Payload から辞書内の位置を引く辞書と、位置ごとの番号と受信数
+        self.slots_m: dict[bytes, int] = {}
+        self.slot_ids_m = array(POOL_FILE_TYPES["payload_count"])
+        self.slot_counts_m = array(POOL_FILE_TYPES["payload_count"])
+        self.memory_left_m = memory_limit_r
+
+    def intern(self, payload_r: bytes, count_r: int) -> tuple[int, bool]:
+        """Payload の番号を取得し、受信数を加算する
+
+        Args:
+            payload_r (bytes): BLE Payload
+            count_r (int): 受信数
+
+        Returns:
+            tuple[int, bool]: Payload の番号, 初めて受信した場合は True
+        """
+        slot = self.slots_m.get(payload_r)
+        if slot is not None:
+            self.slot_counts_m[slot] += count_r
+            return self.slot_ids_m[slot], False
+
+        payload_id = self.payload_num_m
+        self.payload_num_m += 1
+        memory = SPILL_PAYLOAD_ID_MEMORY + len(payload_r)
+        if memory <= self.memory_left_m:
+            self.slots_m[payload_r] = len(self.slot_ids_m)
+            self.slot_ids_m.append(payload_id)
+            self.slot_counts_m.append(count_r)
+            self.memory_left_m -= memory
+        return payload_id, True
+
+    def write_counts(self, filepath_r: str) -> None:
+        """辞書内の Payload の受信数を、書き出した受信数のファイルに反映する
+
+        Args:
+            filepath_r (str): 受信数のファイルのパス
+        """
+        if not self.slot_ids_m:
+            return
+        with open(filepath_r, "r+b") as f, mmap.mmap(f.fileno(), 0) as buffer:
+            view = memoryview(buffer).cast(POOL_FILE_TYPES["payload_count"])
+            try:
+                for payload_id, count in zip(self.slot_ids_m, self.slot_counts_m, strict=True):
+                    view[payload_id] = count
+            finally:
+                view.release()
+
+
+def _write_chunk(files_r: dict, table_r: PacketTable, index_r: _PayloadIndex) -> None:
+    """読み込み単位のテーブルを列ごとのファイルに追記する
+
+    読み込み単位ごとの Payload の番号をファイル全体での番号に変換し、初めて受信した Payload のみ格納領域に追記する
+    """
+    id_map = array(COLUMN_TYPES["payload_id"])
+    offsets = array(POOL_FILE_TYPES["payload_offset"])
+    counts = array(POOL_FILE_TYPES["payload_count"])
+    arena_size = files_r["payload_arena"].tell()
+    for payload, count in table_r.pool_m.items():
+        payload_id, is_new = index_r.intern(payload, count)
+        if is_new:
+            files_r["payload_arena"].write(payload)
+            arena_size += len(payload)
+            offsets.append(arena_size)
+            counts.append(count)
+        id_map.append(payload_id)
+
+    for name in COLUMN_TYPES:
+        files_r[name].write(array(id_map.typecode, [id_map[i] for i in table_r[name]]) if name == "payload_id" else table_r[name])
+    files_r["payload_offset"].write(offsets)
+    files_r["payload_count"].write(counts)
+
+
+def write_spill_files(filepath_r: str, spill_dir_r: str, chunk_packet_num_r: int, payload_id_memory_r: int = SPILL_RSS_BUDGET // 2) -> int:
+    """PSDファイルを解析して列ごとのファイルに書き出す
+
+    同じ内容の BLE Payload は、辞書の使用メモリが上限に収まる範囲でファイル全体で1つにまとめる
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+        spill_dir_r (str): 書き出し先のディレクトリ
+        chunk_packet_num_r (int): 読み込み単位のパケット数
+        payload_id_memory_r (int): Payload の辞書に使用するメモリの上限[byte]
+
+    Returns:
+        int: パケット数
+    """
+    names = [*COLUMN_TYPES, *POOL_FILE_TYPES]
+    files = {name: open(os.path.join(spill_dir_r, name + SPILL_FILE_EXT), "wb") for name in names}
+    try:
+        packet_num = 0
+        index = _PayloadIndex(payload_id_memory_r)
+        files["payload_offset"].write(struct.pack("<Q", 0))
+
+        table = PacketTable()
+        with open(filepath_r, "rb") as f:
+            for packet in iter_packets(f):
+                table.append(packet)
+                if len(table) < chunk_packet_num_r:
+                    continue
+                _write_chunk(files, table, index)
+                packet_num += len(table)
+                table = PacketTable()
+        _write_chunk(files, table, index)
+        packet_num += len(table)
+    finally:
+        for file in files.values():
+            file.close()
+    index.write_counts(os.path.join(spill_dir_r, "payload_count" + SPILL_FILE_EXT))
+    return packet_num
+
+
+class SpilledPacketTable(PacketTable):
+    """列ごとのファイルをメモリマップした PacketTable
+
+    列はメモリマップしたファイルを参照するため、append, extend はできない
+    """
+
+    def __init__(self, spill_dir_r: str, remove_dir_r: bool = False) -> None:
+        self.spill_dir_m = spill_dir_r
+        self.__remove_dir = remove_dir_r
+        self.__maps: list[mmap.mmap] = []
+        self.__views: list[memoryview] = []
+
+        views = {name: self.__map_file(name, type_code) for name, type_code in {**COLUMN_TYPES, **POOL_FILE_TYPES}.items()}
+
+        # 読み取り専用の memoryview を、同じ型コードの array の代わりに参照させる
+        arena = cast(bytearray, views.pop("payload_arena"))
+        arrays = cast(dict[str, array], views)
+        super().__init__(arrays, PayloadPool(arena, arrays.pop("payload_offset"), arrays.pop("payload_count")))
+
+    def __map_file(self, name_r: str, type_code_r: TypeCode) -> memoryview:
+        """ファイルをメモリマップして型コードの配列として参照する"""
+        with open(os.path.join(self.spill_dir_m, name_r + SPILL_FILE_EXT), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # 空のファイルはメモリマップできない
+                view = memoryview(b"").cast(type_code_r)
+            else:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.__maps.append(buffer)
+                view = memoryview(buffer).cast(type_code_r)
+        self.__views.append(view)
+        return view
+
+    def close(self) -> None:
+        """メモリマップを閉じる. 一時ディレクトリに書き出した場合は削除する"""
+        for view in self.__views:
+            view.release()
+        for buffer in self.__maps:
+            buffer.close()
+        self.__views = []
+        self.__maps = []
+        if self.__remove_dir:
+            shutil.rmtree(self.spill_dir_m, ignore_errors=True)
+            self.__remove_dir = False
+
+    def __enter__(self) -> "SpilledPacketTable":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def load_packet_table_spilled(filepath_r: str, spill_dir_r: str | None = None, rss_budget_r: int = SPILL_RSS_BUDGET) -> SpilledPacketTable:
+    """PSDファイルを列ごとのファイルに書き出しながらテーブル化する
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+        spill_dir_r (str | None): 書き出し先のディレクトリ. 省略時は一時ディレクトリに書き出し、close で削除する
+        rss_budget_r (int): 解析中の使用メモリの上限[byte]. SPILL_MIN_RSS_BUDGET 以上とする
+
+    Returns:
+        SpilledPacketTable: 全パケットのテーブル
+
+    Raises:
+        ValueError: 使用メモリの上限が SPILL_MIN_RSS_BUDGET 未満の場合
+    """
+    chunk_packet_num = get_chunk_packet_num(rss_budget_r)
+    remove_dir = spill_dir_r is None
+    if spill_dir_r is None:
+        spill_dir_r = tempfile.mkdtemp(prefix="psd_spill_")
+    else:
+        os.makedirs(spill_dir_r, exist_ok=True)
+
+    try:
+        write_spill_files(filepath_r, spill_dir_r, chunk_packet_num, rss_budget_r // 2)
+        return SpilledPacketTable(spill_dir_r, remove_dir)
+    except BaseException:
+        if remove_dir:
+            shutil.rmtree(spill_dir_r, ignore_errors=True)
+        raise
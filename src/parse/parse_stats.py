@@ -0,0 +1,293 @@
+"""パケットを保持せずに、受信数, RSSI, CRCエラー率, 受信レートを集計する
+
+集計は1パケットずつ行う方法と、parse_columns で取得した列から一括で行う方法に対応する
+"""
+
+from array import array
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import parse_columns
+from parse_PacketData import (
+    ADVERTISING_PACKET_ACCESS_ADRS,
+    ADVERTISING_PACKET_CHANNEL_LIST,
+    PACKET_TYPE_ADVERTISING,
+    PACKET_TYPE_DATA,
+    PacketData,
+)
+
+# RSSIのヒストグラムの範囲[dBm]と階級の幅
+RSSI_HIST_MIN = -128
+RSSI_HIST_MAX = 128
+RSSI_HIST_BIN_WIDTH = 4
+RSSI_HIST_BIN_NUM = (RSSI_HIST_MAX - RSSI_HIST_MIN) // RSSI_HIST_BIN_WIDTH
+
+# データチャネルパケットのデバイスを Access Address で区別するためのキーの位置
+DATA_DEVICE_KEY_FLAG = 1 << 48
+
+# 受信レートを集計する単位[us]
+RATE_UNIT_US = 1000000
+
+
+def get_rssi_bin(rssi_r: int) -> int:
+    """RSSIが属するヒストグラムの階級を取得する
+
+    範囲外のRSSIは両端の階級に含める
+
+    Args:
+        rssi_r (int): RSSI
+
+    Returns:
+        int: 階級の番号
+    """
+    return min(max(rssi_r - RSSI_HIST_MIN, 0) // RSSI_HIST_BIN_WIDTH, RSSI_HIST_BIN_NUM - 1)
+
+
+def convert_device_key(device_key_r: int) -> str:
+    """デバイスのキーを表示用の文字列に変換する
+
+    Args:
+        device_key_r (int): AdvA またはフラグを付けた Access Address
+
+    Returns:
+        str: BDアドレスまたは Access Address
+    """
+    if device_key_r & DATA_DEVICE_KEY_FLAG:
+        return f"0x{device_key_r & 0xFFFFFFFF:08x}"
+    return device_key_r.to_bytes(6, "big").hex(":")
+
+
+class RunningStats:
+    """1つの集計単位の受信数, CRCエラー数, RSSIの統計"""
+
+    __slots__ = ("count_m", "crc_ng_count_m", "rssi_min_m", "rssi_max_m", "rssi_sum_m", "histogram_m")
+
+    def __init__(self) -> None:
+        self.count_m = 0
+        self.crc_ng_count_m = 0
+        self.rssi_min_m = RSSI_HIST_MAX
+        self.rssi_max_m = RSSI_HIST_MIN
+        self.rssi_sum_m = 0
+        self.histogram_m = array("Q", bytes(8 * RSSI_HIST_BIN_NUM))
+
+    def add(self, rssi_r: int, crc_ok_r: bool) -> None:
+        """1パケット分を集計する
+
+        Args:
+            rssi_r (int): RSSI
+            crc_ok_r (bool): CRCの状態 True: OK、False: NG
+        """
+        self.count_m += 1
+        if not crc_ok_r:
+            self.crc_ng_count_m += 1
+        if rssi_r < self.rssi_min_m:
+            self.rssi_min_m = rssi_r
+        if self.rssi_max_m < rssi_r:
+            self.rssi_max_m = rssi_r
+        self.rssi_sum_m += rssi_r
+        self.histogram_m[get_rssi_bin(rssi_r)] += 1
+
+    def merge(self, count_r: int, crc_ng_count_r: int, rssi_min_r: int, rssi_max_r: int, rssi_sum_r: int, histogram_r: Iterable[int]) -> None:
+        """まとめて集計した結果を加える
+
+        Args:
+            count_r (int): 受信数
+            crc_ng_count_r (int): CRCエラー数
+            rssi_min_r (int): RSSIの最小値
+            rssi_max_r (int): RSSIの最大値
+            rssi_sum_r (int): RSSIの合計
+            histogram_r (Iterable[int]): 階級ごとの受信数
+        """
+        self.count_m += count_r
+        self.crc_ng_count_m += crc_ng_count_r
+        self.rssi_min_m = min(self.rssi_min_m, rssi_min_r)
+        self.rssi_max_m = max(self.rssi_max_m, rssi_max_r)
+        self.rssi_sum_m += rssi_sum_r
+        for i, value in enumerate(histogram_r):
+            self.histogram_m[i] += int(value)
+
+    def get_rssi_mean(self) -> float:
+        """RSSIの平均値を取得する
+
+        Returns:
+            float: RSSIの平均値. 未受信の場合は0
+        """
+        return self.rssi_sum_m / self.count_m if self.count_m else 0.0
+
+    def get_crc_error_rate(self) -> float:
+        """CRCエラー率を取得する
+
+        Returns:
+            float: CRCエラー率. 未受信の場合は0
+        """
+        return self.crc_ng_count_m / self.count_m if self.count_m else 0.0
+
+    def report(self) -> str:
+        """集計結果を文字列で取得する
+
+        Returns:
+            str: 集計結果
+        """
+        if not self.count_m:
+            return "count: 0"
+        return (
+            f"count: {self.count_m}, CRC error rate: {self.get_crc_error_rate():.4f}, "
+            f"RSSI min/mean/max: {self.rssi_min_m}/{self.get_rssi_mean():.1f}/{self.rssi_max_m}"
+        )
+
+
+class StatsAggregator:
+    """全体, channel ごと, デバイスごとの統計と、1秒ごとの受信数を集計する
+
+    デバイスは Advertise Packet では AdvA、データチャネルパケットでは Access Address で区別する
+    """
+
+    def __init__(self) -> None:
+        self.total_m = RunningStats()
+        self.channels_m: dict[int, RunningStats] = {}
+        self.devices_m: dict[int, RunningStats] = {}
+        # 受信した秒だけを保持するため、タイムスタンプが飛んでも最大値までの配列は確保しない
+        self.rate_m: dict[int, int] = {}
+
+    def __get_channel(self, channel_r: int) -> RunningStats:
+        stats = self.channels_m.get(channel_r)
+        if stats is None:
+            stats = self.channels_m[channel_r] = RunningStats()
+        return stats
+
+    def __get_device(self, device_key_r: int) -> RunningStats:
+        stats = self.devices_m.get(device_key_r)
+        if stats is None:
+            stats = self.devices_m[device_key_r] = RunningStats()
+        return stats
+
+    def __add_rate(self, second_r: int, count_r: int) -> None:
+        self.rate_m[second_r] = self.rate_m.get(second_r, 0) + count_r
+
+    def process(self, packet_r: PacketData) -> None:
+        """1パケット分を集計する
+
+        Args:
+            packet_r (PacketData): タイムスタンプ設定済みのパケットデータ
+        """
+        status_bytes = packet_r.fld_status_bytes_m
+        rssi = status_bytes.rssi_m
+        crc_ok = status_bytes.indicate_crc_m
+
+        self.total_m.add(rssi, crc_ok)
+        self.__get_channel(status_bytes.channel_m).add(rssi, crc_ok)
+        self.__add_rate(max(0, packet_r.timestamp_m) // RATE_UNIT_US, 1)
+
+        device_key = None
+        adv_pdu = packet_r.adv_pdu_m
+        if adv_pdu is not None:
+            if adv_pdu.adv_adrs_m is not None:
+                device_key = int(adv_pdu.adv_adrs_m.replace(":", ""), 16)
+        elif packet_r.packet_type_m == PACKET_TYPE_DATA:
+            device_key = DATA_DEVICE_KEY_FLAG | packet_r.fld_payload_m.access_adrs_m
+        if device_key is not None:
+            self.__get_device(device_key).add(rssi, crc_ok)
+
+    def process_all(self, packets_r: Iterable[PacketData]) -> "StatsAggregator":
+        """全パケットを集計する
+
+        Args:
+            packets_r (Iterable[PacketData]): タイムスタンプ設定済みのパケットデータ
+
+        Returns:
+            StatsAggregator: 自身
+        """
+        for packet in packets_r:
+            self.process(packet)
+        return self
+
+    def add_columns(self, columns_r: dict[str, Any], adv_adrs_r: Any = None) -> "StatsAggregator":
+        """列単位でまとめて集計する
+
+        Args:
+            columns_r (dict): parse_columns.decode_columns で取得した列, または PacketTable の列
+            adv_adrs_r (np.ndarray | None): parse_columns.decode_adv_headers で取得した adv_adrs. 省略時は Advertise Packet のデバイスを集計しない
+
+        Returns:
+            StatsAggregator: 自身
+        """
+        np = parse_columns.np
+        if np is None:
+            raise ImportError("NumPyがインストールされていません")
+
+        columns = {name: np.asarray(columns_r[name]) for name in ["timestamp", "rssi", "crc_ok", "channel", "access_adrs"]}
+        rssi = columns["rssi"].astype(np.int64)
+        crc_ok = columns["crc_ok"] != 0
+        rssi_bin = np.clip((rssi - RSSI_HIST_MIN) // RSSI_HIST_BIN_WIDTH, 0, RSSI_HIST_BIN_NUM - 1)
+        if len(rssi) == 0:
+            return self
+
+        self.__merge_groups(lambda key: self.total_m, np.zeros(len(rssi), dtype=np.int64), np.zeros(1, dtype=np.int64), rssi, crc_ok, rssi_bin)
+
+        channel_keys, channel_index = np.unique(columns["channel"], return_inverse=True)
+        self.__merge_groups(self.__get_channel, channel_index, channel_keys, rssi, crc_ok, rssi_bin)
+
+        # デバイスは CRC が OK で分類できたパケットのみを集計する
+        is_adv = parse_columns.is_advertising(columns) & crc_ok
+        is_data = crc_ok & (columns["access_adrs"] != ADVERTISING_PACKET_ACCESS_ADRS)
+        is_data &= ~np.isin(columns["channel"], ADVERTISING_PACKET_CHANNEL_LIST)
+        device_key = np.where(is_data, DATA_DEVICE_KEY_FLAG | columns["access_adrs"].astype(np.int64), -1)
+        if adv_adrs_r is not None:
+            # AdvA を取得できないパケット(予約値の PDU Type など)は process と同様にデバイスを集計しない
+            adv_adrs = np.asarray(adv_adrs_r)
+            has_adv_adrs = is_adv & (adv_adrs != parse_columns.ADV_ADRS_NONE)
+            device_key = np.where(has_adv_adrs, adv_adrs.astype(np.int64), device_key)
+        has_device = device_key != -1
+        device_keys, device_index = np.unique(device_key[has_device], return_inverse=True)
+        self.__merge_groups(self.__get_device, device_index, device_keys, rssi[has_device], crc_ok[has_device], rssi_bin[has_device])
+
+        second = np.maximum(columns["timestamp"], 0) // RATE_UNIT_US
+        for second_value, count in zip(*(values.tolist() for values in np.unique(second, return_counts=True)), strict=True):
+            self.__add_rate(second_value, count)
+        return self
+
+    def __merge_groups(
+        self,
+        get_stats_r: Callable[[Any], RunningStats],
+        index_r: Any,
+        keys_r: Any,
+        rssi_r: Any,
+        crc_ok_r: Any,
+        rssi_bin_r: Any,
+    ) -> None:
+        """集計単位ごとにまとめて集計した結果を加える
+
+        index_r は各パケットが属する集計単位の番号、keys_r は番号ごとの集計単位のキー
+        """
+        np = parse_columns.np
+        group_num = len(keys_r)
+        if group_num == 0:
+            return
+        count = np.bincount(index_r, minlength=group_num)
+        crc_ng = np.bincount(index_r, weights=~crc_ok_r, minlength=group_num)
+        rssi_sum = np.bincount(index_r, weights=rssi_r, minlength=group_num)
+        rssi_min = np.full(group_num, RSSI_HIST_MAX, dtype=np.int64)
+        np.minimum.at(rssi_min, index_r, rssi_r)
+        rssi_max = np.full(group_num, RSSI_HIST_MIN, dtype=np.int64)
+        np.maximum.at(rssi_max, index_r, rssi_r)
+        histogram = np.zeros((group_num, RSSI_HIST_BIN_NUM), dtype=np.int64)
+        np.add.at(histogram, (index_r, rssi_bin_r), 1)
+
+        for i, key in enumerate(keys_r.tolist()):
+            get_stats_r(key).merge(int(count[i]), int(crc_ng[i]), int(rssi_min[i]), int(rssi_max[i]), int(rssi_sum[i]), histogram[i].tolist())
+
+    def report(self) -> str:
+        """集計結果を文字列で取得する
+
+        Returns:
+            str: 集計結果
+        """
+        lines = [f"Total {self.total_m.report()}"]
+        if self.rate_m:
+            active = self.rate_m.values()
+            lines.append(f"Rate [packets/s] max: {max(active)}, mean: {sum(active) / len(active):.1f}")
+        for channel in sorted(self.channels_m):
+            lines.append(f"Channel {channel} {self.channels_m[channel].report()}")
+        for device_key in sorted(self.devices_m, key=lambda key: -self.devices_m[key].count_m):
+            lines.append(f"Device {convert_device_key(device_key)} {self.devices_m[device_key].report()}")
+        return "\n".join(lines)
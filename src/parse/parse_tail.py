@@ -0,0 +1,154 @@
+"""パケットスニファが書き込み中のPSDファイルを追跡し、追記されたパケットのみを解析する"""
+
+import os
+import threading
+from collections.abc import Callable, Iterator
+from types import TracebackType
+from typing import BinaryIO
+
+from parse_export import ExporterCommon
+from parse_PacketData import CHUNK_PACKET_NUM, PacketData, make_packet
+from parse_PSD_head import PSD_RECORD_SIZE
+
+# ファイルの追記を確認する間隔[s]
+POLL_INTERVAL = 0.01
+
+
+class PsdTail:
+    """書き込み中のPSDファイルの追跡
+
+    解析済みの位置を保持し、1パケットに満たない末尾のデータは書き込みが完了するまで解析しない
+    ファイルが短くなった場合や、削除されて同じパスに作り直された場合は先頭から解析する
+    """
+
+    def __init__(self, filepath_r: str) -> None:
+        self.filepath_m = filepath_r
+        self.offset_m = 0
+        self.packet_count_m = 0
+
+        self.__file: BinaryIO | None = None
+        self.__base_time_us: int | None = None
+
+    def read_new(self, max_packet_num_r: int = CHUNK_PACKET_NUM) -> list[PacketData]:
+        """前回から追記されたパケットを取得する
+
+        既存の大きなファイルの追跡を開始した場合も、1回に取得するパケット数は上限までとする
+
+        Args:
+            max_packet_num_r (int): 1回に取得するパケット数の上限
+
+        Returns:
+            list[PacketData]: 最初のパケットを基準点(0)としたタイムスタンプ設定済みのパケットデータ
+        """
+        if self.__file is not None and self.__is_replaced(self.__file):
+            self.close()
+        if self.__file is None:
+            try:
+                self.__file = open(self.filepath_m, "rb")
+            except FileNotFoundError:
+                # スニファがファイルを作成するまで待つ
+                return []
+            self.offset_m = 0
+            self.__base_time_us = None
+
+        file_size = os.fstat(self.__file.fileno()).st_size
+        if file_size < self.offset_m:
+            self.offset_m = 0
+            self.__base_time_us = None
+
+        read_size = min(file_size - self.offset_m, PSD_RECORD_SIZE * max_packet_num_r) // PSD_RECORD_SIZE * PSD_RECORD_SIZE
+        if read_size == 0:
+            return []
+
+        self.__file.seek(self.offset_m)
+        chunk = self.__file.read(read_size)
+        chunk_size = len(chunk) // PSD_RECORD_SIZE * PSD_RECORD_SIZE
+
+        packet_list = [make_packet(chunk, offset) for offset in range(0, chunk_size, PSD_RECORD_SIZE)]
+        for pkt in packet_list:
+            # タイムスタンプを0リセットする
+            time_us = pkt.get_time_us()
+            if self.__base_time_us is None:
+                self.__base_time_us = time_us
+            pkt.set_timestamp(time_us - self.__base_time_us)
+
+        self.offset_m += chunk_size
+        self.packet_count_m += len(packet_list)
+        return packet_list
+
+    def __is_replaced(self, file_r: BinaryIO) -> bool:
+        """開いているファイルが削除され、同じパスに別のファイルが作られたかどうかを判定する"""
+        try:
+            stat = os.stat(self.filepath_m)
+        except FileNotFoundError:
+            # 作り直されるまでは、開いているファイルの残りを解析する
+            return False
+        file_stat = os.fstat(file_r.fileno())
+        return (stat.st_ino, stat.st_dev) != (file_stat.st_ino, file_stat.st_dev)
+
+    def follow(self, stop_r: threading.Event, poll_interval_r: float = POLL_INTERVAL) -> Iterator[list[PacketData]]:
+        """停止が指示されるまでファイルを追跡し、追記されたパケットを取得する
+
+        Args:
+            stop_r (threading.Event): 停止の指示
+            poll_interval_r (float): 追記を確認する間隔[s]
+
+        Yields:
+            list[PacketData]: 追記されたパケットデータ
+        """
+        while not stop_r.is_set():
+            packet_list = self.read_new()
+            if packet_list:
+                yield packet_list
+            else:
+                stop_r.wait(poll_interval_r)
+
+        # 停止までに書き込まれた分を取りこぼさない
+        while packet_list := self.read_new():
+            yield packet_list
+
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self) -> "PsdTail":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def follow_file(
+    filepath_r: str,
+    stop_r: threading.Event,
+    exporter_r: ExporterCommon | None = None,
+    callback_r: Callable[[list[PacketData]], None] | None = None,
+    poll_interval_r: float = POLL_INTERVAL,
+) -> int:
+    """停止が指示されるまでファイルを追跡し、追記されたパケットを出力先と通知先に渡す
+
+    Args:
+        filepath_r (str): PSDファイルのパス
+        stop_r (threading.Event): 停止の指示
+        exporter_r (ExporterCommon | None): 出力先. 追記のたびにファイルへ反映する
+        callback_r (Callable[[list[PacketData]], None] | None): 追記されたパケットの通知先
+        poll_interval_r (float): 追記を確認する間隔[s]
+
+    Returns:
+        int: 解析したパケット数
+    """
+    with PsdTail(filepath_r) as tail:
+        for packet_list in tail.follow(stop_r, poll_interval_r):
+            if exporter_r is not None:
+                exporter_r.write(packet_list)
+                exporter_r.flush()
+            if callback_r is not None:
+                callback_r(packet_list)
+        return tail.packet_count_m